@@ -0,0 +1,69 @@
+"""
+Benchmark the native (Pillow) chart renderer against matplotlib
+
+Each renderer runs in a fresh interpreter so import time and peak RSS are
+measured in isolation. Usage:
+
+    python benchmarks/bench_charts.py [--points 30] [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+renderer, points, runs = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+started = time.perf_counter()
+from utils.charts import render_revenue_chart
+if renderer == 'matplotlib':
+    import matplotlib.backends.backend_agg
+    import matplotlib.figure
+import_ms = (time.perf_counter() - started) * 1000
+
+time_series = [{{'date': f'2026-01-{{i % 28 + 1:02d}}', 'revenue': (i * 37) % 200 + 5.5}} for i in range(points)]
+timings = []
+for _ in range(runs):
+    started = time.perf_counter()
+    png = render_revenue_chart('monthly', time_series, renderer)
+    timings.append((time.perf_counter() - started) * 1000)
+
+first_render_ms = timings[0]
+timings.sort()
+print(json.dumps({{
+    'renderer': renderer,
+    'import_ms': round(import_ms, 1),
+    'first_render_ms': round(first_render_ms, 1),
+    'median_render_ms': round(timings[len(timings) // 2], 1),
+    'png_bytes': len(png),
+    'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    'rss_growth_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_start) / 1024, 1),
+}}))
+'''
+
+def run(renderer: str, points: int, runs: int) -> dict:
+    """Run one renderer in a fresh interpreter and return its measurements"""
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER.format(root=ROOT), renderer, str(points), str(runs)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=30, help='Number of days in the time series')
+    parser.add_argument('--runs', type=int, default=20, help='Renders per renderer')
+    args = parser.parse_args()
+
+    results = [run(renderer, args.points, args.runs) for renderer in ('native', 'matplotlib')]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark DatabaseManager against synthetic order histories
+
+For every dataset size each operation is timed in series (one call at a
+time) and concurrently (--concurrency calls in flight), and latency
+percentiles are written as JSON. Pass --baseline to compare against a
+committed result. Usage:
+
+    python benchmarks/bench_db.py [--orders 10000 100000 1000000 5000000]
+                                  [--iterations 200] [--concurrency 16]
+                                  [--output results.json]
+                                  [--baseline benchmarks/baselines/bench_db.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import CATEGORIES, PAYMENT_METHODS, dataset_path, users_for, working_copy
+from database.analytics import close_readers
+from database.db_manager import DatabaseManager
+
+PERCENTILES = (50, 90, 95, 99)
+PERIODS = ('daily', 'weekly', 'monthly', 'all')
+# get_sales_stats scans the orders table; fewer iterations keep big datasets practical
+SLOW_OPERATIONS = {f'get_sales_stats[{period}]' for period in PERIODS}
+
+def summarize(latencies: List[float], failures: int, wall: float) -> Dict:
+    """Latency percentiles in milliseconds plus throughput"""
+    ordered = sorted(latencies)
+    result = {
+        'calls': len(ordered),
+        'failures': failures,
+        'ops_per_sec': round(len(ordered) / wall, 1) if wall else None,
+    }
+    for p in PERCENTILES:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        result[f'p{p}_ms'] = round(ordered[index] * 1000, 3)
+    result['max_ms'] = round(ordered[-1] * 1000, 3)
+    result['mean_ms'] = round(sum(ordered) / len(ordered) * 1000, 3)
+    return result
+
+async def run_series(call: Callable, iterations: int) -> Dict:
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        if await call(i) is False:
+            failures += 1
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, failures, time.perf_counter() - started)
+
+async def run_concurrent(call: Callable, iterations: int, concurrency: int) -> Dict:
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            t = time.perf_counter()
+            if await call(i) is False:
+                failures += 1
+            latencies.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    return summarize(latencies, failures, time.perf_counter() - started)
+
+def operations(db: DatabaseManager, products: int, orders: int, seed: int) -> Tuple[Dict[str, Callable], Dict]:
+    """Benchmark callables keyed by name; each takes the iteration number and returns False on failure"""
+    rng = random.Random(seed)
+    users = users_for(orders)
+    created: List[str] = []
+    run_tag = {'mode': 'series'}
+
+    async def create_order(i: int):
+        order_id = f"BENCH-{run_tag['mode']}-{i}"
+        product_id = rng.randint(1, products)
+        ok = await db.create_order(order_id, str(rng.randint(1, users)), [(product_id, 1)],
+                                   rng.choice(PAYMENT_METHODS)) is not None
+        if ok:
+            created.append(order_id)
+        return ok
+
+    async def update_order_status(i: int):
+        # Completes orders made by the create_order benchmark: stock, stats and status in one transaction
+        if not created:
+            return False
+        return await db.update_order_status(created.pop(), 'completed')
+
+    async def get_pending_order(i: int):
+        return await db.get_pending_order(str(rng.randint(1, users)))
+
+    async def get_products_by_category(i: int):
+        return await db.get_products_by_category(rng.choice(CATEGORIES))
+
+    ops = {
+        'get_products_by_category': get_products_by_category,
+        'get_pending_order': get_pending_order,
+    }
+    for period in PERIODS:
+        ops[f'get_sales_stats[{period}]'] = lambda i, period=period: db.get_sales_stats(period)
+    ops['create_order'] = create_order
+    ops['update_order_status'] = update_order_status
+    return ops, run_tag
+
+async def bench_size(products: int, orders: int, args) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = working_copy(products, orders, args.seed, directory)
+        db = DatabaseManager(path)
+        ops, run_tag = operations(db, products, orders, args.seed)
+        results = {}
+        for name, call in ops.items():
+            iterations = args.slow_iterations if name in SLOW_OPERATIONS else args.iterations
+            # Warm the page cache so the first measured call is not an outlier
+            await call(-1)
+            run_tag['mode'] = 'series'
+            series = await run_series(call, iterations)
+            run_tag['mode'] = 'concurrent'
+            concurrent = await run_concurrent(call, iterations, args.concurrency)
+            results[name] = {'series': series, 'concurrent': concurrent}
+            print(f"  {name:<28} series p50 {series['p50_ms']:>9.2f} ms  p95 {series['p95_ms']:>9.2f} ms | "
+                  f"concurrent p50 {concurrent['p50_ms']:>9.2f} ms  p95 {concurrent['p95_ms']:>9.2f} ms",
+                  file=sys.stderr)
+        await close_readers()
+        return results
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Operations whose p50 or p95 regressed by more than `tolerance` against the baseline"""
+    regressions = []
+    print(f"\n{'dataset / operation / mode':<58}{'p50 ratio':>10}{'p95 ratio':>10}", file=sys.stderr)
+    for size, operations_ in current['results'].items():
+        for name, modes in operations_.items():
+            for mode, stats in modes.items():
+                base = baseline.get('results', {}).get(size, {}).get(name, {}).get(mode)
+                if not base:
+                    continue
+                ratios = [stats[key] / base[key] if base[key] else 1.0 for key in ('p50_ms', 'p95_ms')]
+                flag = ''
+                if any(ratio > 1 + tolerance for ratio in ratios):
+                    flag = '  REGRESSION'
+                    regressions.append(f'{size} {name} {mode}')
+                print(f'{size + " " + name + " " + mode:<58}{ratios[0]:>10.2f}{ratios[1]:>10.2f}{flag}',
+                      file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000, help='Catalog size')
+    parser.add_argument('--orders', type=int, nargs='+', default=[10_000, 100_000], help='Order history sizes')
+    parser.add_argument('--iterations', type=int, default=200, help='Calls per operation and mode')
+    parser.add_argument('--slow-iterations', type=int, default=20, help='Calls per mode for get_sales_stats')
+    parser.add_argument('--concurrency', type=int, default=16, help='Calls in flight in concurrent mode')
+    parser.add_argument('--seed', type=int, default=1, help='Dataset and workload seed')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', help='Compare against a previous JSON result')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before flagging (0.25 = 25%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    args = parser.parse_args()
+
+    # Failed writes under contention are logged by DatabaseManager; keep the output readable
+    logging.basicConfig(level=logging.CRITICAL)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'products': args.products,
+            'iterations': args.iterations,
+            'slow_iterations': args.slow_iterations,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    for orders in args.orders:
+        print(f'Dataset: {args.products} products, {orders} orders', file=sys.stderr)
+        # Generated outside the benchmark loop (schema setup runs its own event loop)
+        dataset_path(args.products, orders, args.seed)
+        report['results'][f'orders_{orders}'] = asyncio.run(bench_size(args.products, orders, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}', file=sys.stderr)
+            if args.fail_on_regression:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Sustained order-write throughput: per-call commits vs group commit
+
+Runs a stream of create_order → update_order_proof → update_order_status
+writes against a copy of a synthetic dataset, at several concurrency
+levels, once with every write on its own connection and commit
+(DB_GROUP_COMMIT=false, the old behaviour) and once through the
+single-writer group commit. Background readers keep polling
+get_pending_order, as checkout traffic does, and --reporters keep
+running /stats all (get_sales_stats) to show reports do not slow writes
+down. Usage:
+
+    python benchmarks/bench_writes.py [--orders 10000] [--writes 2000]
+                                      [--concurrency 1 16 64 256] [--readers 4]
+                                      [--reporters 0] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_db import summarize
+from benchmarks.dataset import PAYMENT_METHODS, dataset_path, users_for, working_copy
+from database import writer
+from database.analytics import close_readers
+from database.db_manager import DatabaseManager
+from database.instrumentation import query_stats
+
+MODES = {'per_call_commit': False, 'group_commit': True}
+
+async def run_level(db: DatabaseManager, products: int, users: int, writes: int, concurrency: int,
+                    readers: int, reporters: int, seed: int, tag: str) -> Dict:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def order_lifecycle(i: int):
+        # The three order writes of one checkout, in order
+        nonlocal failures
+        async with semaphore:
+            order_id = f'WB-{tag}-{i}'
+            steps = [
+                lambda: db.create_order(order_id, str(rng.randint(1, users)), [(rng.randint(1, products), 1)],
+                                        rng.choice(PAYMENT_METHODS)),
+                lambda: db.update_order_proof(order_id, f'https://cdn.example.com/{order_id}.png'),
+                lambda: db.update_order_status(order_id, 'completed'),
+            ]
+            for step in steps:
+                started = time.perf_counter()
+                ok = await step()
+                latencies.append(time.perf_counter() - started)
+                if not ok:
+                    failures += 1
+                    return
+
+    async def reader():
+        while not done.is_set():
+            await db.get_pending_order(str(rng.randint(1, users)))
+
+    async def reporter():
+        while not done.is_set():
+            await db.get_sales_stats('all')
+
+    reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+    reader_tasks += [asyncio.create_task(reporter()) for _ in range(reporters)]
+    retries_before = sum(stats.busy_retries for stats in query_stats.methods.values())
+    started = time.perf_counter()
+    await asyncio.gather(*(order_lifecycle(i) for i in range(writes // 3)))
+    wall = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*reader_tasks)
+
+    result = summarize(latencies, failures, wall)
+    result['busy_retries'] = sum(stats.busy_retries for stats in query_stats.methods.values()) - retries_before
+    return result
+
+async def bench_mode(mode: str, args) -> Dict:
+    writer.GROUP_COMMIT = MODES[mode]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = working_copy(args.products, args.orders, args.seed, directory)
+        db = DatabaseManager(path)
+        for concurrency in args.concurrency:
+            batches_before = writes_before = 0
+            if writer.GROUP_COMMIT:
+                actor = writer.get_writer(path)
+                batches_before, writes_before = actor.batches, actor.writes
+            stats = await run_level(db, args.products, users_for(args.orders), args.writes, concurrency,
+                                    args.readers, args.reporters, args.seed, f'{mode}-{concurrency}')
+            if writer.GROUP_COMMIT:
+                batches = actor.batches - batches_before
+                stats['mean_batch'] = round((actor.writes - writes_before) / batches, 2) if batches else 0
+            results[f'concurrency_{concurrency}'] = stats
+            print(f"  {mode:<16} concurrency {concurrency:>4}: {stats['ops_per_sec']:>8} writes/s  "
+                  f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>9.2f} ms  "
+                  f"failures {stats['failures']:>4}  busy retries {stats['busy_retries']:>5}"
+                  + (f"  mean batch {stats['mean_batch']}" if 'mean_batch' in stats else ''), file=sys.stderr)
+        await writer.close_writers()
+        await close_readers()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000, help='Catalog size')
+    parser.add_argument('--orders', type=int, default=10_000, help='Order history size')
+    parser.add_argument('--writes', type=int, default=2000, help='Order writes per concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64, 256],
+                        help='Checkouts writing at once')
+    parser.add_argument('--readers', type=int, default=4, help='Background get_pending_order pollers')
+    parser.add_argument('--reporters', type=int, default=0, help='Background get_sales_stats(\'all\') loops')
+    parser.add_argument('--seed', type=int, default=1, help='Dataset and workload seed')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    # Failed writes are counted in the results; keep the output readable
+    logging.basicConfig(level=logging.CRITICAL)
+    # Generated outside the benchmark loop (schema setup runs its own event loop)
+    dataset_path(args.products, args.orders, args.seed)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'products': args.products,
+            'orders': args.orders,
+            'writes': args.writes,
+            'readers': args.readers,
+            'reporters': args.reporters,
+            'batch_window_ms': writer.BATCH_WINDOW * 1000,
+            'max_batch': writer.MAX_BATCH,
+            'seed': args.seed,
+        },
+        'results': {mode: asyncio.run(bench_mode(mode, args)) for mode in MODES},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
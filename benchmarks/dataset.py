@@ -0,0 +1,137 @@
+"""
+Synthetic catalog and order history for benchmarks
+
+Datasets are built once per (products, orders, seed) with the schema from
+DatabaseManager.init_db() and cached under benchmarks/.data, then copied
+for every run so write benchmarks always start from the same state.
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database.db_manager import JOURNAL_MODE, DatabaseManager
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', '.data')
+CATEGORIES = ['best_sold', 'new', 'social', 'discord', 'accounts', 'services']
+PAYMENT_METHODS = ['paypal', 'btc', 'eth', 'ltc', 'usdt', 'sol']
+# Status mix of a shop that has been running for a while
+STATUSES = [('completed', 0.72), ('rejected', 0.12), ('pending_review', 0.06), ('pending_proof', 0.10)]
+HISTORY_DAYS = 365
+# Bumped when the schema changes, so stale cached datasets are not reused
+SCHEMA_VERSION = 4
+CHUNK = 50_000
+
+def users_for(orders: int) -> int:
+    """Number of distinct customers for an order history (about 4 orders each)"""
+    return max(100, orders // 4)
+
+def _pick_status(rng: random.Random) -> str:
+    roll = rng.random()
+    for status, share in STATUSES:
+        if roll < share:
+            return status
+        roll -= share
+    return STATUSES[-1][0]
+
+def _generate(path: str, products: int, orders: int, seed: int):
+    asyncio.run(DatabaseManager(path).init_db())
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    users = users_for(orders)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+
+    prices = []
+    product_rows = []
+    for i in range(products):
+        price = round(rng.uniform(1, 150), 2)
+        prices.append(price)
+        created = now - timedelta(days=rng.uniform(0, HISTORY_DAYS))
+        product_rows.append((
+            f'Product {i:05d}', CATEGORIES[i % len(CATEGORIES)], f'Synthetic product {i}',
+            price, 1_000_000, None, '[]', created.strftime('%Y-%m-%d %H:%M:%S')
+        ))
+    conn.executemany('''
+        INSERT INTO products (name, category, description, price, stock, image_url, deliverables, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', product_rows)
+
+    # Orders are inserted in creation order, like the live table
+    span = HISTORY_DAYS * 86400
+    for start in range(0, orders, CHUNK):
+        order_rows = []
+        item_rows = []
+        stats_rows = []
+        count = min(CHUNK, orders - start)
+        for i in range(start, start + count):
+            created = now - timedelta(seconds=span * (1 - i / orders))
+            product_id = rng.randint(1, products)
+            quantity = rng.choice((1, 1, 1, 2, 3))
+            total = round(prices[product_id - 1] * quantity, 2)
+            status = _pick_status(rng)
+            created_at = created.strftime('%Y-%m-%d %H:%M:%S')
+            order_id = f'NC-{created:%Y%m%d}-{i:06X}'
+            name, category = product_rows[product_id - 1][:2]
+            order_rows.append((
+                order_id, str(rng.randint(1, users)), product_id, quantity, total,
+                rng.choice(PAYMENT_METHODS), status, created_at, created_at,
+                name, category, prices[product_id - 1], '[]'
+            ))
+            item_rows.append((order_id, product_id, quantity, prices[product_id - 1], total, name, category, '[]'))
+            if status == 'completed':
+                stats_rows.append((created.strftime('%Y-%m-%d'), product_id, quantity, total))
+        conn.executemany('''
+            INSERT INTO orders (order_id, user_id, product_id, quantity, total_price,
+                                payment_method, status, created_at, updated_at,
+                                product_name, product_category, unit_price, deliverables)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', order_rows)
+        conn.executemany('''
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total,
+                                     product_name, product_category, deliverables)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', item_rows)
+        conn.executemany('''
+            INSERT INTO sales_stats (date, product_id, quantity_sold, revenue)
+            VALUES (?, ?, ?, ?)
+        ''', stats_rows)
+        conn.commit()
+
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+
+def dataset_path(products: int, orders: int, seed: int) -> str:
+    """Path of the cached dataset, generating it on first use"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'shop-v{SCHEMA_VERSION}-p{products}-o{orders}-s{seed}.db')
+    if not os.path.exists(path):
+        print(f'Generating {products} products / {orders} orders -> {path}', file=sys.stderr)
+        partial = path + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        _generate(partial, products, orders, seed)
+        os.replace(partial, path)
+    return path
+
+def working_copy(products: int, orders: int, seed: int, directory: str) -> str:
+    """Fresh copy of a dataset that a benchmark may modify"""
+    source = dataset_path(products, orders, seed)
+    target = os.path.join(directory, os.path.basename(source))
+    shutil.copyfile(source, target)
+    # Cached datasets are single files; switch the copy to the journal mode the bot runs with
+    conn = sqlite3.connect(target)
+    conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+    conn.close()
+    return target
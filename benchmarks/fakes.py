@@ -0,0 +1,332 @@
+"""
+Offline stand-ins for the Discord objects the shop code touches
+
+FakeInteraction subclasses discord.Interaction (so @traced and isinstance
+checks treat it as the real thing) without parsing a gateway payload.
+Everything a handler sends is recorded on the interaction, channel or DM
+so a driver can pick up the next view or modal. Every API call sleeps
+for a configurable latency to model Discord's round trip.
+"""
+
+import asyncio
+import itertools
+import random
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import discord
+
+ACK_DEADLINE = 3.0
+
+_snowflakes = itertools.count(1)
+
+def next_snowflake() -> int:
+    """Unique, time-ordered Discord-style ID"""
+    return discord.utils.time_snowflake(datetime.now(timezone.utc)) + next(_snowflakes) % 4096
+
+class FakeDiscord:
+    """Shared state for one simulation: API latency and call counts"""
+    def __init__(self, latency_ms: float = 40.0, jitter: float = 0.5, seed: int = 1):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.api_calls: Dict[str, int] = {}
+
+    async def api_call(self, name: str):
+        self.api_calls[name] = self.api_calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+class _HTTPResponse:
+    """Minimal aiohttp response for constructing discord.HTTPException subclasses"""
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+
+class FakeAttachment:
+    def __init__(self, url: str, filename: str, content_type: Optional[str], size: int = 0):
+        self.url = url
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+
+class FakeMessage:
+    def __init__(self, fake: FakeDiscord, author, channel, content: Optional[str] = None,
+                 embed: Optional[discord.Embed] = None, view: Optional[discord.ui.View] = None,
+                 attachments: Optional[List[FakeAttachment]] = None):
+        self.fake = fake
+        self.id = next_snowflake()
+        self.created_at = datetime.now(timezone.utc)
+        self.guild = None
+        self.author = author
+        self.channel = channel
+        self.content = content
+        self.embeds = [embed] if embed else []
+        self.view = view
+        self.attachments = attachments or []
+
+    async def edit(self, **kwargs):
+        await self.fake.api_call('message.edit')
+        if 'view' in kwargs:
+            self.view = kwargs['view']
+        if kwargs.get('embed'):
+            self.embeds = [kwargs['embed']]
+        if 'content' in kwargs:
+            self.content = kwargs['content']
+        return self
+
+    async def delete(self):
+        await self.fake.api_call('message.delete')
+
+class FakeDMChannel(discord.DMChannel):
+    """DM channel that passes the isinstance(channel, discord.DMChannel) check"""
+    def __init__(self, fake: FakeDiscord, recipient):
+        # discord.DMChannel.__init__ expects a gateway payload
+        self.fake = fake
+        self.id = next_snowflake()
+        self._recipient = recipient
+        self.messages: List[FakeMessage] = []
+
+    @property
+    def recipient(self):
+        return self._recipient
+
+    async def send(self, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None, **kwargs):
+        await self.fake.api_call('dm.send')
+        message = FakeMessage(self.fake, None, self, content, embed, kwargs.get('view'))
+        self.messages.append(message)
+        return message
+
+class FakeTextChannel:
+    def __init__(self, fake: FakeDiscord, channel_id: int, name: str, on_send=None):
+        self.fake = fake
+        self.id = channel_id
+        self.name = name
+        self.mention = f'<#{channel_id}>'
+        self.messages: List[FakeMessage] = []
+        self.on_send = on_send
+
+    async def send(self, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None,
+                   view: Optional[discord.ui.View] = None, **kwargs):
+        await self.fake.api_call('channel.send')
+        message = FakeMessage(self.fake, None, self, content, embed, view)
+        self.messages.append(message)
+        if self.on_send:
+            self.on_send(message)
+        return message
+
+class FakeMember:
+    def __init__(self, fake: FakeDiscord, member_id: int, name: str, roles: Optional[List[FakeRole]] = None,
+                 guild: Optional['FakeGuild'] = None, bot: bool = False):
+        self.fake = fake
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.mention = f'<@{member_id}>'
+        self.bot = bot
+        self.roles = list(roles or [])
+        self.guild = guild
+        self.guild_permissions = discord.Permissions.none()
+        self.dm_channel = FakeDMChannel(fake, self)
+
+    async def send(self, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None, **kwargs):
+        return await self.dm_channel.send(content, embed=embed, **kwargs)
+
+    async def add_roles(self, *roles, **kwargs):
+        await self.fake.api_call('member.add_roles')
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    def __str__(self):
+        return self.name
+
+class FakeGuild:
+    def __init__(self, fake: FakeDiscord, guild_id: int, owner_id: int = 0):
+        self.fake = fake
+        self.id = guild_id
+        self.owner_id = owner_id
+        self.members: Dict[int, FakeMember] = {}
+        self.roles: Dict[int, FakeRole] = {}
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self.members.get(member_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+
+class FakeBot:
+    """The parts of commands.Bot the cogs and views use"""
+    def __init__(self, fake: FakeDiscord, guild: FakeGuild):
+        self.fake = fake
+        self.guild = guild
+        self.guilds = [guild]
+        self.user = FakeMember(fake, next_snowflake(), 'NovaCore', bot=True)
+        self.channels: Dict[int, FakeTextChannel] = {}
+        self.latency = fake.latency
+
+    def get_channel(self, channel_id: int) -> Optional[FakeTextChannel]:
+        return self.channels.get(channel_id)
+
+    def get_user(self, user_id: int) -> Optional[FakeMember]:
+        return self.guild.get_member(user_id)
+
+class FakeResponse:
+    """InteractionResponse stand-in that enforces the single initial response"""
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+        self._done = False
+        self.modal: Optional[discord.ui.Modal] = None
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _ack(self, name: str):
+        if self._done:
+            raise discord.InteractionResponded(self._interaction)
+        # Mark before the round trip so a concurrent second response fails fast
+        self._done = True
+        await self._interaction.fake.api_call(f'response.{name}')
+        self._interaction.mark_ack()
+        if self._interaction.ack_after > ACK_DEADLINE:
+            # Discord has already failed the interaction on the user's side
+            raise discord.NotFound(_HTTPResponse(404, 'Not Found'), {'code': 10062, 'message': 'Unknown interaction'})
+
+    async def defer(self, *, ephemeral: bool = False, thinking: bool = False):
+        await self._ack('defer')
+
+    async def send_message(self, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None,
+                           view: Optional[discord.ui.View] = None, ephemeral: bool = False, **kwargs):
+        await self._ack('send_message')
+        self._interaction.record(content, embed, view)
+
+    async def edit_message(self, *, content: Optional[str] = None, embed: Optional[discord.Embed] = None,
+                           view: Optional[discord.ui.View] = None, **kwargs):
+        await self._ack('edit_message')
+        if self._interaction.message is not None:
+            await self._interaction.message.edit(content=content, embed=embed, view=view)
+
+    async def send_modal(self, modal: discord.ui.Modal):
+        await self._ack('send_modal')
+        self.modal = modal
+
+class FakeFollowup:
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None,
+                   view: Optional[discord.ui.View] = None, ephemeral: bool = False, **kwargs):
+        await self._interaction.fake.api_call('followup.send')
+        return self._interaction.record(content, embed, view)
+
+class FakeInteraction(discord.Interaction):
+    """discord.Interaction built without a gateway payload"""
+    def __init__(self, fake: FakeDiscord, bot: FakeBot, user: FakeMember,
+                 type: discord.InteractionType = discord.InteractionType.component,
+                 message: Optional[FakeMessage] = None):
+        # discord.Interaction.__init__ parses a gateway payload; set the slots we need directly
+        self.fake = fake
+        self.id = next_snowflake()
+        self.type = type
+        self.user = user
+        self.message = message
+        self.data = {}
+        self.guild_id = bot.guild.id
+        self._bot = bot
+        self._created_at = datetime.now(timezone.utc)
+        self._response = FakeResponse(self)
+        self._followup = FakeFollowup(self)
+        self.ack_after: Optional[float] = None
+        self.sent: List[FakeMessage] = []
+
+    @property
+    def response(self) -> FakeResponse:
+        return self._response
+
+    @property
+    def followup(self) -> FakeFollowup:
+        return self._followup
+
+    @property
+    def client(self) -> FakeBot:
+        return self._bot
+
+    @property
+    def guild(self) -> FakeGuild:
+        return self._bot.guild
+
+    @property
+    def created_at(self) -> datetime:
+        return self._created_at
+
+    def mark_ack(self):
+        if self.ack_after is None:
+            self.ack_after = (datetime.now(timezone.utc) - self._created_at).total_seconds()
+
+    def record(self, content, embed, view) -> FakeMessage:
+        message = FakeMessage(self.fake, self._bot.user, None, content, embed, view)
+        self.sent.append(message)
+        return message
+
+    async def edit_original_response(self, *, content: Optional[str] = None,
+                                     embed: Optional[discord.Embed] = None,
+                                     view: Optional[discord.ui.View] = None, **kwargs):
+        await self.fake.api_call('original.edit')
+        return self.record(content, embed, view)
+
+    def last_view(self) -> Optional[discord.ui.View]:
+        for message in reversed(self.sent):
+            if message.view is not None:
+                return message.view
+        return None
+
+    def last_text(self) -> str:
+        return (self.sent[-1].content or '') if self.sent else ''
+
+def find_item(view: discord.ui.View, item_type=None, custom_id: Optional[str] = None):
+    """First child of a view matching a type and/or custom_id"""
+    for item in view.children:
+        if item_type is not None and not isinstance(item, item_type):
+            continue
+        if custom_id is not None and getattr(item, 'custom_id', None) != custom_id:
+            continue
+        return item
+    return None
+
+def select(item: discord.ui.Select, value: str):
+    """Set a select's chosen value the way an incoming interaction would"""
+    item._values = [value]
+
+def fill(text_input: discord.ui.TextInput, value: str):
+    """Set a modal field's submitted value"""
+    text_input._value = value
+
+def component_data(item: discord.ui.Item) -> Dict:
+    """Interaction payload data for a click on a button or select"""
+    data = {'custom_id': item.custom_id, 'component_type': item.type.value}
+    if isinstance(item, discord.ui.Select):
+        data['values'] = list(item.values)
+    return data
+
+def modal_data(modal: discord.ui.Modal) -> Dict:
+    """Interaction payload data for a modal submit"""
+    return {
+        'custom_id': modal.custom_id,
+        'components': [
+            {'type': 1, 'components': [{'type': 4, 'custom_id': child.custom_id, 'value': child.value}]}
+            for child in modal.children if isinstance(child, discord.ui.TextInput)
+        ],
+    }
+
+ORDER_ID_PATTERN = re.compile(r'NC-[0-9A-Z-]+')
+
+def order_id_from(message: FakeMessage) -> Optional[str]:
+    """Order ID mentioned in a message's first embed description"""
+    if not message.embeds or not message.embeds[0].description:
+        return None
+    match = ORDER_ID_PATTERN.search(message.embeds[0].description)
+    return match.group(0) if match else None
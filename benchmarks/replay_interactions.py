@@ -0,0 +1,466 @@
+"""
+Replay a recorded interaction trace offline
+
+Reads the JSONL files written by utils/interaction_recorder.py (plain and
+gzipped rotations) and re-drives every interaction and DM through the real
+views, modals, slash commands and listeners with the fakes from
+benchmarks/fakes.py, against a copy of a database. Each pseudonymous user
+replays their own events in order; users run concurrently on the recorded
+timeline, scaled by --speed (0 = as fast as possible).
+
+Components are matched by custom_id, or by the handler name from the
+trace when the custom_id was generated at runtime. Staff review buttons
+resolve to the replayed review message of the buyer named in the recorded
+message. Scrubbed free text is replayed as the same-length placeholder;
+permission checks on slash commands are not re-run.
+
+Reports recorded vs replayed handler and ack latency percentiles, events
+that could not be resolved, handler errors and DB contention. Usage:
+
+    python benchmarks/replay_interactions.py logs/traces [--database shop.db]
+                                             [--speed 1] [--api-latency-ms 40]
+                                             [--output report.json]
+"""
+
+import argparse
+import asyncio
+import gzip
+import importlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import typing
+from collections import Counter, defaultdict, deque
+from typing import Dict, Iterable, List, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import (FakeAttachment, FakeBot, FakeDiscord, FakeGuild, FakeInteraction, FakeMember,
+                              FakeMessage, FakeRole, FakeTextChannel, fill, find_item)
+from benchmarks.sim_checkout import (CATEGORY, CUSTOMER_ROLE_ID, GUILD_ID, MAIN_CHANNEL_ID, OWNER_ROLE_ID,
+                                     PUBLIC_LOG_CHANNEL_ID, STAFF_CHANNEL_ID, STAFF_ROLE_ID, ErrorLogCounter,
+                                     Recorder, configure_environment, db_contention, percentiles)
+from cogs.order_management import ReviewView
+from cogs.ticket_management import TicketControlView, TicketPanelView
+from database.analytics import close_readers
+from database.db_manager import DatabaseManager
+from ui.components import StockView
+from utils.payment_methods import payment_methods
+from utils.tracing import check_command_rate_limit
+
+COG_MODULES = ('cogs.order_management', 'cogs.product_management', 'cogs.payments_management',
+               'cogs.ticket_management', 'cogs.diagnostics', 'cogs.admin_commands',
+               'cogs.blacklist_management')
+REVIEW_BUTTONS = ('accept_payment', 'reject_payment')
+# Views registered with bot.add_view: their messages outlive any session
+PERSISTENT_VIEWS = {
+    'show_stock': lambda bot: StockView(),
+    'ticket_product': TicketPanelView,
+    'ticket_refund': TicketPanelView,
+    'ticket_other': TicketPanelView,
+    'ticket_my_orders': TicketPanelView,
+    'close_ticket': lambda bot: TicketControlView(),
+}
+RECENT_MESSAGES = 20
+
+def trace_files(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.startswith('interactions.jsonl'))
+        else:
+            files.append(path)
+    return files
+
+def load_trace(files: List[str]) -> List[Dict]:
+    """Interaction and DM events in time order, with the handler timings joined in"""
+    events = []
+    handled = {}
+    for path in files:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event['e'] == 'handled':
+                    handled[event['id']] = event
+                else:
+                    events.append(event)
+    for event in events:
+        result = handled.get(event.get('id'))
+        if result:
+            event['handler'] = result['handler']
+            event['recorded'] = result
+    events.sort(key=lambda event: event['t'])
+    return events
+
+def handler_name(item: discord.ui.Item) -> Optional[str]:
+    """Qualified name of the function behind a component's callback, as @traced reports it"""
+    callback = item.callback
+    func = getattr(callback, 'callback', None) or getattr(callback, '__func__', None) or callback
+    return getattr(func, '__qualname__', None)
+
+async def checked(check: typing.Awaitable[bool], handler: typing.Callable[[], typing.Awaitable]):
+    """Run a handler only if its dispatch check passes, as discord.py does"""
+    if await check:
+        return await handler()
+
+class Session:
+    """One pseudonymous user: their member, recent views and pending modal"""
+    def __init__(self, member: FakeMember):
+        self.member = member
+        self.messages: deque = deque(maxlen=RECENT_MESSAGES)
+        self.modal: Optional[discord.ui.Modal] = None
+        self.modal_message: Optional[FakeMessage] = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+class Replay:
+    def __init__(self, args, events: List[Dict], error_logs: ErrorLogCounter):
+        self.args = args
+        self.events = events
+        self.error_logs = error_logs
+        self.fake = FakeDiscord(args.api_latency_ms, seed=args.seed)
+        self.guild = FakeGuild(self.fake, GUILD_ID)
+        self.staff_role = FakeRole(STAFF_ROLE_ID, 'Staff')
+        self.owner_role = FakeRole(OWNER_ROLE_ID, 'Owner')
+        for role in (self.staff_role, FakeRole(CUSTOMER_ROLE_ID, 'Customer'), self.owner_role):
+            self.guild.roles[role.id] = role
+        self.bot = FakeBot(self.fake, self.guild)
+        for channel_id, name in ((MAIN_CHANNEL_ID, 'shop'), (STAFF_CHANNEL_ID, 'staff-review'),
+                                 (PUBLIC_LOG_CHANNEL_ID, 'purchases')):
+            self.bot.channels[channel_id] = FakeTextChannel(self.fake, channel_id, name)
+        self.sessions: Dict[str, Session] = {}
+        self.reviewed: set = set()
+        self.cogs: List[commands.Cog] = []
+        self.app_commands: Dict[str, tuple] = {}
+        self.recorder = Recorder()
+        self.recorded_durations: Dict[str, List[float]] = defaultdict(list)
+        self.recorded_acks: Dict[str, List[float]] = defaultdict(list)
+        self.unresolved: Counter = Counter()
+        self.schedule_lag: List[float] = []
+        self.replayed = 0
+
+    async def setup(self):
+        db = DatabaseManager(os.getenv('DATABASE_PATH'))
+        await db.init_db()
+        await payment_methods.load(db)
+        if not self.args.database:
+            # Same catalog as sim_checkout, so its recorded traces resolve
+            for n in range(self.args.products):
+                await db.add_product(f'Product {n:02d}', CATEGORY, round(5 + n * 2.5, 2), f'Simulated product {n}',
+                                     None, json.dumps([f'Item {n}']), self.args.stock)
+        for module_name in COG_MODULES:
+            module = importlib.import_module(module_name)
+            for _, cls in inspect.getmembers(module, inspect.isclass):
+                if not issubclass(cls, commands.Cog) or cls.__module__ != module_name:
+                    continue
+                try:
+                    cog = cls(self.bot)
+                except Exception as e:
+                    logging.warning(f"Skipping {cls.__name__}: {e}")
+                    continue
+                self.cogs.append(cog)
+                for command in cog.get_app_commands():
+                    self.app_commands[command.name] = (cog, command)
+
+    def session(self, pseudonym: str, event: Optional[Dict] = None) -> Session:
+        session = self.sessions.get(pseudonym)
+        if session is None:
+            roles = []
+            if event and event.get('staff'):
+                roles.append(self.staff_role)
+            if event and event.get('owner'):
+                roles.append(self.owner_role)
+            member = FakeMember(self.fake, 100_000 + len(self.sessions), pseudonym, roles, self.guild)
+            self.guild.members[member.id] = member
+            session = self.sessions[pseudonym] = Session(member)
+        return session
+
+    def interaction(self, session: Session, type: discord.InteractionType,
+                    message: Optional[FakeMessage], event: Dict) -> FakeInteraction:
+        interaction = FakeInteraction(self.fake, self.bot, session.member, type, message)
+        interaction.data = {key: event[key] for key in ('custom_id', 'component_type', 'values') if key in event}
+        return interaction
+
+    async def review_message(self, event: Dict) -> Optional[FakeMessage]:
+        """Unreviewed staff review for the buyer named in the recorded message, waiting for it to arrive"""
+        buyers = {self.session(pseudonym).member.id for pseudonym in event.get('message_users', [])}
+        deadline = time.perf_counter() + self.args.wait
+        while True:
+            pending = [message for message in self.bot.get_channel(STAFF_CHANNEL_ID).messages
+                       if isinstance(message.view, ReviewView) and message.id not in self.reviewed]
+            for message in pending:
+                if message.view.user_id in buyers:
+                    return message
+            if pending and not buyers:
+                return pending[0]
+            if time.perf_counter() >= deadline:
+                return None
+            await asyncio.sleep(0.05)
+
+    async def resolve_component(self, session: Session, event: Dict):
+        custom_id = event.get('custom_id')
+        handler = event.get('handler')
+        if custom_id in REVIEW_BUTTONS:
+            message = await self.review_message(event)
+            if message is None:
+                self.unresolved['review message not found'] += 1
+                return None
+            self.reviewed.add(message.id)
+            candidates = [message]
+        elif custom_id in PERSISTENT_VIEWS:
+            view = PERSISTENT_VIEWS[custom_id](self.bot)
+            candidates = [FakeMessage(self.fake, self.bot.user, self.bot.get_channel(MAIN_CHANNEL_ID), view=view)]
+        else:
+            candidates = list(reversed(session.messages))
+
+        for message in candidates:
+            item = find_item(message.view, custom_id=custom_id)
+            if item is None and handler:
+                item = next((child for child in message.view.children if handler_name(child) == handler), None)
+            if item is not None:
+                break
+        else:
+            self.unresolved[f'component {handler or custom_id}'] += 1
+            return None
+
+        if isinstance(item, discord.ui.Select):
+            options = [option.value for option in item.options]
+            values = [value for value in event.get('values', []) if value in options]
+            # Scrubbed or stale values fall back to the first option
+            item._values = values or options[:1]
+        interaction = self.interaction(session, discord.InteractionType.component, message, event)
+        # Auto-generated custom_ids differ between runs; check the item that was found
+        interaction.data['custom_id'] = item.custom_id
+        return (handler or handler_name(item), interaction,
+                checked(message.view.interaction_check(interaction), lambda: item.callback(interaction)))
+
+    def resolve_modal(self, session: Session, event: Dict):
+        modal = session.modal
+        if modal is None:
+            self.unresolved[f"modal {event.get('handler')}"] += 1
+            return None
+        session.modal = None
+        inputs = [child for child in modal.children if isinstance(child, discord.ui.TextInput)]
+        for text_input, value in zip(inputs, event.get('inputs', [])):
+            fill(text_input, str(value))
+        interaction = self.interaction(session, discord.InteractionType.modal_submit, session.modal_message, event)
+        return (event.get('handler') or f'{type(modal).__qualname__}.on_submit', interaction,
+                checked(modal.interaction_check(interaction), lambda: modal.on_submit(interaction)))
+
+    def resolve_command(self, session: Session, event: Dict):
+        name = event.get('command')
+        if name not in self.app_commands:
+            self.unresolved[f'command {name}'] += 1
+            return None
+        cog, command = self.app_commands[name]
+        parameters = inspect.signature(command.callback).parameters
+        kwargs = {}
+        for key, value in (event.get('options') or {}).items():
+            parameter = parameters.get(key)
+            if parameter is None:
+                continue
+            annotation = parameter.annotation
+            if typing.get_origin(annotation) is app_commands.Choice or annotation is app_commands.Choice:
+                value = app_commands.Choice(name=str(value), value=value)
+            elif isinstance(annotation, type) and issubclass(annotation, (discord.User, discord.Member)):
+                value = self.session(value).member
+            kwargs[key] = value
+        interaction = self.interaction(session, discord.InteractionType.application_command, None, event)
+        interaction.data = {'name': name}
+        interaction.command = command
+        return (event.get('handler') or command.callback.__qualname__, interaction,
+                checked(check_command_rate_limit(interaction),
+                        lambda: command.callback(cog, interaction, **kwargs)))
+
+    async def replay_dm(self, session: Session, event: Dict):
+        member = session.member
+        attachments = [
+            FakeAttachment(f"https://cdn.example.com/replay/{member.id}-{n}{a.get('ext') or ''}",
+                           f"attachment{n}{a.get('ext') or ''}", a.get('content_type'), a.get('size') or 0)
+            for n, a in enumerate(event.get('attachments', []))
+        ]
+        message = FakeMessage(self.fake, member, member.dm_channel, 'x' * event.get('text', 0),
+                              attachments=attachments)
+        for cog in self.cogs:
+            for listener_name, listener in cog.get_listeners():
+                if listener_name != 'on_message':
+                    continue
+                name = f'{type(cog).__name__}.{listener.__name__}'
+                started = time.perf_counter()
+                try:
+                    await listener(message)
+                except Exception as e:
+                    self.recorder.handler_errors[f'{name}: {type(e).__name__}'] += 1
+                self.recorder.steps[name].append(time.perf_counter() - started)
+
+    async def dispatch(self, session: Session, event: Dict):
+        if event['e'] == 'dm':
+            await self.replay_dm(session, event)
+            return
+        kind = event.get('type')
+        if kind == 'component':
+            resolved = await self.resolve_component(session, event)
+        elif kind == 'modal_submit':
+            resolved = self.resolve_modal(session, event)
+        elif kind == 'application_command':
+            resolved = self.resolve_command(session, event)
+        else:
+            self.unresolved[f'type {kind}'] += 1
+            return
+        if resolved is None:
+            return
+        name, interaction, call = resolved
+        await self.recorder.step(name, interaction, call)
+        self.replayed += 1
+
+        # Whatever the handler showed this user is what their next events click on
+        if interaction.message is not None and interaction.message.view is not None:
+            session.messages.append(interaction.message)
+        for message in interaction.sent:
+            if message.view is not None:
+                session.messages.append(message)
+        if interaction.response.modal is not None:
+            session.modal = interaction.response.modal
+            session.modal_message = interaction.message
+
+    async def worker(self, session: Session):
+        while True:
+            item = await session.queue.get()
+            if item is None:
+                return
+            target, event = item
+            self.schedule_lag.append(max(0.0, time.perf_counter() - target))
+            await self.dispatch(session, event)
+
+    async def run(self) -> Dict:
+        await self.setup()
+        for event in self.events:
+            recorded = event.get('recorded')
+            if recorded:
+                self.recorded_durations[recorded['handler']].append(recorded['duration_ms'] / 1000)
+                if recorded.get('ack_ms') is not None:
+                    self.recorded_acks[recorded['handler']].append(recorded['ack_ms'] / 1000)
+
+        workers = {}
+        started = time.perf_counter()
+        t0 = self.events[0]['t'] if self.events else 0
+        for event in self.events:
+            target = started
+            if self.args.speed:
+                target += (event['t'] - t0) / self.args.speed
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            session = self.session(event['user'], event)
+            if event['user'] not in workers:
+                workers[event['user']] = asyncio.create_task(self.worker(session))
+            session.queue.put_nowait((target, event))
+        for pseudonym in workers:
+            self.sessions[pseudonym].queue.put_nowait(None)
+        await asyncio.gather(*workers.values())
+        wall = time.perf_counter() - started
+        await close_readers()
+        return self.report(wall)
+
+    def report(self, wall: float) -> Dict:
+        record = self.recorder
+        handlers = {}
+        for name in sorted(set(record.steps) | set(self.recorded_durations)):
+            handlers[name] = {
+                'recorded': {'duration': percentiles(self.recorded_durations.get(name, [])),
+                             'ack': percentiles(self.recorded_acks.get(name, []))},
+                'replayed': {'duration': percentiles(record.steps.get(name, [])),
+                             'ack': percentiles(record.acks.get(name, []))},
+                'deadline_misses': record.deadline_misses.get(name, 0),
+            }
+        span = self.events[-1]['t'] - self.events[0]['t'] if self.events else 0
+        return {
+            'config': {key: value for key, value in vars(self.args).items() if key != 'output'},
+            'trace': {
+                'interactions': sum(1 for event in self.events if event['e'] == 'interaction'),
+                'dms': sum(1 for event in self.events if event['e'] == 'dm'),
+                'users': len(self.sessions),
+                'span_seconds': round(span, 2),
+            },
+            'wall_seconds': round(wall, 2),
+            'replayed_interactions': self.replayed,
+            'unresolved': dict(self.unresolved),
+            'schedule_lag': percentiles(self.schedule_lag),
+            'handlers': handlers,
+            'handler_errors': dict(record.handler_errors),
+            'error_logs': dict(self.error_logs.counts),
+            'db_contention': db_contention(),
+            'discord_api_calls': dict(sorted(self.fake.api_calls.items())),
+        }
+
+def print_summary(report: Dict):
+    out = sys.stderr
+    trace = report['trace']
+    print(f"\nReplayed {report['replayed_interactions']}/{trace['interactions']} interactions and "
+          f"{trace['dms']} DMs from {trace['users']} users in {report['wall_seconds']}s "
+          f"(recorded span {trace['span_seconds']}s)", file=out)
+    print(f"{'handler':<44}{'rec p50':>9}{'rec p95':>9}{'rep p50':>9}{'rep p95':>9}{'misses':>8}  (ms)", file=out)
+    for name, stats in report['handlers'].items():
+        recorded, replayed = stats['recorded']['duration'], stats['replayed']['duration']
+        print(f"{name[:43]:<44}{recorded.get('p50_ms', '-'):>9}{recorded.get('p95_ms', '-'):>9}"
+              f"{replayed.get('p50_ms', '-'):>9}{replayed.get('p95_ms', '-'):>9}{stats['deadline_misses']:>8}",
+              file=out)
+    print(f"Schedule lag: {report['schedule_lag']}", file=out)
+    if report['unresolved']:
+        print(f"Unresolved: {report['unresolved']}", file=out)
+    if report['handler_errors']:
+        print(f"Handler errors: {report['handler_errors']}", file=out)
+    print(f"DB busy retries: {report['db_contention']['busy_retries']}, "
+          f"statement errors: {report['db_contention']['statement_errors']}", file=out)
+    if report['error_logs']:
+        print(f"Error logs: {report['error_logs']}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('traces', nargs='+', help='Trace directories or interactions.jsonl[.N.gz] files')
+    parser.add_argument('--database', help='Database to replay against (copied first); default is a fresh '
+                                           'catalog like sim_checkout')
+    parser.add_argument('--products', type=int, default=10, help='Products in the fresh catalog')
+    parser.add_argument('--stock', type=int, default=100, help='Initial stock per product in the fresh catalog')
+    parser.add_argument('--speed', type=float, default=1.0, help='Timeline speed-up (0 = as fast as possible)')
+    parser.add_argument('--wait', type=float, default=5.0, help='Seconds to wait for a staff review to appear')
+    parser.add_argument('--api-latency-ms', type=float, default=40, help='Simulated Discord API round trip')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for API latency jitter')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    events = load_trace(trace_files(args.traces))
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'replay.db')
+        if args.database:
+            shutil.copyfile(args.database, db_path)
+        configure_environment(db_path)
+        error_logs = ErrorLogCounter()
+        logging.getLogger().setLevel(logging.ERROR)
+        logging.getLogger().addHandler(error_logs)
+
+        report = asyncio.run(Replay(args, events, error_logs).run())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    print_summary(report)
+
+if __name__ == '__main__':
+    main()
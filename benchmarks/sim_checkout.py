@@ -0,0 +1,595 @@
+"""
+Offline end-to-end checkout simulator
+
+Drives the real StockView → CategorySelect → ProductView → BuyModal →
+CartView → PaymentMethodView → DM proof → ReviewView path with fake Discord objects
+against a fresh SQLite database. Simulated buyers run concurrently while
+staff reviewers accept or reject the proofs that reach the staff channel.
+With --auto-pay, that share of buyers pays into the local payment ledger
+instead of uploading proof, and the payment verifier completes their
+orders without a staff review. --quotes prices crypto checkouts from the
+fixture rate source, so those payments are matched by exact coin amount.
+
+Each buyer puts up to --basket products in their cart before checking
+out. Reports throughput, per-step and end-to-end latency percentiles, 3s
+deadline misses, staff reviews per order line, oversell incidents (paid orders that could not be
+fulfilled, or completions beyond the initial stock), completed units that
+were not delivered a key, and DB contention.
+Usage:
+
+    python benchmarks/sim_checkout.py [--buyers 2000] [--concurrency 500]
+                                      [--reviewers 4] [--products 10] [--stock 100] [--basket 3]
+                                      [--auto-pay 0] [--poll-ms 1000] [--quotes]
+                                      [--api-latency-ms 40] [--output report.json]
+                                      [--record traces/]
+
+--record writes the simulated interactions as an anonymized trace that
+benchmarks/replay_interactions.py can replay.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import (FakeAttachment, FakeBot, FakeDiscord, FakeGuild, FakeInteraction, FakeMember,
+                              FakeMessage, FakeRole, FakeTextChannel, component_data, fill, find_item,
+                              modal_data, order_id_from, select)
+from cogs.order_management import OrderManagement, RejectModal
+from cogs.payment_verification import PaymentVerification
+from database.db_manager import DatabaseManager
+from database.instrumentation import query_stats
+from ui.components import BuyModal, CartView, CategorySelect, StockView
+from utils.interaction_recorder import interaction_recorder
+from utils.payment_methods import payment_methods
+from utils.payment_providers import METHODS, LocalLedgerProvider, Transfer
+from utils.payment_verifier import PaymentVerifier
+from utils.quotes import FixtureRateSource, quotes
+from utils.rate_limiter import rate_limiter
+
+GUILD_ID = 1000
+MAIN_CHANNEL_ID = 1001
+STAFF_CHANNEL_ID = 1002
+PUBLIC_LOG_CHANNEL_ID = 1003
+STAFF_ROLE_ID = 2001
+CUSTOMER_ROLE_ID = 2002
+OWNER_ROLE_ID = 2003
+CATEGORY = 'best_sold'
+PERCENTILES = (50, 90, 95, 99)
+
+def configure_environment(db_path: str):
+    """The cogs and views read their configuration from the environment at import/init time"""
+    os.environ.update({
+        'DATABASE_PATH': db_path,
+        'MAIN_CHANNEL_ID': str(MAIN_CHANNEL_ID),
+        'STAFF_CHANNEL_ID': str(STAFF_CHANNEL_ID),
+        'PUBLIC_LOG_CHANNEL_ID': str(PUBLIC_LOG_CHANNEL_ID),
+        'STAFF_ROLE_IDS': str(STAFF_ROLE_ID),
+        'CUSTOMER_ROLE_ID': str(CUSTOMER_ROLE_ID),
+        'OWNER_ROLE_ID': str(OWNER_ROLE_ID),
+        'PAYPAL_EMAIL': 'shop@example.com',
+        **{f'{coin.upper()}_ADDRESS': f'sim-{coin}-address' for coin in ('btc', 'eth', 'ltc', 'usdt', 'sol')},
+        'PAYMENT_LEDGER_PATH': os.path.join(os.path.dirname(db_path), 'ledger.db'),
+    })
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    result = {'count': len(ordered)}
+    for p in PERCENTILES:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        result[f'p{p}_ms'] = round(ordered[index] * 1000, 1)
+    result['max_ms'] = round(ordered[-1] * 1000, 1)
+    return result
+
+def db_contention() -> Dict:
+    """Busy retries, statement errors and the slowest DatabaseManager methods"""
+    return {
+        'busy_retries': sum(stats.busy_retries for stats in query_stats.methods.values()),
+        'statement_errors': sum(stats.errors for stats in query_stats.methods.values()),
+        'methods': {
+            name: {
+                'calls': stats.calls,
+                'mean_ms': round(stats.total / stats.calls * 1000, 2) if stats.calls else 0,
+                'p95_ms': round(query_stats.p95(name) * 1000, 1),
+                'max_ms': round(stats.max * 1000, 1),
+                'busy_retries': stats.busy_retries,
+                'errors': stats.errors,
+            }
+            for name, stats in query_stats.top(20)
+        },
+    }
+
+class ErrorLogCounter(logging.Handler):
+    """Counts error log records by message prefix (e.g. 'Error updating order')"""
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.counts: Counter = Counter()
+
+    def emit(self, record: logging.LogRecord):
+        self.counts[record.getMessage().split(':', 1)[0][:80]] += 1
+
+class Recorder:
+    def __init__(self):
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.acks: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Counter = Counter()
+        self.deadline_misses: Counter = Counter()
+        self.handler_errors: Counter = Counter()
+        self.checkout: List[float] = []
+        self.end_to_end: List[float] = []
+        self.started_at: Dict[str, float] = {}
+
+    async def step(self, name: str, interaction, call) -> bool:
+        """Run one handler; False if it raised"""
+        started = time.perf_counter()
+        interaction_recorder.record_interaction(interaction)
+        try:
+            await call
+            return True
+        except Exception as e:
+            self.handler_errors[f'{name}: {type(e).__name__}'] += 1
+            return False
+        finally:
+            self.steps[name].append(time.perf_counter() - started)
+            if interaction.ack_after is not None:
+                self.acks[name].append(interaction.ack_after)
+                if interaction.ack_after > 3.0:
+                    self.deadline_misses[name] += 1
+            else:
+                self.deadline_misses[name] += 1
+
+class Simulation:
+    def __init__(self, args, error_logs: ErrorLogCounter):
+        self.args = args
+        self.error_logs = error_logs
+        self.rng = random.Random(args.seed)
+        self.fake = FakeDiscord(args.api_latency_ms, seed=args.seed)
+        self.guild = FakeGuild(self.fake, GUILD_ID)
+        self.staff_role = FakeRole(STAFF_ROLE_ID, 'Staff')
+        for role in (self.staff_role, FakeRole(CUSTOMER_ROLE_ID, 'Customer'), FakeRole(OWNER_ROLE_ID, 'Owner')):
+            self.guild.roles[role.id] = role
+        self.bot = FakeBot(self.fake, self.guild)
+        self.review_queue: asyncio.Queue = asyncio.Queue()
+        for channel_id, name in ((MAIN_CHANNEL_ID, 'shop'), (PUBLIC_LOG_CHANNEL_ID, 'purchases')):
+            self.bot.channels[channel_id] = FakeTextChannel(self.fake, channel_id, name)
+        self.bot.channels[STAFF_CHANNEL_ID] = FakeTextChannel(
+            self.fake, STAFF_CHANNEL_ID, 'staff-review', on_send=self.review_queue.put_nowait
+        )
+        self.staff = []
+        for n in range(args.reviewers):
+            member = FakeMember(self.fake, 10_000 + n, f'staff{n}', [self.staff_role], self.guild)
+            self.guild.members[member.id] = member
+            self.staff.append(member)
+        # Simulated staff review at machine speed; real staff never hit the per-user limit
+        for action in ('ReviewView.accept_payment', 'ReviewView.reject_payment', 'RejectModal.on_submit'):
+            rate_limiter.limits[action] = None
+        self.recorder = Recorder()
+        self.orders_cog = None
+        self.payments_cog = None
+        self.ledger = None
+        self.products: List[Dict] = []
+
+    async def setup(self):
+        db = DatabaseManager(os.getenv('DATABASE_PATH'))
+        await db.init_db()
+        # As PaymentsManagement.cog_load does
+        await payment_methods.load(db)
+        for n in range(self.args.products):
+            await db.add_product(f'Product {n:02d}', CATEGORY, round(5 + n * 2.5, 2), f'Simulated product {n}',
+                                 None, json.dumps([f'Item {n}']), self.args.stock)
+        self.products = await db.get_products_by_category(CATEGORY)
+        # Every unit of stock is a key, so approvals run the per-unit claim
+        for product in self.products:
+            await db.add_deliverable_units(
+                product['id'], [f"KEY-{product['id']}-{unit:06d}" for unit in range(self.args.stock)], 'sim'
+            )
+        self.orders_cog = OrderManagement(self.bot)
+        self.payments_cog = PaymentVerification(self.bot)
+        if self.args.auto_pay:
+            # Every method is verified against the local ledger
+            self.payments_cog.verifier = PaymentVerifier(self.payments_cog.db, {method: 'local' for method in METHODS})
+            self.ledger = LocalLedgerProvider()
+        if self.args.quotes:
+            quotes.source = FixtureRateSource()
+            await quotes.refresh()
+
+    def interaction(self, user, type: discord.InteractionType = discord.InteractionType.component,
+                    message: Optional[FakeMessage] = None, data: Optional[Dict] = None) -> FakeInteraction:
+        interaction = FakeInteraction(self.fake, self.bot, user, type, message)
+        interaction.data = data or {}
+        return interaction
+
+    async def think(self):
+        if self.args.think_ms:
+            await asyncio.sleep(self.rng.uniform(0, self.args.think_ms) / 1000)
+
+    def pick_product(self) -> str:
+        # Skewed demand: a few hot products take most of the traffic
+        weights = [1 / (rank + 1) for rank in range(len(self.products))]
+        return self.rng.choices(self.products, weights)[0]['name']
+
+    async def buyer(self, n: int):
+        record = self.recorder
+        member = FakeMember(self.fake, 100_000 + n, f'buyer{n}', [], self.guild)
+        self.guild.members[member.id] = member
+        started = time.perf_counter()
+        panel = self.bot.get_channel(MAIN_CHANNEL_ID)
+
+        # Show Stock
+        stock_view = StockView()
+        button = find_item(stock_view, custom_id='show_stock')
+        interaction = self.interaction(member, message=FakeMessage(self.fake, self.bot.user, panel, view=stock_view),
+                                       data=component_data(button))
+        if not await record.step('show_stock', interaction, button.callback(interaction)):
+            record.outcomes['failed:show_stock'] += 1
+            return
+        view = interaction.last_view()
+        await self.think()
+
+        # Category select
+        category_select = find_item(view, CategorySelect)
+        select(category_select, CATEGORY)
+        interaction = self.interaction(member, data=component_data(category_select))
+        if not await record.step('category_select', interaction, category_select.callback(interaction)):
+            record.outcomes['failed:category_select'] += 1
+            return
+        product_view = interaction.last_view()
+        if product_view is None:
+            record.outcomes['no_products'] += 1
+            return
+        await self.think()
+
+        # Buy button and quantity modal, once per product put in the cart
+        cart_view = None
+        for _ in range(self.rng.randint(1, self.args.basket)):
+            buy = find_item(product_view, custom_id=f'buy_{self.pick_product()}')
+            interaction = self.interaction(member, data=component_data(buy))
+            if not await record.step('buy_button', interaction, buy.callback(interaction)):
+                record.outcomes['failed:buy_button'] += 1
+                continue
+            modal = interaction.response.modal
+            if not isinstance(modal, BuyModal):
+                record.outcomes['sold_out_on_list'] += 1
+                continue
+            await self.think()
+
+            fill(modal.quantity, str(self.rng.randint(1, self.args.max_quantity)))
+            interaction = self.interaction(member, discord.InteractionType.modal_submit, data=modal_data(modal))
+            if not await record.step('buy_modal', interaction, modal.on_submit(interaction)):
+                record.outcomes['failed:buy_modal'] += 1
+                continue
+            if isinstance(interaction.last_view(), CartView):
+                cart_view = interaction.last_view()
+            else:
+                record.outcomes['sold_out_on_quantity'] += 1
+            await self.think()
+        if cart_view is None:
+            return
+
+        # Checkout
+        checkout = find_item(cart_view, custom_id='cart_checkout')
+        interaction = self.interaction(member, data=component_data(checkout))
+        if not await record.step('cart_checkout', interaction, checkout.callback(interaction)):
+            record.outcomes['failed:cart_checkout'] += 1
+            return
+        payment_view = interaction.last_view()
+        await self.think()
+
+        # Payment method
+        if self.rng.random() < self.args.crypto_rate:
+            crypto = [item for item in payment_view.children if getattr(item, 'label', '') == 'Crypto'][0]
+            interaction = self.interaction(member, data=component_data(crypto))
+            if not await record.step('crypto_button', interaction, crypto.callback(interaction)):
+                record.outcomes['failed:crypto_button'] += 1
+                return
+            crypto_view = interaction.last_view()
+            coin_select = find_item(crypto_view, discord.ui.Select)
+            method = self.rng.choice(['btc', 'eth', 'ltc', 'usdt', 'sol'])
+            select(coin_select, method)
+            interaction = self.interaction(member, data=component_data(coin_select))
+            ok = await record.step('payment_method', interaction, coin_select.callback(interaction))
+        else:
+            method = 'paypal'
+            paypal = [item for item in payment_view.children if getattr(item, 'label', '') == 'PayPal'][0]
+            interaction = self.interaction(member, data=component_data(paypal))
+            ok = await record.step('payment_method', interaction, paypal.callback(interaction))
+        order_id = order_id_from(member.dm_channel.messages[-1]) if member.dm_channel.messages else None
+        if ok and order_id is None and 'Not enough stock' in interaction.last_text():
+            record.outcomes['sold_out_at_checkout'] += 1
+            return
+        if not ok or order_id is None:
+            record.outcomes['failed:create_order'] += 1
+            return
+        await self.think()
+
+        if self.ledger and self.rng.random() < self.args.auto_pay:
+            # Pay into the ledger; some buyers forget the order ID and are matched by amount
+            order = await self.payments_cog.db.get_order_by_id(order_id)
+            memo = order_id if self.rng.random() >= self.args.no_memo_rate else ''
+            await self.ledger.add_transfer(Transfer(method, f'tx-{order_id}', order['total_price'], memo,
+                                                    coin_amount=order['quote_amount']))
+            record.checkout.append(time.perf_counter() - started)
+            record.started_at[order_id] = started
+            record.outcomes['auto_paid'] += 1
+            return
+
+        # Payment proof in DMs
+        proof = FakeMessage(self.fake, member, member.dm_channel, attachments=[
+            FakeAttachment(f'https://cdn.example.com/proofs/{order_id}.png', 'proof.png', 'image/png', 48_000)
+        ])
+        interaction_recorder.record_dm(proof)
+        listener_started = time.perf_counter()
+        try:
+            await self.orders_cog.on_message(proof)
+        except Exception as e:
+            record.handler_errors[f'proof_listener: {type(e).__name__}'] += 1
+        record.steps['proof_listener'].append(time.perf_counter() - listener_started)
+        if 'received' not in (member.dm_channel.messages[-1].content or ''):
+            record.outcomes['failed:proof'] += 1
+            return
+
+        record.checkout.append(time.perf_counter() - started)
+        record.started_at[order_id] = started
+        record.outcomes['proof_submitted'] += 1
+
+    async def reviewer(self, staff_member):
+        record = self.recorder
+        while True:
+            message = await self.review_queue.get()
+            if message is None:
+                return
+            view = message.view
+            if view is None:
+                # Payment verifier notices need no action
+                continue
+            if self.args.review_ms:
+                await asyncio.sleep(self.rng.uniform(0, self.args.review_ms) / 1000)
+
+            if self.rng.random() < self.args.reject_rate:
+                button = find_item(view, custom_id='reject_payment')
+                interaction = self.interaction(staff_member, message=message, data=component_data(button))
+                if not await record.step('reject_button', interaction, button.callback(interaction)):
+                    continue
+                modal = interaction.response.modal
+                if not isinstance(modal, RejectModal):
+                    continue
+                fill(modal.reason, 'Simulated rejection')
+                interaction = self.interaction(staff_member, discord.InteractionType.modal_submit, message,
+                                               modal_data(modal))
+                await record.step('reject_modal', interaction, modal.on_submit(interaction))
+                record.outcomes['rejected' if 'rejected' in interaction.last_text() else 'failed:reject'] += 1
+                continue
+
+            button = find_item(view, custom_id='accept_payment')
+            interaction = self.interaction(staff_member, message=message, data=component_data(button))
+            await record.step('accept_payment', interaction, button.callback(interaction))
+            if 'completed successfully' in interaction.last_text():
+                record.outcomes['completed'] += 1
+                started = record.started_at.get(view.order_id)
+                if started is not None:
+                    record.end_to_end.append(time.perf_counter() - started)
+            else:
+                record.outcomes['failed:accept'] += 1
+
+    async def verify_payments(self):
+        """One payment verifier poll, as the PaymentVerification cog runs it"""
+        record = self.recorder
+        started = time.perf_counter()
+        results = await self.payments_cog.verifier.poll(self.payments_cog.complete)
+        record.steps['verify_payments'].append(time.perf_counter() - started)
+        for transfer, order, outcome in results:
+            if outcome == 'matched':
+                record.outcomes['auto_completed'] += 1
+                record.end_to_end.append(time.perf_counter() - record.started_at[order['order_id']])
+            else:
+                record.outcomes[f'auto_pay:{outcome}'] += 1
+        if results:
+            await self.payments_cog.report(results)
+
+    async def verifier(self, done: asyncio.Event):
+        while not done.is_set():
+            await self.verify_payments()
+            try:
+                await asyncio.wait_for(done.wait(), self.args.poll_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+        # Payments made after the last poll
+        await self.verify_payments()
+
+    async def run(self) -> Dict:
+        await self.setup()
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        buyers_finished = asyncio.Event()
+
+        async def limited(n: int):
+            async with semaphore:
+                await self.buyer(n)
+
+        started = time.perf_counter()
+        reviewers = [asyncio.create_task(self.reviewer(member)) for member in self.staff]
+        verifier = asyncio.create_task(self.verifier(buyers_finished)) if self.ledger else None
+        buyers = []
+        for n in range(self.args.buyers):
+            buyers.append(asyncio.create_task(limited(n)))
+            if self.args.arrival_rate:
+                await asyncio.sleep(self.rng.expovariate(self.args.arrival_rate))
+        await asyncio.gather(*buyers)
+        buyers_done = time.perf_counter() - started
+        buyers_finished.set()
+        if verifier:
+            await verifier
+        # Staff messages are queued as they are sent; stop reviewers once the backlog is drained
+        for _ in reviewers:
+            self.review_queue.put_nowait(None)
+        await asyncio.gather(*reviewers)
+        wall = time.perf_counter() - started
+        return self.report(wall, buyers_done)
+
+    def inventory(self) -> Dict:
+        """Oversell check straight from the database"""
+        conn = sqlite3.connect(os.getenv('DATABASE_PATH'))
+        try:
+            rows = conn.execute('''
+                SELECT p.id, p.name, p.stock,
+                       COALESCE(SUM(CASE WHEN o.status = 'completed' THEN i.quantity END), 0),
+                       COALESCE(SUM(CASE WHEN o.status = 'pending_proof' AND o.proof_image IS NOT NULL
+                                         THEN i.quantity END), 0),
+                       p.stock_reserved,
+                       (SELECT COUNT(*) FROM deliverable_units u
+                        WHERE u.product_id = p.id AND u.order_id IS NOT NULL)
+                FROM products p
+                LEFT JOIN order_items i ON i.product_id = p.id
+                LEFT JOIN orders o ON o.order_id = i.order_id
+                GROUP BY p.id ORDER BY p.id
+            ''').fetchall()
+            stranded_orders, = conn.execute('''
+                SELECT COUNT(*) FROM orders WHERE status = 'pending_proof' AND proof_image IS NOT NULL
+            ''').fetchone()
+            reviewed_orders, reviewed_lines = conn.execute('''
+                SELECT COUNT(DISTINCT o.id), COUNT(i.id)
+                FROM orders o JOIN order_items i ON i.order_id = o.order_id
+                WHERE o.proof_image IS NOT NULL
+            ''').fetchone()
+        finally:
+            conn.close()
+
+        products = []
+        oversold_units = 0
+        undelivered_units = 0
+        for product_id, name, stock, completed, stranded_units, reserved, delivered in rows:
+            undelivered_units += completed - delivered
+            oversold = max(0, completed - self.args.stock)
+            oversold_units += oversold
+            products.append({
+                'product': name, 'initial_stock': self.args.stock, 'final_stock': stock,
+                'completed_units': completed, 'paid_unfulfilled_units': stranded_units,
+                'oversold_units': oversold, 'reserved_units': reserved, 'delivered_units': delivered,
+            })
+        return {
+            # Completions beyond the initial stock (stock accounting broken)
+            'oversold_units': oversold_units,
+            # Buyers who paid and uploaded proof but whose order could not be completed
+            'paid_unfulfilled_orders': stranded_orders,
+            'negative_stock_products': sum(1 for p in products if p['final_stock'] < 0),
+            # Completed units that were not handed a key
+            'undelivered_units': undelivered_units,
+            # One staff review covers every line of a cart
+            'staff_reviews': sum(1 for message in self.bot.get_channel(STAFF_CHANNEL_ID).messages if message.view),
+            'lines_per_review': round(reviewed_lines / reviewed_orders, 2) if reviewed_orders else 0,
+            'products': products,
+        }
+
+    def report(self, wall: float, buyers_done: float) -> Dict:
+        record = self.recorder
+        interactions = sum(len(values) for values in record.steps.values())
+        return {
+            'config': {key: value for key, value in vars(self.args).items() if key not in ('output', 'record')},
+            'wall_seconds': round(wall, 2),
+            'buyers_seconds': round(buyers_done, 2),
+            'throughput': {
+                'checkouts_per_sec': round(len(record.checkout) / buyers_done, 1) if buyers_done else 0,
+                'completed_orders_per_sec': round(record.outcomes['completed'] / wall, 1) if wall else 0,
+                'handler_calls_per_sec': round(interactions / wall, 1) if wall else 0,
+            },
+            'outcomes': dict(record.outcomes),
+            'latency': {
+                'checkout_to_proof': percentiles(record.checkout),
+                'checkout_to_completion': percentiles(record.end_to_end),
+                'steps': {name: percentiles(values) for name, values in record.steps.items()},
+                'ack': {name: percentiles(values) for name, values in record.acks.items()},
+            },
+            'deadline_misses': dict(record.deadline_misses),
+            'handler_errors': dict(record.handler_errors),
+            'error_logs': dict(self.error_logs.counts),
+            'inventory': self.inventory(),
+            'db_contention': db_contention(),
+            'discord_api_calls': dict(sorted(self.fake.api_calls.items())),
+        }
+
+def print_summary(report: Dict):
+    out = sys.stderr
+    print(f"\nWall {report['wall_seconds']}s (buyers {report['buyers_seconds']}s)", file=out)
+    print(f"Throughput: {report['throughput']}", file=out)
+    print(f"Outcomes: {report['outcomes']}", file=out)
+    print(f"{'step':<20}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)", file=out)
+    for name, stats in list(report['latency']['steps'].items()) + [
+            ('checkout→proof', report['latency']['checkout_to_proof']),
+            ('checkout→complete', report['latency']['checkout_to_completion'])]:
+        if stats['count']:
+            print(f"{name:<20}{stats['count']:>7}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                  f"{stats['p99_ms']:>9}{stats['max_ms']:>9}", file=out)
+    inventory = report['inventory']
+    print(f"Oversold units: {inventory['oversold_units']}, paid but unfulfilled orders: "
+          f"{inventory['paid_unfulfilled_orders']}, negative stock: {inventory['negative_stock_products']}, "
+          f"undelivered units: {inventory['undelivered_units']}",
+          file=out)
+    print(f"Staff reviews: {inventory['staff_reviews']} ({inventory['lines_per_review']} order lines each)", file=out)
+    print(f"Deadline misses: {report['deadline_misses']}", file=out)
+    print(f"DB busy retries: {report['db_contention']['busy_retries']}, "
+          f"statement errors: {report['db_contention']['statement_errors']}", file=out)
+    if report['error_logs']:
+        print(f"Error logs: {report['error_logs']}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buyers', type=int, default=2000, help='Simulated buyers')
+    parser.add_argument('--concurrency', type=int, default=500, help='Buyers in the checkout flow at once')
+    parser.add_argument('--arrival-rate', type=float, default=0, help='Buyers per second (0 = all at once)')
+    parser.add_argument('--reviewers', type=int, default=4, help='Staff members reviewing proofs')
+    parser.add_argument('--products', type=int, default=10, help='Products in the simulated category')
+    parser.add_argument('--stock', type=int, default=100, help='Initial stock per product')
+    parser.add_argument('--max-quantity', type=int, default=3, help='Largest quantity a buyer orders')
+    parser.add_argument('--basket', type=int, default=3, help='Most products a buyer puts in their cart')
+    parser.add_argument('--crypto-rate', type=float, default=0.5, help='Share of buyers paying with crypto')
+    parser.add_argument('--reject-rate', type=float, default=0.05, help='Share of proofs staff reject')
+    parser.add_argument('--auto-pay', type=float, default=0, help='Share of buyers paid through the payment verifier')
+    parser.add_argument('--no-memo-rate', type=float, default=0.2,
+                        help='Share of verified payments without the order ID in the memo')
+    parser.add_argument('--poll-ms', type=float, default=1000, help='Payment verifier poll interval')
+    parser.add_argument('--quotes', action='store_true', help='Quote crypto checkouts from fixture rates')
+    parser.add_argument('--api-latency-ms', type=float, default=40, help='Simulated Discord API round trip')
+    parser.add_argument('--think-ms', type=float, default=200, help='Max buyer pause between steps')
+    parser.add_argument('--review-ms', type=float, default=0, help='Max staff pause before reviewing')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--record', metavar='DIR', help='Record an interaction trace into this directory')
+    args = parser.parse_args()
+
+    if args.record:
+        interaction_recorder.enabled = True
+        interaction_recorder.directory = args.record
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(os.path.join(directory, 'sim.db'))
+        # Count error logs from the shop code instead of printing them
+        error_logs = ErrorLogCounter()
+        logging.getLogger().setLevel(logging.ERROR)
+        logging.getLogger().addHandler(error_logs)
+
+        report = asyncio.run(Simulation(args, error_logs).run())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    print_summary(report)
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,27 @@
+import time
+_imports_started = time.perf_counter()
+
 import os
 import sys
 import logging
 import asyncio
 from dotenv import load_dotenv
+
+# Încarcă variabilele din .env
+# Before any project import: utils/ and database/ modules read their settings at import time
+load_dotenv()
+
 import discord
 from discord.ext import commands
 from pathlib import Path
-from ui.components import StockView
-
-# ------------------- Tiny Flask webserver pentru Render -------------------
-from flask import Flask
-from threading import Thread
-
-app = Flask("healthcheck")
-
-@app.route("/")
-def home():
-    return "I'm alive"
-
-def run_flask():
-    port = int(os.environ.get("PORT", 10000))
-    app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False)
-
-# Pornește Flask în fundal înainte de bot
-Thread(target=run_flask).start()
-# -------------------------------------------------------------------------
+from utils.startup import startup_timer, profile_imports
+from utils.health_server import HealthServer
+from utils.loop_monitor import loop_monitor
+from utils.interaction_recorder import interaction_recorder
+from utils.metrics import metrics
+from utils.tracing import RateLimitedCommandTree
+from database.analytics import close_readers
+from database.writer import close_writers
 
 # Logging simplificat, compatibil cu Render
 logging.basicConfig(
@@ -33,8 +30,7 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)]
 )
 
-# Încarcă variabilele din .env
-load_dotenv()
+startup_timer.record('imports', time.perf_counter() - _imports_started)
 
 REQUIRED_ENV_VARS = [
     'DISCORD_TOKEN',
@@ -56,7 +52,17 @@ if missing_vars:
     sys.exit(1)
 
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix='/', intents=intents)
+bot = commands.Bot(command_prefix='/', intents=intents, tree_cls=RateLimitedCommandTree)
+
+# Health/readiness/metrics endpoint (Render pings the root path)
+health_server = HealthServer(bot, port=int(os.environ.get("PORT", 10000)))
+
+interactions_total = metrics.counter(
+    'novacore_interactions_total', 'Interactions received', ['type']
+)
+command_latency = metrics.histogram(
+    'novacore_command_latency_seconds', 'Time from interaction creation to command completion', ['command']
+)
 
 # Creează directoarele necesare
 Path(os.getenv('LOG_DIR')).mkdir(parents=True, exist_ok=True)
@@ -69,28 +75,48 @@ async def init_database():
     await db.init_db()
     logging.info('Database initialized successfully')
 
+def extension_names():
+    """Get the module names of all cog extensions"""
+    return [f'cogs.{filename.stem}' for filename in sorted(Path('./cogs').glob('*.py'))
+            if filename.stem != '__init__']
+
+async def load_extension(name: str):
+    """Load a single cog extension, logging how long it took"""
+    started = time.perf_counter()
+    try:
+        await bot.load_extension(name)
+        logging.info(f'Loaded extension {name} in {(time.perf_counter() - started) * 1000:.0f} ms')
+    except Exception as e:
+        logging.error(f'Failed to load extension {name}: {str(e)}')
+
 async def load_extensions():
-    """Load all cog extensions"""
-    for filename in Path('./cogs').glob('*.py'):
-        if filename.stem != '__init__':
-            try:
-                await bot.load_extension(f'cogs.{filename.stem}')
-                logging.info(f'Loaded extension {filename.stem}')
-            except Exception as e:
-                logging.error(f'Failed to load extension {filename.stem}: {str(e)}')
+    """Load all cog extensions concurrently (cogs do not depend on each other)"""
+    await asyncio.gather(*(load_extension(name) for name in extension_names()))
 
 @bot.event
 async def setup_hook():
     """Setup hook called before bot starts"""
-    await init_database()
-    await load_extensions()
+    loop_monitor.start()
+    with startup_timer.phase('db_init'):
+        await init_database()
+    with startup_timer.phase('extension_load'):
+        await load_extensions()
 
 @bot.event
 async def on_ready():
     """Handler for when bot is ready"""
     logging.info(f'Logged in as {bot.user.name} ({bot.user.id})')
-    await bot.tree.sync()
-    
+    with startup_timer.phase('tree_sync'):
+        await bot.tree.sync()
+
+    with startup_timer.phase('panel_setup'):
+        await setup_stock_panel()
+    startup_timer.log_summary()
+
+async def setup_stock_panel():
+    """Replace old stock panel messages with a fresh one"""
+    from ui.components import StockView
+
     try:
         channel = bot.get_channel(int(os.getenv('MAIN_CHANNEL_ID')))
         if channel:
@@ -125,6 +151,22 @@ async def on_ready():
     except Exception as e:
         logging.error(f'Error setting up stock panel: {str(e)}')
 
+@bot.event
+async def on_interaction(interaction: discord.Interaction):
+    interactions_total.inc(type=interaction.type.name)
+    interaction_recorder.record_interaction(interaction)
+
+@bot.listen('on_message')
+async def record_direct_message(message: discord.Message):
+    """Record DMs (payment proofs) for interaction traces"""
+    if interaction_recorder.enabled and not message.author.bot and message.guild is None:
+        interaction_recorder.record_dm(message)
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    command_latency.observe(elapsed, command=command.qualified_name)
+
 @bot.event
 async def on_command_error(ctx, error):
     if isinstance(error, commands.errors.CheckFailure):
@@ -135,10 +177,33 @@ async def on_command_error(ctx, error):
         logging.error(f'Unhandled error: {str(error)}')
         await ctx.send("An error occurred. Please try again later.")
 
+async def run_bot():
+    """Run the bot and shut the health server, loop monitor and DB connections down with it"""
+    async with bot:
+        try:
+            # Bound before logging in, so PORT answers while the bot connects (or fails to)
+            with startup_timer.phase('health_server'):
+                await health_server.start()
+            await bot.start(os.getenv('DISCORD_TOKEN'))
+        finally:
+            await health_server.stop()
+            await loop_monitor.stop()
+            await close_writers()
+            await close_readers()
+
 def main():
     """Main entry point for the bot"""
+    if '--profile-startup' in sys.argv:
+        output_path = os.path.join(os.getenv('LOG_DIR'), 'startup_imports.txt')
+        modules = ['discord', 'aiosqlite', 'ui.components', 'database.db_manager'] + extension_names()
+        print(profile_imports(modules, output_path))
+        logging.info(f'Import-time breakdown written to {output_path}')
+        return
+
     try:
-        bot.run(os.getenv('DISCORD_TOKEN'))
+        asyncio.run(run_bot())
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
         logging.critical(f'Fatal error: {str(e)}')
         sys.exit(1)
@@ -3,6 +3,7 @@ from discord.ext import commands
 from discord import app_commands
 import os
 import logging
+from utils.tracing import traced
 
 class AdminCommands(commands.Cog):
     def __init__(self, bot):
@@ -14,6 +15,7 @@ class AdminCommands(commands.Cog):
         message="The message content",
         author="The author/sender name"
     )
+    @traced()
     async def send_message(
         self, 
         interaction: discord.Interaction, 
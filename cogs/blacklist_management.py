@@ -0,0 +1,106 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import os
+from typing import Optional
+from database.db_manager import DatabaseManager
+from utils.blacklist import blacklist
+from utils.tracing import traced
+
+class BlacklistManagement(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = DatabaseManager(os.getenv('DATABASE_PATH'))
+        self._staff_role_ids = set(map(int, os.getenv('STAFF_ROLE_IDS').split(',')))
+
+    async def cog_load(self):
+        await blacklist.load(self.db)
+
+    def is_staff(self, member: discord.Member) -> bool:
+        """Check if member has staff role"""
+        return any(role.id in self._staff_role_ids for role in member.roles) or \
+               member.guild_permissions.administrator
+
+    @app_commands.command(name="blacklist")
+    @app_commands.describe(
+        user="User to block from ordering and opening tickets",
+        reason="Reason for the blacklist"
+    )
+    @traced()
+    async def add_blacklist(self, interaction: discord.Interaction, user: discord.User,
+                            reason: Optional[str] = None):
+        """Block a user from ordering and opening tickets"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        success = await self.db.add_to_blacklist(str(user.id), reason, str(interaction.user.id))
+        if success:
+            blacklist.add(user.id)
+            await interaction.response.send_message(
+                f"⛔ {user.mention} has been blacklisted." + (f"\n**Reason:** {reason}" if reason else ""),
+                ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                "Failed to blacklist user. Please try again.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="unblacklist")
+    @app_commands.describe(user="User to remove from the blacklist")
+    @traced()
+    async def remove_blacklist(self, interaction: discord.Interaction, user: discord.User):
+        """Remove a user from the blacklist"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        removed = await self.db.remove_from_blacklist(str(user.id))
+        if removed:
+            blacklist.remove(user.id)
+            await interaction.response.send_message(
+                f"✅ {user.mention} has been removed from the blacklist.",
+                ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                f"{user.mention} is not blacklisted.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="blacklisted")
+    @traced()
+    async def list_blacklist(self, interaction: discord.Interaction):
+        """List blacklisted users"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        entries = await self.db.get_blacklist()
+        embed = discord.Embed(
+            title="⛔ Blacklisted Users",
+            description=f"{len(entries)} user(s) blacklisted" if entries else "No users are blacklisted.",
+            color=0xff0000
+        )
+        # Embeds hold at most 25 fields; newest entries first
+        for entry in entries[:25]:
+            embed.add_field(
+                name=f"User {entry['user_id']}",
+                value=f"<@{entry['user_id']}> • {entry['reason'] or 'No reason'}\n"
+                      f"Added by <@{entry['added_by']}> on {entry['created_at']}",
+                inline=False
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(BlacklistManagement(bot))
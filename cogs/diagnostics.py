@@ -0,0 +1,195 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import os
+import io
+import logging
+from datetime import datetime
+from database.instrumentation import query_stats, SLOW_QUERY_MS
+from utils.tracing import traced
+from utils.loop_monitor import loop_monitor
+from utils.profiler import profiler, PROFILE_MAX_SECONDS
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self._staff_role_ids = set(map(int, os.getenv('STAFF_ROLE_IDS').split(',')))
+        self._owner_role_id = int(os.getenv('OWNER_ROLE_ID'))
+
+    def is_staff(self, member: discord.Member) -> bool:
+        """Check if member has staff role"""
+        return any(role.id in self._staff_role_ids for role in member.roles) or \
+               member.guild_permissions.administrator
+
+    def is_owner(self, member: discord.Member) -> bool:
+        """Check if member has owner role"""
+        return self._owner_role_id in [r.id for r in member.roles] or \
+               member.guild.owner_id == member.id
+
+    @app_commands.command(name="dbstats")
+    @app_commands.describe(reset="Clear the collected statistics after showing them")
+    @traced()
+    async def dbstats(self, interaction: discord.Interaction, reset: bool = False):
+        """View database query timings per DatabaseManager method"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        embed = discord.Embed(
+            title="🗄️ Database Statistics",
+            description=f"Slow query threshold: **{SLOW_QUERY_MS:.0f} ms**",
+            color=0x8b5cf6
+        )
+
+        top = query_stats.top(12)
+        if top:
+            lines = [f"{'method':<24}{'calls':>6}{'avg':>7}{'p95':>7}{'max':>7}{'rows':>7}{'err':>5}{'busy':>5}"]
+            for name, stats in top:
+                avg = stats.total / stats.calls * 1000 if stats.calls else 0
+                lines.append(
+                    f"{name[:23]:<24}{stats.calls:>6}{avg:>7.1f}{query_stats.p95(name) * 1000:>7.0f}"
+                    f"{stats.max * 1000:>7.1f}{stats.rows:>7}{stats.errors:>5}{stats.busy_retries:>5}"
+                )
+            embed.add_field(
+                name="Methods by total time (ms)",
+                value="```\n" + "\n".join(lines)[:1000] + "\n```",
+                inline=False
+            )
+        else:
+            embed.add_field(name="Methods", value="No queries recorded yet.", inline=False)
+
+        if query_stats.slow_queries:
+            slow = [
+                f"`{datetime.fromtimestamp(at).strftime('%H:%M:%S')}` **{method}** {elapsed * 1000:.0f} ms — {sql[:80]}"
+                for at, method, elapsed, sql in list(query_stats.slow_queries)[-5:]
+            ]
+            embed.add_field(name="Recent slow queries", value="\n".join(slow)[:1024], inline=False)
+
+        if reset:
+            query_stats.reset()
+            embed.set_footer(text="Statistics were reset")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="looplag")
+    @app_commands.describe(reset="Clear the collected samples and findings after showing them")
+    @traced()
+    async def looplag(self, interaction: discord.Interaction, reset: bool = False):
+        """View event loop lag and what blocked the loop"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        threshold_ms = loop_monitor.block_threshold * 1000
+        embed = discord.Embed(
+            title="⏱️ Event Loop Lag",
+            description=(
+                f"Block threshold: **{threshold_ms:.0f} ms** · "
+                f"Debug mode: **{'on' if loop_monitor.debug else 'off'}**"
+            ),
+            color=0x8b5cf6
+        )
+
+        embed.add_field(
+            name=f"Lag over last {len(loop_monitor.samples)} samples",
+            value=(
+                f"p50 **{loop_monitor.quantile(0.5) * 1000:.1f} ms** · "
+                f"p95 **{loop_monitor.quantile(0.95) * 1000:.1f} ms** · "
+                f"p99 **{loop_monitor.quantile(0.99) * 1000:.1f} ms** · "
+                f"max **{loop_monitor.max_lag * 1000:.0f} ms**"
+            ),
+            inline=False
+        )
+
+        hotspots = loop_monitor.top_hotspots()
+        if hotspots:
+            lines = [f"{count:>4} × {location}" for location, count in hotspots]
+            embed.add_field(
+                name="Blocking hotspots (stack samples)",
+                value="```\n" + "\n".join(lines)[:1000] + "\n```",
+                inline=False
+            )
+
+        events = loop_monitor.recent_events()
+        if events:
+            lines = []
+            for event in events:
+                where = event.location or event.task
+                lines.append(
+                    f"`{datetime.fromtimestamp(event.at).strftime('%H:%M:%S')}` "
+                    f"**{event.duration * 1000:.0f} ms** {event.source} — {where[:120]}"
+                )
+            embed.add_field(name="Recent blocks", value="\n".join(lines)[:1024], inline=False)
+        elif not loop_monitor.debug:
+            embed.add_field(
+                name="Recent blocks",
+                value="Set `LOOP_DEBUG=true` to record where the loop was blocked.",
+                inline=False
+            )
+
+        if reset:
+            loop_monitor.reset()
+            embed.set_footer(text="Samples and findings were reset")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="profile")
+    @app_commands.describe(seconds=f"How long to sample the live process (max {PROFILE_MAX_SECONDS}s)")
+    @traced()
+    async def profile(self, interaction: discord.Interaction,
+                      seconds: app_commands.Range[int, 1, PROFILE_MAX_SECONDS] = 10):
+        """Run the sampling profiler and get collapsed stacks and a top table"""
+        if not self.is_owner(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        if profiler.is_running():
+            await interaction.response.send_message(
+                "A profile is already running. Try again when it finishes.",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        try:
+            result = await profiler.profile(seconds)
+        except Exception as e:
+            logging.error(f"Error running profiler: {str(e)}")
+            await interaction.followup.send("An error occurred while profiling.", ephemeral=True)
+            return
+
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        files = [
+            discord.File(io.BytesIO(result.collapsed().encode()), filename=f"profile-{stamp}.collapsed.txt"),
+            discord.File(io.BytesIO(result.top().encode()), filename=f"profile-{stamp}-top.txt"),
+        ]
+
+        embed = discord.Embed(
+            title="🔬 Profile",
+            description=(
+                f"**{result.ticks}** samples over **{result.duration:.1f}s** "
+                f"(every {result.interval * 1000:.1f} ms, overhead {result.overhead * 100:.2f}%)"
+            ),
+            color=0x8b5cf6
+        )
+        threads = [
+            f"**{thread}**: {busy} busy / {idle} idle"
+            for thread, (busy, idle) in sorted(result.thread_samples().items())
+        ]
+        embed.add_field(name="Samples per thread", value="\n".join(threads) or "None", inline=False)
+        embed.set_footer(text="Open the .collapsed.txt file with speedscope or flamegraph.pl")
+
+        await interaction.followup.send(embed=embed, files=files, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
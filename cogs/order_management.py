@@ -1,13 +1,200 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
+import csv
+import gzip
+import io
 import os
 import logging
-from datetime import datetime
-import random
-import string
-from typing import Optional
+import math
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 from database.db_manager import DatabaseManager
+from utils.blacklist import blacklist
+from utils.cart import RESERVATION_MINUTES
 from utils.deliverables_helper import format_deliverables
+from utils.order_history import order_history
+from utils.order_ids import order_ids
+from utils.payment_methods import METHODS as PAYMENT_METHODS, payment_methods
+from utils.quotes import TTL as QUOTE_TTL, quotes
+from utils.rate_limiter import rate_limiter
+from utils.tracing import RateLimitedModal, RateLimitedView, traced, span
+
+def format_items(items: List[Dict]) -> str:
+    """One line per order item"""
+    return "\n".join(
+        f"• {item.get('product_name') or 'Unknown'} x{item['quantity']} - €{item['line_total']:.2f}"
+        for item in items
+    )
+
+# Delivered units move to a text file past this many characters in the DM
+MAX_UNITS_IN_EMBED = 3000
+
+def delivery_fields(order_id: str, items: List[Dict],
+                    units: List[Dict]) -> Tuple[List[Tuple[str, str]], Optional[discord.File]]:
+    """'What You Get' embed fields for a completed order, plus a file when the units do not fit"""
+    by_product: Dict[int, List[str]] = {}
+    for unit in units:
+        by_product.setdefault(unit['product_id'], []).append(unit['content'])
+    blocks = {product_id: "```\n" + "\n".join(contents) + "\n```"
+              for product_id, contents in by_product.items()}
+    attach = (sum(map(len, blocks.values())) > MAX_UNITS_IN_EMBED
+              or any(len(block) > 1024 for block in blocks.values()))
+
+    fields = []
+    for item in items:
+        name = f"📦 What You Get - {item.get('product_name') or 'Your order'}"[:256]
+        if item['product_id'] not in blocks:
+            fields.append((name, format_deliverables(item.get('deliverables', ''))))
+        elif attach:
+            fields.append((name, f"{len(by_product[item['product_id']])} unit(s) - see the attached file."))
+        else:
+            fields.append((name, blocks[item['product_id']]))
+
+    file = None
+    if attach:
+        names = {item['product_id']: item.get('product_name') or 'Your order' for item in items}
+        text = "\n\n".join(f"{names.get(product_id, product_id)}\n" + "\n".join(contents)
+                            for product_id, contents in by_product.items())
+        file = discord.File(io.BytesIO(text.encode('utf-8')), filename=f"{order_id}.txt")
+    return fields, file
+
+# Orders per /orders page
+PAGE_SIZE = 10
+# Exports are built on disk past this size instead of in memory
+EXPORT_SPOOL_BYTES = 4 * 1024 * 1024
+# Attachment limit when the guild's is not known
+DEFAULT_FILESIZE_LIMIT = 10 * 1024 * 1024
+
+ORDER_STATUS_EMOJI = {
+    'pending_proof': '⏳',
+    'completed': '✅',
+    'rejected': '❌',
+    'cancelled': '🚫'
+}
+
+# Orders per /myorders page; each is an embed field with its lines
+HISTORY_PAGE_SIZE = 5
+
+def order_status_text(order: Dict) -> str:
+    """Where an order stands, in the buyer's terms"""
+    if order['status'] == 'pending_proof':
+        if order.get('has_proof') or order.get('proof_image'):
+            return "Payment received, waiting for staff review"
+        return "Waiting for payment"
+    return {
+        'completed': "Completed - delivered by DM",
+        'rejected': "Payment rejected",
+        'cancelled': "Cancelled - not paid in time"
+    }.get(order['status'], order['status'].replace('_', ' ').title())
+
+def _gzip(source) -> tempfile.SpooledTemporaryFile:
+    source.seek(0)
+    target = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    with gzip.GzipFile(fileobj=target, mode='wb', filename='orders.csv') as compressed:
+        shutil.copyfileobj(source, compressed)
+    source.close()
+    return target
+
+async def export_orders_csv(db: DatabaseManager, filters: Dict, max_bytes: int) -> Optional[discord.File]:
+    """Orders matching filters as a CSV attachment, or None if even compressed it exceeds max_bytes
+
+    Rows are written batch by batch as they are read, so a large export
+    never holds the whole result in memory.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    async for batch in db.export_orders(filters):
+        writer.writerows(batch)
+        spool.write(text.getvalue().encode('utf-8'))
+        text.seek(0)
+        text.truncate()
+
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M%S}.csv"
+    if spool.tell() > max_bytes:
+        # Compressing is CPU-bound; keep it off the event loop
+        spool = await asyncio.to_thread(_gzip, spool)
+        filename += '.gz'
+        if spool.tell() > max_bytes:
+            spool.close()
+            return None
+    spool.seek(0)
+    return discord.File(spool, filename=filename)
+
+async def complete_order(bot, db: DatabaseManager, order_id: str, items: List[Dict], user_id: int,
+                         guild: Optional[discord.Guild] = None) -> bool:
+    """Complete an order, deliver it to the buyer and post it to the public log
+
+    Used by the staff review and by automatic payment verification.
+    Returns False if the order could not be completed (e.g. it is no
+    longer pending). Errors while delivering are raised after the order
+    has been completed.
+    """
+    if not await db.update_order_status(order_id, 'completed'):
+        return False
+
+    user = bot.get_user(user_id)
+    if user:
+        fields, file = delivery_fields(order_id, items, await db.get_order_units(order_id))
+        embed = discord.Embed(
+            title="🎉 Order Completed Successfully!",
+            description=f"**Order ID:** `{order_id}`\n\nThank you for your purchase! Your order has been approved and completed.",
+            color=0x00ff00
+        )
+            
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=False)
+            
+        embed.add_field(
+            name="💬 Leave a Vouch!",
+            value="If you're happy with your purchase, please leave a vouch in <#1434532909548572792>!\n\n**Your feedback helps us grow!** ⭐",
+            inline=False
+        )
+            
+        embed.set_footer(text="© NovaCore • Thank you for your business!", icon_url="https://i.imgur.com/OpQROuS.png")
+        embed.timestamp = discord.utils.utcnow()
+
+        with span('discord.dm'):
+            if file:
+                await user.send(embed=embed, file=file)
+            else:
+                await user.send(embed=embed)
+
+        if guild is None:
+            guild = next((g for g in bot.guilds if g.get_member(user_id)), None)
+        member = guild.get_member(user_id) if guild else None
+        if member:
+            role = guild.get_role(int(os.getenv('CUSTOMER_ROLE_ID')))
+            if role and role not in member.roles:
+                await member.add_roles(role)
+
+    public_channel = bot.get_channel(
+        int(os.getenv('PUBLIC_LOG_CHANNEL_ID'))
+    )
+    if public_channel:
+        embed = discord.Embed(
+            title="🛍️ New Purchase!",
+            description=f"A customer just purchased from our store!",
+            color=0x8b5cf6
+        )
+        embed.add_field(
+            name="📦 Products",
+            value="\n".join(f"**{item.get('product_name') or 'Unknown'}** x{item['quantity']}"
+                            for item in items),
+            inline=True
+        )
+        embed.add_field(
+            name="💰 Value",
+            value=f"**€{sum(item['line_total'] for item in items):.2f}**",
+            inline=True
+        )
+        embed.set_footer(text="© NovaCore • Your trusted marketplace", icon_url="https://i.imgur.com/OpQROuS.png")
+        embed.timestamp = discord.utils.utcnow()
+        await public_channel.send(embed=embed)
+    return True
 
 class OrderManagement(commands.Cog):
     def __init__(self, bot):
@@ -16,6 +203,41 @@ class OrderManagement(commands.Cog):
         self._staff_role_ids = set(map(int, os.getenv('STAFF_ROLE_IDS').split(',')))
         self._customer_role_id = int(os.getenv('CUSTOMER_ROLE_ID'))
         self._public_log_channel = int(os.getenv('PUBLIC_LOG_CHANNEL_ID'))
+
+    async def cog_load(self):
+        self.expire_reservations.start()
+        if quotes.enabled:
+            self.refresh_quotes.start()
+
+    async def cog_unload(self):
+        self.expire_reservations.cancel()
+        self.refresh_quotes.cancel()
+
+    @tasks.loop(seconds=QUOTE_TTL)
+    async def refresh_quotes(self):
+        """Refresh every coin rate in one fetch, so checkouts quote from the cache"""
+        await quotes.refresh()
+
+    @tasks.loop(minutes=5)
+    async def expire_reservations(self):
+        """Cancel unpaid orders whose stock reservation ran out"""
+        expired = await self.db.expire_reservations(RESERVATION_MINUTES)
+        for order in expired:
+            logging.info(f"Order {order['order_id']} expired without payment proof")
+            user = self.bot.get_user(int(order['user_id']))
+            if not user:
+                continue
+            try:
+                await user.send(
+                    f"⌛ Order **{order['order_id']}** was cancelled because no payment proof arrived within "
+                    f"{RESERVATION_MINUTES:g} minutes. If you already paid, please open a ticket."
+                )
+            except discord.HTTPException:
+                pass
+
+    @expire_reservations.before_loop
+    async def before_expire_reservations(self):
+        await self.bot.wait_until_ready()
         
     def is_staff(self, member: discord.Member) -> bool:
         """Check if member has staff role"""
@@ -23,11 +245,9 @@ class OrderManagement(commands.Cog):
 
     def generate_order_id(self) -> str:
         """Generate unique order ID"""
-        date = datetime.now().strftime("%Y%m%d")
-        random_chars = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        return f"NC-{date}-{random_chars}"
+        return order_ids.next()
 
-    async def create_payment_embed(self, user: discord.User, order: dict, product: dict) -> discord.Embed:
+    async def create_payment_embed(self, user: discord.User, order: dict, items: List[Dict]) -> discord.Embed:
         """Create payment instructions embed"""
         embed = discord.Embed(
             title="🛍️ Order Details",
@@ -36,16 +256,17 @@ class OrderManagement(commands.Cog):
         )
         
         total = order['total_price']
-        embed.add_field(name="Product", value=product['name'], inline=True)
-        embed.add_field(name="Quantity", value=str(order['quantity']), inline=True)
+        embed.add_field(name="Items", value=format_items(items), inline=False)
         embed.add_field(name="Total", value=f"€{total:.2f}", inline=True)
         
+        method = payment_methods.get(order['payment_method'])
+        address = method.address if method else "Contact staff for address"
         if order['payment_method'] == 'paypal':
             embed.add_field(
                 name="Payment Instructions",
                 value=f"""
                 Please send €{total:.2f} to:
-                PayPal: {os.getenv('PAYPAL_EMAIL')}
+                PayPal: {address}
                 
                 Important:
                 • Send as Friends & Family
@@ -54,17 +275,14 @@ class OrderManagement(commands.Cog):
                 inline=False
             )
         else:
-            address_var = f"{order['payment_method'].upper()}_ADDRESS"
-            address = os.getenv(address_var)
-            
-            network = ""
-            if order['payment_method'] == 'usdt':
-                network = "\nNetwork: Tron (TRC20)"
+            network = f"\nNetwork: {method.network}" if method and method.network else ""
             
+            amount = (f"{order['quote_amount']} {order['payment_method'].upper()}" if order.get('quote_amount')
+                      else f"€{total:.2f} worth of {order['payment_method'].upper()}")
             embed.add_field(
                 name="Payment Instructions",
                 value=f"""
-                Please send €{total:.2f} worth of {order['payment_method'].upper()} to:
+                Please send {amount} to:
                 Address: `{address}`{network}
                 """,
                 inline=False
@@ -79,9 +297,9 @@ class OrderManagement(commands.Cog):
         embed.set_footer(text="© NovaCore • All Rights Reserved")
         return embed
 
-    async def send_staff_review(self, order: dict, product: dict,
+    async def send_staff_review(self, order: dict, items: List[Dict],
                               proof_url: str, user: discord.User):
-        """Send payment proof to staff for review"""
+        """Send payment proof to staff for review (one message for the whole cart)"""
         staff_channel = self.bot.get_channel(int(os.getenv('STAFF_CHANNEL_ID')))
         if not staff_channel:
             logging.error("Staff channel not found")
@@ -93,20 +311,23 @@ class OrderManagement(commands.Cog):
         )
         
         embed.add_field(name="Order", value=order['order_id'], inline=True)
-        embed.add_field(name="Product", value=product['name'], inline=True)
-        embed.add_field(name="Quantity", value=str(order['quantity']), inline=True)
-        embed.add_field(name="Amount", value=f"€{order['total_price']:.2f}", inline=True)
+        amount = f"€{order['total_price']:.2f}"
+        if order.get('quote_amount'):
+            amount += f" ({order['quote_amount']} {order['payment_method'].upper()})"
+        embed.add_field(name="Amount", value=amount, inline=True)
         embed.add_field(name="Payment Method", value=order['payment_method'].upper(), inline=True)
         embed.add_field(name="Buyer", value=user.mention, inline=True)
+        embed.add_field(name="Items", value=format_items(items), inline=False)
         
         if proof_url:
             embed.set_image(url=proof_url)
             
-        view = ReviewView(self.bot, order['order_id'], product, user.id, order['quantity'], self._staff_role_ids)
+        view = ReviewView(self.bot, order['order_id'], items, user.id, self._staff_role_ids)
         await staff_channel.send(embed=embed, view=view)
 
     @discord.app_commands.command(name="details")
     @discord.app_commands.describe(order_id="Order ID to view details")
+    @traced(ephemeral=False)
     async def details(self, interaction: discord.Interaction, order_id: str):
         """View details of a specific order"""
         if not self.is_staff(interaction.user):
@@ -124,12 +345,7 @@ class OrderManagement(commands.Cog):
             )
             return
 
-        status_emoji = {
-            'pending_proof': '⏳',
-            'completed': '✅',
-            'rejected': '❌',
-            'cancelled': '🚫'
-        }.get(order['status'], '❓')
+        status_emoji = ORDER_STATUS_EMOJI.get(order['status'], '❓')
 
         status_color = {
             'pending_proof': 0xFFA500,
@@ -144,15 +360,11 @@ class OrderManagement(commands.Cog):
             color=status_color
         )
 
+        items = await self.db.get_order_items(order_id)
         embed.add_field(
-            name="📦 Product",
-            value=order.get('product_name', 'Unknown'),
-            inline=True
-        )
-        embed.add_field(
-            name="📊 Quantity",
-            value=f"x{order['quantity']}",
-            inline=True
+            name="📦 Items",
+            value=format_items(items) if items else order.get('product_name', 'Unknown'),
+            inline=False
         )
         embed.add_field(
             name="💰 Total",
@@ -193,11 +405,86 @@ class OrderManagement(commands.Cog):
 
         await interaction.response.send_message(embed=embed)
 
+    @discord.app_commands.command(name="orders")
+    @discord.app_commands.describe(
+        status="Only orders with this status",
+        user="Only orders placed by this user",
+        product="Only orders containing this product (exact name)",
+        payment_method="Only orders paid with this method",
+        since="Only orders placed on or after this day (YYYY-MM-DD, UTC)",
+        until="Only orders placed on or before this day (YYYY-MM-DD, UTC)"
+    )
+    @discord.app_commands.choices(
+        status=[
+            discord.app_commands.Choice(name="Pending", value="pending_proof"),
+            discord.app_commands.Choice(name="Completed", value="completed"),
+            discord.app_commands.Choice(name="Rejected", value="rejected"),
+            discord.app_commands.Choice(name="Cancelled", value="cancelled")
+        ],
+        payment_method=[
+            discord.app_commands.Choice(name=label, value=method)
+            for method, (label, _, _, _) in PAYMENT_METHODS.items()
+        ]
+    )
+    @traced()
+    async def orders(self, interaction: discord.Interaction, status: Optional[str] = None,
+                     user: Optional[discord.User] = None, product: Optional[str] = None,
+                     payment_method: Optional[str] = None, since: Optional[str] = None,
+                     until: Optional[str] = None):
+        """Browse orders, newest first"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        try:
+            first_day = datetime.strptime(since, "%Y-%m-%d") if since else None
+            last_day = datetime.strptime(until, "%Y-%m-%d") if until else None
+        except ValueError:
+            await interaction.response.send_message(
+                "❌ Dates must look like 2025-01-31.",
+                ephemeral=True
+            )
+            return
+
+        filters = {
+            'status': status,
+            'user_id': str(user.id) if user else None,
+            'product': product,
+            'payment_method': payment_method,
+            # created_at is a UTC "YYYY-MM-DD HH:MM:SS" string; until covers its whole day
+            'since': first_day.strftime("%Y-%m-%d %H:%M:%S") if first_day else None,
+            'until': (last_day + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S") if last_day else None
+        }
+        view = OrderExplorerView(self.db, filters, interaction.user.id)
+        await view.load()
+        await interaction.response.send_message(embed=view.embed(), view=view, ephemeral=True)
+
+    @discord.app_commands.command(name="myorders")
+    @traced(rate_limit='myorders')
+    async def myorders(self, interaction: discord.Interaction):
+        """See your orders, their status and what you received"""
+        await show_order_history(interaction, self.db)
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         """Handle payment proof uploads in DMs"""
         if message.author.bot or not isinstance(message.channel, discord.DMChannel):
             return
+
+        # Blocked users get no reply and no DB lookup
+        if blacklist.is_blocked(message.author.id):
+            return
+
+        # DMs are not interactions, so @traced does not limit them
+        retry_after = rate_limiter.hit(message.author.id, 'proof')
+        if retry_after:
+            await message.channel.send(
+                f"⏳ You're sending messages too often. Try again in {math.ceil(retry_after)}s."
+            )
+            return
             
         order = await self.db.get_pending_order(str(message.author.id))
         if not order:
@@ -226,8 +513,8 @@ class OrderManagement(commands.Cog):
             
         proof_url = message.attachments[0].url
         
-        product = await self.db.get_product(order['product_id'])
-        if not product:
+        items = await self.db.get_order_items(order['order_id'])
+        if not items:
             await message.channel.send(
                 "Error: Product not found. Please contact support."
             )
@@ -243,27 +530,27 @@ class OrderManagement(commands.Cog):
                 "✅ Payment proof received! Staff will review it shortly."
             )
             await self.send_staff_review(
-                order, product, proof_url, message.author
+                order, items, proof_url, message.author
             )
         else:
             await message.channel.send(
                 "Error saving payment proof. Please try again or contact support."
             )
 
-class ReviewView(discord.ui.View):
-    def __init__(self, bot, order_id: str, product: dict, user_id: int, quantity: int, staff_role_ids: set):
+class ReviewView(RateLimitedView):
+    def __init__(self, bot, order_id: str, items: List[Dict], user_id: int, staff_role_ids: set):
         super().__init__(timeout=None)
         self.bot = bot
         self.order_id = order_id
-        self.product = product
+        self.items = items
         self.user_id = user_id
-        self.quantity = quantity
         self._staff_role_ids = staff_role_ids
         self.db = DatabaseManager(os.getenv('DATABASE_PATH'))
 
     @discord.ui.button(label="✅ Accept Payment",
                       style=discord.ButtonStyle.green,
                       custom_id="accept_payment")
+    @traced()
     async def accept_payment(self,
                            interaction: discord.Interaction,
                            button: discord.ui.Button):
@@ -277,86 +564,32 @@ class ReviewView(discord.ui.View):
 
         await interaction.response.defer()
 
-        success = await self.db.update_order_status(self.order_id, 'completed')
-        if not success:
-            await interaction.followup.send(
-                "Error updating order status. Please try again.",
-                ephemeral=True
-            )
-            return
-
         try:
-            user = self.bot.get_user(self.user_id)
-            if user:
-                embed = discord.Embed(
-                    title="🎉 Order Completed Successfully!",
-                    description=f"**Order ID:** `{self.order_id}`\n\nThank you for your purchase! Your order has been approved and completed.",
-                    color=0x00ff00
-                )
-                
-                deliverables_str = self.product.get('deliverables', '')
-                formatted_deliverables = format_deliverables(deliverables_str)
-                
-                embed.add_field(
-                    name="📦 What You Get",
-                    value=formatted_deliverables,
-                    inline=False
-                )
-                
-                embed.add_field(
-                    name="💬 Leave a Vouch!",
-                    value="If you're happy with your purchase, please leave a vouch in <#1434532909548572792>!\n\n**Your feedback helps us grow!** ⭐",
-                    inline=False
-                )
-                
-                embed.set_footer(text="© NovaCore • Thank you for your business!", icon_url="https://i.imgur.com/OpQROuS.png")
-                embed.timestamp = discord.utils.utcnow()
-                
-                await user.send(embed=embed)
-
-                guild = interaction.guild
-                member = guild.get_member(self.user_id)
-                if member:
-                    role = guild.get_role(int(os.getenv('CUSTOMER_ROLE_ID')))
-                    if role and role not in member.roles:
-                        await member.add_roles(role)
-
-            public_channel = self.bot.get_channel(
-                int(os.getenv('PUBLIC_LOG_CHANNEL_ID'))
-            )
-            if public_channel:
-                embed = discord.Embed(
-                    title="🛍️ New Purchase!",
-                    description=f"A customer just purchased from our store!",
-                    color=0x8b5cf6
-                )
-                embed.add_field(
-                    name="📦 Product",
-                    value=f"**{self.product['name']}**",
-                    inline=True
-                )
-                embed.add_field(
-                    name="📊 Quantity",
-                    value=f"**x{self.quantity}**",
-                    inline=True
-                )
-                embed.add_field(
-                    name="💰 Value",
-                    value=f"**€{self.product['price'] * self.quantity:.2f}**",
-                    inline=True
-                )
-                embed.set_footer(text="© NovaCore • Your trusted marketplace", icon_url="https://i.imgur.com/OpQROuS.png")
-                embed.timestamp = discord.utils.utcnow()
-                await public_channel.send(embed=embed)
+            if not await complete_order(self.bot, self.db, self.order_id, self.items, self.user_id,
+                                        interaction.guild):
+                order = await self.db.get_order_by_id(self.order_id)
+                if order and order['status'] in ('rejected', 'cancelled'):
+                    await interaction.followup.send(
+                        f"This order was {order['status']} and can no longer be completed.",
+                        ephemeral=True
+                    )
+                    return
+                if not order or order['status'] != 'completed':
+                    await interaction.followup.send(
+                        "Error updating order status. Please try again.",
+                        ephemeral=True
+                    )
+                    return
+                # Paid automatically (or accepted by someone else) before this click
+                message = "This order was already completed."
+            else:
+                message = "✅ Order completed successfully!"
 
             for child in self.children:
                 child.disabled = True
             await interaction.message.edit(view=self)
 
-            await interaction.followup.send(
-                "✅ Order completed successfully!",
-                ephemeral=True
-            )
+            await interaction.followup.send(message, ephemeral=True)
 
         except Exception as e:
             logging.error(f"Error completing order: {str(e)}")
@@ -368,6 +601,7 @@ class ReviewView(discord.ui.View):
     @discord.ui.button(label="❌ Reject Payment",
                       style=discord.ButtonStyle.red,
                       custom_id="reject_payment")
+    @traced(auto_defer=False)
     async def reject_payment(self,
                            interaction: discord.Interaction,
                            button: discord.ui.Button):
@@ -382,7 +616,7 @@ class ReviewView(discord.ui.View):
         modal = RejectModal(self.order_id, self.user_id, self.db)
         await interaction.response.send_modal(modal)
 
-class RejectModal(discord.ui.Modal):
+class RejectModal(RateLimitedModal):
     def __init__(self, order_id: str, user_id: int, db: DatabaseManager):
         super().__init__(title="Reject Payment")
         self.order_id = order_id
@@ -397,6 +631,7 @@ class RejectModal(discord.ui.Modal):
         )
         self.add_item(self.reason)
 
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
         success = await self.db.update_order_status(self.order_id, 'rejected')
         if not success:
@@ -445,5 +680,246 @@ class RejectModal(discord.ui.Modal):
                 ephemeral=True
             )
 
+class OrderExplorerView(RateLimitedView):
+    """Pages through /orders results by editing the same message"""
+    def __init__(self, db: DatabaseManager, filters: Dict, author_id: int):
+        super().__init__(timeout=600)
+        self.db = db
+        self.filters = filters
+        self.author_id = author_id
+        self.rows: List[Dict] = []
+        self.page = 1
+
+    async def load(self, after: Optional[Tuple[str, int]] = None, before: Optional[Tuple[str, int]] = None):
+        """Fetch the first page, or the page after/before a (created_at, id) key"""
+        rows, more = await self.db.search_orders(self.filters, after=after, before=before, limit=PAGE_SIZE)
+        if before:
+            has_newer, has_older = more, True
+        else:
+            has_newer, has_older = after is not None, more
+        self.rows = rows
+        self.newer.disabled = not has_newer
+        self.older.disabled = not has_older
+        self.export.disabled = not rows
+
+    def describe_filters(self) -> str:
+        parts = []
+        if self.filters['status']:
+            parts.append(f"status {self.filters['status'].replace('_', ' ')}")
+        if self.filters['user_id']:
+            parts.append(f"user <@{self.filters['user_id']}>")
+        if self.filters['product']:
+            parts.append(f"product **{discord.utils.escape_markdown(self.filters['product'])}**")
+        if self.filters['payment_method']:
+            parts.append(f"paid with {self.filters['payment_method'].upper()}")
+        if self.filters['since']:
+            parts.append(f"from {self.filters['since'][:10]}")
+        if self.filters['until']:
+            last_day = datetime.fromisoformat(self.filters['until']) - timedelta(days=1)
+            parts.append(f"until {last_day:%Y-%m-%d}")
+        return ", ".join(parts) or "none"
+
+    def embed(self) -> discord.Embed:
+        lines = []
+        for row in self.rows:
+            created = datetime.fromisoformat(row['created_at']).replace(tzinfo=timezone.utc)
+            extra = f" (+{row['line_count'] - 1} more)" if row['line_count'] > 1 else ""
+            lines.append(
+                f"{ORDER_STATUS_EMOJI.get(row['status'], '❓')} `{row['order_id']}` • <t:{int(created.timestamp())}:d>"
+                f" • €{row['total_price']:.2f} {row['payment_method'].upper()} • <@{row['user_id']}>\n"
+                f"└ {row['product_name'] or 'Unknown'}{extra} x{row['quantity']}"
+            )
+        embed = discord.Embed(
+            title="📋 Orders",
+            description=f"**Filters:** {self.describe_filters()}\n\n"
+                        + ("\n".join(lines) if lines else "No orders match these filters."),
+            color=0x8b5cf6
+        )
+        embed.set_footer(text=f"Page {self.page} • Newest first • Use /details for one order")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                "Run /orders to browse orders yourself.",
+                ephemeral=True
+            )
+            return False
+        return await super().interaction_check(interaction)
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    @traced()
+    async def newer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the previous (newer) page"""
+        first = self.rows[0]
+        await self.load(before=(first['created_at'], first['id']))
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    @traced()
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the next (older) page"""
+        last = self.rows[-1]
+        await self.load(after=(last['created_at'], last['id']))
+        self.page += 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="📄 Export CSV", style=discord.ButtonStyle.primary)
+    @traced(rate_limit='export_orders')
+    async def export(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Send every matching order, not just this page, as a CSV file"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        max_bytes = interaction.guild.filesize_limit if interaction.guild else DEFAULT_FILESIZE_LIMIT
+        try:
+            file = await export_orders_csv(self.db, self.filters, max_bytes)
+        except Exception as e:
+            logging.error(f"Error exporting orders: {str(e)}")
+            await interaction.followup.send("Failed to export orders. Please try again.", ephemeral=True)
+            return
+        if not file:
+            await interaction.followup.send(
+                "❌ Too many orders to attach. Narrow the filters (e.g. a date range) and try again.",
+                ephemeral=True
+            )
+            return
+        await interaction.followup.send(file=file, ephemeral=True)
+
+async def show_order_history(interaction: discord.Interaction, db: DatabaseManager):
+    """Answer with the first page of the user's orders (/myorders and the ticket panel)"""
+    view = MyOrdersView(db, str(interaction.user.id))
+    await view.load()
+    await interaction.response.send_message(embed=view.embed(), view=view, ephemeral=True)
+
+class MyOrdersView(RateLimitedView):
+    """A buyer's own orders, paged by editing the same message"""
+    def __init__(self, db: DatabaseManager, user_id: str):
+        super().__init__(timeout=300)
+        self.db = db
+        self.user_id = user_id
+        self.rows: List[Dict] = []
+        self.page = 1
+
+    async def load(self, after: Optional[Tuple[str, int]] = None, before: Optional[Tuple[str, int]] = None):
+        """Fetch the first page, or the page after/before a (created_at, id) key"""
+        version = DatabaseManager.get_user_orders_version(self.user_id)
+        key = (after, before)
+        cached = order_history.get(self.user_id, version, key)
+        if cached is None:
+            cached = await self.db.get_user_orders(self.user_id, after=after, before=before, limit=HISTORY_PAGE_SIZE)
+            order_history.put(self.user_id, version, key, cached)
+        rows, more = cached
+        if before:
+            has_newer, has_older = more, True
+        else:
+            has_newer, has_older = after is not None, more
+        self.rows = rows
+        self.newer.disabled = not has_newer
+        self.older.disabled = not has_older
+        if rows:
+            self.details.options = [
+                discord.SelectOption(
+                    label=row['order_id'],
+                    description=f"€{row['total_price']:.2f} - {order_status_text(row)}"[:100],
+                    emoji=ORDER_STATUS_EMOJI.get(row['status'], '❓'),
+                    value=row['order_id']
+                )
+                for row in rows
+            ]
+            self.details.disabled = False
+        else:
+            # A select needs at least one option even while disabled
+            self.details.options = [discord.SelectOption(label="No orders yet", value="none")]
+            self.details.disabled = True
+
+    def embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="📦 Your Orders",
+            description="Pick an order below to see its details and what you received."
+                        if self.rows else "You haven't placed any orders yet.",
+            color=0x8b5cf6
+        )
+        for row in self.rows:
+            created = datetime.fromisoformat(row['created_at']).replace(tzinfo=timezone.utc)
+            items = format_items(row['items'][:3])
+            if len(row['items']) > 3:
+                items += f"\n• +{len(row['items']) - 3} more"
+            embed.add_field(
+                name=f"{ORDER_STATUS_EMOJI.get(row['status'], '❓')} {row['order_id']}",
+                value=f"<t:{int(created.timestamp())}:d> • **€{row['total_price']:.2f}** "
+                      f"{row['payment_method'].upper()} • {order_status_text(row)}\n{items}"[:1024],
+                inline=False
+            )
+        embed.set_footer(text=f"Page {self.page} • Newest first • © NovaCore")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return str(interaction.user.id) == self.user_id and await super().interaction_check(interaction)
+
+    @discord.ui.select(placeholder="View an order...")
+    @traced()
+    async def details(self, interaction: discord.Interaction, select: discord.ui.Select):
+        """Show one order with its deliverables"""
+        order = await self.db.get_order_by_id(select.values[0])
+        if not order or order['user_id'] != self.user_id:
+            await interaction.response.send_message("❌ Order not found.", ephemeral=True)
+            return
+
+        items = await self.db.get_order_items(order['order_id'])
+        embed = discord.Embed(
+            title=f"{ORDER_STATUS_EMOJI.get(order['status'], '❓')} Order {order['order_id']}",
+            description=f"**Status:** {order_status_text(order)}",
+            color=0x8b5cf6
+        )
+        embed.add_field(name="📦 Items", value=format_items(items)[:1024] or "Unknown", inline=False)
+        embed.add_field(name="💰 Total", value=f"€{order['total_price']:.2f}", inline=True)
+        embed.add_field(name="💳 Payment Method", value=order['payment_method'].upper(), inline=True)
+        if order.get('quote_amount'):
+            embed.add_field(name="🪙 Amount", value=f"{order['quote_amount']} {order['payment_method'].upper()}",
+                            inline=True)
+
+        file = None
+        if order['status'] == 'completed':
+            fields, file = delivery_fields(order['order_id'], items, await self.db.get_order_units(order['order_id']))
+            for name, value in fields:
+                embed.add_field(name=name, value=value, inline=False)
+        elif order['status'] == 'pending_proof' and not order.get('proof_image'):
+            embed.add_field(
+                name="📸 Next Step",
+                value="Send a screenshot of your payment to the bot in DMs. "
+                      "Unpaid orders are cancelled after a while.",
+                inline=False
+            )
+        elif order['status'] == 'rejected':
+            embed.add_field(
+                name="❓ Questions?",
+                value="Open a ticket with this order ID and our team will help.",
+                inline=False
+            )
+        embed.set_footer(text="© NovaCore")
+
+        if file:
+            await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+        else:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    @traced()
+    async def newer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the previous (newer) page"""
+        first = self.rows[0]
+        await self.load(before=(first['created_at'], first['id']))
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    @traced()
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the next (older) page"""
+        last = self.rows[-1]
+        await self.load(after=(last['created_at'], last['id']))
+        self.page += 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
 async def setup(bot):
     await bot.add_cog(OrderManagement(bot))
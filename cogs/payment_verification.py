@@ -0,0 +1,79 @@
+import discord
+from discord.ext import commands, tasks
+import os
+import logging
+from typing import Dict, List
+from cogs.order_management import complete_order
+from database.db_manager import DatabaseManager
+from utils.payment_providers import Transfer
+from utils.payment_verifier import POLL_SECONDS, Match, PaymentVerifier
+
+class PaymentVerification(commands.Cog):
+    """Completes orders automatically once their payment arrives (PAYMENT_VERIFIERS)"""
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = DatabaseManager(os.getenv('DATABASE_PATH'))
+        self.verifier = PaymentVerifier(self.db)
+        self._staff_channel = int(os.getenv('STAFF_CHANNEL_ID'))
+
+    async def cog_load(self):
+        if self.verifier.providers:
+            self.verify_payments.start()
+
+    async def cog_unload(self):
+        self.verify_payments.cancel()
+        await self.verifier.close()
+
+    async def complete(self, order: Dict, transfer: Transfer) -> bool:
+        """Complete one paid order; False only if it is still open"""
+        try:
+            items = await self.db.get_order_items(order['order_id'])
+            return await complete_order(self.bot, self.db, order['order_id'], items, int(order['user_id']))
+        except Exception as e:
+            logging.error(f"Error completing paid order {order['order_id']}: {str(e)}")
+            current = await self.db.get_order_by_id(order['order_id'])
+            return bool(current) and current['status'] == 'completed'
+
+    @tasks.loop(seconds=POLL_SECONDS)
+    async def verify_payments(self):
+        """Match new transfers to open orders"""
+        results = await self.verifier.poll(self.complete)
+        if results:
+            await self.report(results)
+
+    @verify_payments.before_loop
+    async def before_verify_payments(self):
+        await self.bot.wait_until_ready()
+
+    async def report(self, results: List[Match]):
+        """Tell staff what the poll completed and which payments need a look, one message each"""
+        staff_channel = self.bot.get_channel(self._staff_channel)
+        if not staff_channel:
+            logging.error("Staff channel not found")
+            return
+
+        completed = [f"`{order['order_id']}` - €{transfer.amount:.2f} {transfer.method.upper()} (`{transfer.txid}`)"
+                     for transfer, order, outcome in results if outcome == 'matched']
+        review = [f"**{outcome.title()}:** €{transfer.amount:.2f} {transfer.method.upper()} (`{transfer.txid}`)"
+                  + (f" for `{order['order_id']}` (€{order['total_price']:.2f})" if order else '')
+                  + (f" - memo: {discord.utils.escape_markdown(transfer.memo[:100])}" if transfer.memo else '')
+                  for transfer, order, outcome in results if outcome in ('underpaid', 'ambiguous', 'unmatched')]
+
+        if completed:
+            embed = discord.Embed(
+                title="🤖 Payments Verified Automatically",
+                description="\n".join(completed)[:4096],
+                color=0x00ff00
+            )
+            await staff_channel.send(embed=embed)
+        if review:
+            embed = discord.Embed(
+                title="⚠️ Payments Need Review",
+                description="\n".join(review)[:4096],
+                color=0xFFA500
+            )
+            embed.set_footer(text="These payments were not matched to an order automatically")
+            await staff_channel.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(PaymentVerification(bot))
@@ -5,6 +5,8 @@ import json
 import os
 import logging
 from database.db_manager import DatabaseManager
+from utils.payment_methods import METHODS, payment_methods
+from utils.tracing import traced
 
 class PaymentsManagement(commands.Cog):
     def __init__(self, bot):
@@ -12,6 +14,9 @@ class PaymentsManagement(commands.Cog):
         self.db = DatabaseManager(os.getenv('DATABASE_PATH'))
         self._owner_role_id = int(os.getenv('OWNER_ROLE_ID'))
 
+    async def cog_load(self):
+        await payment_methods.load(self.db)
+
     def is_owner(self, member: discord.Member) -> bool:
         """Check if member has owner role"""
         return self._owner_role_id in [r.id for r in member.roles] or \
@@ -19,14 +24,13 @@ class PaymentsManagement(commands.Cog):
 
     @app_commands.command(name="payments")
     @app_commands.describe(
-        payment_method="Payment method to configure (paypal/crypto/card)",
-        address="Payment address or information"
+        payment_method="Payment method to configure",
+        address="PayPal email or wallet address"
     )
     @app_commands.choices(payment_method=[
-        app_commands.Choice(name="PayPal", value="paypal"),
-        app_commands.Choice(name="Cryptocurrency", value="crypto"),
-        app_commands.Choice(name="Card", value="card")
+        app_commands.Choice(name=label, value=method) for method, (label, _, _, _) in METHODS.items()
     ])
+    @traced()
     async def set_payment_method(self, interaction: discord.Interaction, 
                                payment_method: str, address: str):
         """Configure payment method information"""
@@ -42,6 +46,8 @@ class PaymentsManagement(commands.Cog):
             success = await self.db.update_payment_info(payment_method, address)
             
             if success:
+                # Checkout reads addresses from the registry only
+                await payment_methods.load(self.db)
                 embed = discord.Embed(
                     title="✅ Payment Method Updated",
                     description=f"Successfully updated {payment_method.upper()} payment information.",
@@ -54,7 +60,7 @@ class PaymentsManagement(commands.Cog):
                 )
                 embed.add_field(
                     name="Address/Info",
-                    value=f"||{address}||" if payment_method == "crypto" else address,
+                    value=f"||{address}||" if payment_method != "paypal" else address,
                     inline=True
                 )
                 await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -3,12 +3,17 @@ from discord import app_commands
 from discord.ext import commands
 import os
 import logging
+import asyncio
 from typing import Optional
 from database.db_manager import DatabaseManager
 from datetime import datetime
-import matplotlib.pyplot as plt
 import io
 from ui.components import CategoryManagementView, ProductManagementView
+from utils.stats_cache import stats_cache
+from utils.tracing import traced
+
+# Largest unit file /addunits accepts
+MAX_UNITS_FILE_BYTES = 1024 * 1024
 
 class ProductManagement(commands.Cog):
     def __init__(self, bot):
@@ -37,7 +42,7 @@ class ProductManagement(commands.Cog):
         image_url="Product image URL",
         stock="Initial stock amount"
     )
-    @commands.cooldown(1, 30, commands.BucketType.user)
+    @traced(ephemeral=False, rate_limit='addproduct')
     async def addproduct(self, interaction: discord.Interaction, category: str,
                         product: str, price: float, description: str,
                         deliverables: str, image_url: str, stock: int = 0):
@@ -95,7 +100,7 @@ class ProductManagement(commands.Cog):
 
     @app_commands.command(name="removestock")
     @app_commands.describe(product="Product name to remove")
-    @commands.cooldown(1, 30, commands.BucketType.user)
+    @traced(ephemeral=False, rate_limit='removestock')
     async def removestock(self, interaction: discord.Interaction, product: str):
         """Remove a product from stock"""
         if not self.is_owner(interaction.user):
@@ -121,7 +126,7 @@ class ProductManagement(commands.Cog):
         product="Product name",
         amount="New stock amount"
     )
-    @commands.cooldown(1, 30, commands.BucketType.user)
+    @traced(ephemeral=False, rate_limit='setstock')
     async def setstock(self, interaction: discord.Interaction,
                       product: str, amount: int):
         """Set stock amount for a product"""
@@ -146,9 +151,77 @@ class ProductManagement(commands.Cog):
             )
         else:
             await interaction.response.send_message(
-                f"Failed to update stock for {product}. Please try again.",
+                f"Failed to update stock for {product}. Products with uploaded units "
+                "take their stock from /addunits.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="addunits")
+    @app_commands.describe(
+        product="Product name",
+        file="Text file with one key or account per line",
+        units="Comma-separated keys or accounts"
+    )
+    @traced(rate_limit='addunits')
+    async def addunits(self, interaction: discord.Interaction, product: str,
+                       file: Optional[discord.Attachment] = None, units: Optional[str] = None):
+        """Upload keys or accounts that are delivered automatically on approval"""
+        if not self.is_staff(interaction.user):
+            await interaction.response.send_message(
+                "You don't have permission to use this command.",
+                ephemeral=True
+            )
+            return
+
+        item = await self.db.get_product_by_name(product)
+        if not item:
+            await interaction.response.send_message(
+                f"❌ Product `{product}` not found.",
+                ephemeral=True
+            )
+            return
+
+        lines = units.split(',') if units else []
+        if file:
+            if file.size > MAX_UNITS_FILE_BYTES:
+                await interaction.response.send_message(
+                    f"❌ Unit files can be at most {MAX_UNITS_FILE_BYTES // 1024} KB.",
+                    ephemeral=True
+                )
+                return
+            try:
+                lines += (await file.read()).decode('utf-8-sig').splitlines()
+            except UnicodeDecodeError:
+                await interaction.response.send_message(
+                    "❌ The file must be UTF-8 text with one unit per line.",
+                    ephemeral=True
+                )
+                return
+        # Order is kept so units are delivered first-in, first-out
+        lines = list(dict.fromkeys(line.strip() for line in lines if line.strip()))
+        if not lines:
+            await interaction.response.send_message(
+                "❌ Provide a file or a comma-separated list of units.",
+                ephemeral=True
+            )
+            return
+
+        result = await self.db.add_deliverable_units(item['id'], lines, str(interaction.user.id))
+        if result is None:
+            await interaction.response.send_message(
+                f"Failed to add units to {product}. Please try again.",
                 ephemeral=True
             )
+            return
+
+        added, unclaimed = result
+        skipped = len(lines) - added
+        await interaction.response.send_message(
+            f"✅ Added {added} unit(s) to **{product}**"
+            + (f" ({skipped} already uploaded)" if skipped else "")
+            + f". Stock is now {unclaimed}.",
+            ephemeral=True
+        )
 
     @app_commands.command(name="stats")
     @app_commands.describe(
@@ -160,6 +233,7 @@ class ProductManagement(commands.Cog):
         app_commands.Choice(name="Monthly", value="monthly"),
         app_commands.Choice(name="All Time", value="all")
     ])
+    @traced(ephemeral=False)
     async def stats(self, interaction: discord.Interaction,
                    period: str = "all"):
         """View sales statistics"""
@@ -173,14 +247,27 @@ class ProductManagement(commands.Cog):
         await interaction.response.defer()
 
         try:
-            summary, time_series = await self.db.get_sales_stats(period)
+            # Date-relative periods roll over at midnight (UTC, like SQLite's date('now'))
+            version = await self.db.get_orders_version()
+            cache_key = (period, datetime.utcnow().date().isoformat(), version)
+            cached = stats_cache.get(cache_key)
+            if cached is None:
+                # Pillow/NumPy are only needed here, so load them on first use
+                from utils.charts import render_revenue_chart
+
+                summary, time_series = await self.db.get_sales_stats(period)
+                # Rendering is CPU-bound; keep it off the event loop
+                chart = await asyncio.to_thread(render_revenue_chart, period, time_series) if time_series else None
+                cached = (summary, chart)
+                stats_cache.put(cache_key, cached, len(chart or b'') + 512)
+            summary, chart = cached
 
             # Create embed
             embed = discord.Embed(
                 title=f"📊 Sales Statistics ({period.title()})",
                 color=0x8b5cf6
             )
-            
+
             embed.add_field(
                 name="Summary",
                 value=f"""
@@ -191,35 +278,11 @@ class ProductManagement(commands.Cog):
                 inline=False
             )
 
-            if time_series and len(time_series) > 0:
-                # Create matplotlib chart
-                plt.figure(figsize=(10, 6))
-                plt.style.use('dark_background')
-                
-                dates = [t['date'] for t in time_series]
-                revenues = [t['revenue'] for t in time_series]
-                
-                plt.plot(dates, revenues, marker='o', color='#8b5cf6')
-                plt.title(f'Revenue Over Time ({period.title()})')
-                plt.xlabel('Date')
-                plt.ylabel('Revenue (€)')
-                plt.grid(True, alpha=0.3)
-                
-                # Rotate x-axis labels for better readability
-                plt.xticks(rotation=45)
-                
-                # Save chart
-                chart_path = os.path.join(
-                    os.getenv('LOG_DIR'),
-                    f'stats_{period}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-                )
-                plt.savefig(chart_path, bbox_inches='tight', dpi=300)
-                plt.close()
-
+            if chart:
                 # Attach chart
-                file = discord.File(chart_path, filename="stats_chart.png")
+                file = discord.File(io.BytesIO(chart), filename="stats_chart.png")
                 embed.set_image(url="attachment://stats_chart.png")
-                
+
                 await interaction.followup.send(embed=embed, file=file)
             else:
                 embed.add_field(
@@ -238,6 +301,7 @@ class ProductManagement(commands.Cog):
 
     @app_commands.command(name="listproducts")
     @app_commands.describe(category="Optional category filter")
+    @traced(ephemeral=False)
     async def listproducts(self, interaction: discord.Interaction,
                           category: Optional[str] = None):
         """List all products or products in a category"""
@@ -269,7 +333,7 @@ class ProductManagement(commands.Cog):
                 value=f"""
                 Category: {product['category']}
                 Price: €{product['price']:.2f}
-                Stock: {product['stock']}
+                Stock: {product['available']} available ({product['stock_reserved']} reserved)
                 """,
                 inline=True
             )
@@ -277,6 +341,7 @@ class ProductManagement(commands.Cog):
         await interaction.response.send_message(embed=embed)
 
     @app_commands.command(name="edit")
+    @traced()
     async def edit_categories(self, interaction: discord.Interaction):
         """Manage shop categories (add, edit, delete)"""
         if not self.is_owner(interaction.user):
@@ -310,6 +375,7 @@ class ProductManagement(commands.Cog):
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
     @app_commands.command(name="manage")
+    @traced()
     async def manage_products(self, interaction: discord.Interaction):
         """Manage products (add, edit, delete)"""
         if not self.is_owner(interaction.user):
@@ -349,7 +415,7 @@ class ProductManagement(commands.Cog):
         description="Vouch description",
         proof="Optional proof link (image/screenshot)"
     )
-    @commands.cooldown(1, 60, commands.BucketType.user)
+    @traced(rate_limit='vouch')
     async def vouch(self, interaction: discord.Interaction, stars: int,
                    description: str, proof: Optional[str] = None):
         """Submit a vouch/review for the server"""
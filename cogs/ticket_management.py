@@ -4,9 +4,14 @@ from discord import ui
 import os
 import logging
 from datetime import datetime
+from cogs.order_management import show_order_history
 from database.db_manager import DatabaseManager
+from utils.blacklist import blacklist
+from utils.order_ids import normalize as normalize_order_id
+from utils.startup import startup_timer
+from utils.tracing import RateLimitedModal, RateLimitedView, traced
 
-class TicketModal(ui.Modal):
+class TicketModal(RateLimitedModal):
     def __init__(self, ticket_type: str, bot):
         super().__init__(title=f"{ticket_type} Ticket")
         self.ticket_type = ticket_type
@@ -26,7 +31,7 @@ class TicketModal(ui.Modal):
         
         self.order_id = ui.TextInput(
             label=order_id_label,
-            placeholder="NC-YYYYMMDD-XXXXXX",
+            placeholder="NC-YYYYMMDD-XXXXXXX",
             min_length=0 if not order_id_required else 5,
             max_length=20,
             required=order_id_required
@@ -43,7 +48,26 @@ class TicketModal(ui.Modal):
         )
         self.add_item(self.description)
         
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
+        if blacklist.is_blocked(interaction.user.id):
+            await interaction.response.send_message(
+                "❌ You are not allowed to open tickets.",
+                ephemeral=True
+            )
+            return
+
+        # Mistyped IDs fail their check character, so they are caught before any lookup
+        order_id = None
+        if self.order_id.value and self.ticket_type in ["Product Issue", "Refund Request"]:
+            order_id = normalize_order_id(self.order_id.value)
+            if not order_id:
+                await interaction.response.send_message(
+                    "❌ That is not a valid order ID. Please copy it from your order confirmation and try again.",
+                    ephemeral=True
+                )
+                return
+
         await interaction.response.defer(ephemeral=True)
         
         category_id = int(os.getenv('TICKET_CATEGORY_ID'))
@@ -90,12 +114,11 @@ class TicketModal(ui.Modal):
         await ticket_channel.send(f"{interaction.user.mention}", embed=ticket_embed, view=view)
         
         # Product/Order Details Embed (for Product Issue and Refund Request)
-        if self.order_id.value and self.ticket_type in ["Product Issue", "Refund Request"]:
+        if order_id:
             db = DatabaseManager(os.getenv('DATABASE_PATH'))
-            order = await db.get_order_by_id(self.order_id.value)
+            order = await db.get_order_by_id(order_id)
             
             if order:
-                product = await db.get_product(order['product_id'])
                 status_emoji = {
                     'pending': '🟡',
                     'approved': '🟢',
@@ -109,13 +132,19 @@ class TicketModal(ui.Modal):
                     timestamp=datetime.now()
                 )
                 
-                order_embed.add_field(name="Order ID", value=f"`{self.order_id.value}`", inline=False)
+                order_embed.add_field(name="Order ID", value=f"`{order_id}`", inline=False)
                 order_embed.add_field(name="Status", value=f"{status_emoji} {order['status'].title()}", inline=True)
                 
-                if product:
-                    order_embed.add_field(name="Product", value=product['name'], inline=True)
-                    order_embed.add_field(name="Category", value=product['category'], inline=True)
-                    order_embed.add_field(name="Price", value=f"€{product['price']:.2f}", inline=True)
+                if order['product_name']:
+                    # Details as purchased; a cart shows its first product
+                    extra = order['line_count'] - 1
+                    order_embed.add_field(
+                        name="Product",
+                        value=order['product_name'] + (f" (+{extra} more)" if extra > 0 else ""),
+                        inline=True
+                    )
+                    order_embed.add_field(name="Category", value=order['product_category'], inline=True)
+                    order_embed.add_field(name="Price", value=f"€{order['unit_price']:.2f}", inline=True)
                 
                 order_embed.add_field(name="Quantity", value=str(order['quantity']), inline=True)
                 order_embed.add_field(name="Total", value=f"€{order['total_price']:.2f}", inline=True)
@@ -130,7 +159,7 @@ class TicketModal(ui.Modal):
             else:
                 error_embed = discord.Embed(
                     title="⚠️ Order Not Found",
-                    description=f"Order ID `{self.order_id.value}` was not found in our system.",
+                    description=f"Order ID `{order_id}` was not found in our system.",
                     color=0xef4444
                 )
                 await ticket_channel.send(embed=error_embed)
@@ -138,11 +167,12 @@ class TicketModal(ui.Modal):
         await interaction.followup.send(f"✅ Ticket created: {ticket_channel.mention}", ephemeral=True)
 
 
-class TicketControlView(ui.View):
+class TicketControlView(RateLimitedView):
     def __init__(self):
         super().__init__(timeout=None)
     
     @ui.button(label="Close Ticket", style=discord.ButtonStyle.danger, emoji="🔒", custom_id="close_ticket")
+    @traced(ephemeral=False)
     async def close_ticket(self, interaction: discord.Interaction, button: ui.Button):
         staff_role_ids = set(map(int, os.getenv('STAFF_ROLE_IDS').split(',')))
         is_staff = any(role.id in staff_role_ids for role in interaction.user.roles)
@@ -162,22 +192,31 @@ class TicketControlView(ui.View):
         await interaction.channel.delete(reason=f"Ticket closed by {interaction.user.name}")
 
 
-class TicketPanelView(ui.View):
+class TicketPanelView(RateLimitedView):
     def __init__(self, bot):
         super().__init__(timeout=None)
         self.bot = bot
     
+    @ui.button(label="My Orders", style=discord.ButtonStyle.secondary, emoji="📦", custom_id="ticket_my_orders")
+    @traced(rate_limit='myorders')
+    async def my_orders(self, interaction: discord.Interaction, button: ui.Button):
+        # Order status and deliverables without opening a ticket
+        await show_order_history(interaction, DatabaseManager(os.getenv('DATABASE_PATH')))
+    
     @ui.button(label="Product Issue", style=discord.ButtonStyle.primary, emoji="🧩", custom_id="ticket_product")
+    @traced(auto_defer=False, rate_limit='ticket')
     async def product_issue(self, interaction: discord.Interaction, button: ui.Button):
         modal = TicketModal("Product Issue", self.bot)
         await interaction.response.send_modal(modal)
     
     @ui.button(label="Refund Request", style=discord.ButtonStyle.success, emoji="📁", custom_id="ticket_refund")
+    @traced(auto_defer=False, rate_limit='ticket')
     async def refund_request(self, interaction: discord.Interaction, button: ui.Button):
         modal = TicketModal("Refund Request", self.bot)
         await interaction.response.send_modal(modal)
     
     @ui.button(label="Other Support", style=discord.ButtonStyle.secondary, emoji="💬", custom_id="ticket_other")
+    @traced(auto_defer=False, rate_limit='ticket')
     async def other_ticket(self, interaction: discord.Interaction, button: ui.Button):
         modal = TicketModal("Others", self.bot)
         await interaction.response.send_modal(modal)
@@ -190,7 +229,8 @@ class TicketManagement(commands.Cog):
         
     @commands.Cog.listener()
     async def on_ready(self):
-        await self.setup_ticket_panel()
+        with startup_timer.phase('ticket_panel_setup'):
+            await self.setup_ticket_panel()
     
     async def setup_ticket_panel(self):
         """Setup the ticket panel in the designated channel"""
@@ -212,6 +252,8 @@ class TicketManagement(commands.Cog):
             embed = discord.Embed(
                 title="🎫 NovaCore Support",
                 description="⭐ **Welcome to Premium Support!**\n\n"
+                           "<a:ARROW:1434558184927924397> **Where is my order?**\n"
+                           "Press **My Orders** or use `/myorders` to see your orders' status and what you received.\n\n"
                            "<a:ARROW:1434558184927924397> **How to get help**\n"
                            "Select a category below that matches your issue.\n\n"
                            "<a:ARROW:1434558184927924397> **Response Time**\n"
@@ -0,0 +1,114 @@
+"""
+Read-only connections for reporting queries
+
+Reporting queries (/stats and anything like it) scan the orders table and
+run on their own small pool of connections instead of the per-call
+connections checkout uses. Pool connections are opened with mode=ro and
+PRAGMA query_only, so a reporting query can never take a write lock. They
+keep their own page cache (DB_ANALYTICS_CACHE_KB) between calls, and at
+most DB_ANALYTICS_CONCURRENCY of them run at once; further reports wait
+for a free connection instead of competing with order writes.
+
+With the database in WAL mode (DatabaseManager.init_db sets it) readers
+and the writer do not block each other, so a long scan never delays a
+commit.
+"""
+
+import asyncio
+import os
+import pathlib
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import aiosqlite
+
+from database.instrumentation import BUSY_TIMEOUT, InstrumentedConnection
+from utils.metrics import metrics
+
+MAX_CONCURRENCY = int(os.getenv('DB_ANALYTICS_CONCURRENCY', '2'))
+CACHE_KB = int(os.getenv('DB_ANALYTICS_CACHE_KB', '32768'))
+
+wait_seconds = metrics.histogram(
+    'novacore_db_analytics_wait_seconds', 'Time a reporting query waited for a read-only connection'
+)
+
+class ReadOnlyPool:
+    """A capped pool of read-only connections to one database"""
+    def __init__(self, db_path: str, size: int = MAX_CONCURRENCY, cache_kb: int = CACHE_KB):
+        self.db_path = db_path
+        self.cache_kb = cache_kb
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: List[aiosqlite.Connection] = []
+        self._loop = asyncio.get_running_loop()
+        self.active = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._loop is asyncio.get_running_loop()
+
+    async def _open(self) -> aiosqlite.Connection:
+        uri = pathlib.Path(self.db_path).absolute().as_uri() + '?mode=ro'
+        db = await aiosqlite.connect(uri, uri=True, timeout=BUSY_TIMEOUT)
+        await db.execute('PRAGMA query_only = ON')
+        # Negative cache_size is in KiB rather than pages
+        await db.execute(f'PRAGMA cache_size = -{self.cache_kb}')
+        return db
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection, waiting while every slot is busy"""
+        started = time.perf_counter()
+        async with self._semaphore:
+            wait_seconds.observe(time.perf_counter() - started)
+            db = self._idle.pop() if self._idle else await self._open()
+            db.row_factory = None
+            self.active += 1
+            try:
+                yield InstrumentedConnection(db)
+            except BaseException:
+                # The connection may be mid-statement; do not hand it out again
+                await db.close()
+                raise
+            else:
+                self._idle.append(db)
+            finally:
+                self.active -= 1
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+    def abandon(self):
+        """Stop idle connections left behind by a finished event loop"""
+        while self._idle:
+            self._idle.pop().stop()
+
+_pools: Dict[str, ReadOnlyPool] = {}
+
+def get_pool(db_path: str) -> ReadOnlyPool:
+    """The read-only pool for a database, created on first use in the running loop"""
+    pool = _pools.get(db_path)
+    if pool is None or not pool.alive:
+        if pool is not None:
+            pool.abandon()
+        pool = _pools[db_path] = ReadOnlyPool(db_path)
+    return pool
+
+def read_only(db_path: str):
+    """Borrow a read-only reporting connection to db_path"""
+    return get_pool(db_path).connection()
+
+async def close_readers():
+    """Close every pooled read-only connection"""
+    for pool in list(_pools.values()):
+        if pool.alive:
+            await pool.close()
+        else:
+            pool.abandon()
+    _pools.clear()
+
+metrics.gauge(
+    'novacore_db_analytics_active', 'Reporting queries running on read-only connections',
+    callback=lambda: sum(pool.active for pool in _pools.values())
+)
@@ -2,15 +2,59 @@ import aiosqlite
 import os
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+from database.analytics import read_only
+from database.instrumentation import connect, instrument_queries
+from database.writer import run_write
+from utils.helpers import LockTimeout, db_lock
+from utils.quotes import Quote
 
+JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+
+class InsufficientStock(Exception):
+    """A checkout line asked for more units than are available"""
+    def __init__(self, product_name: str):
+        super().__init__(f"Insufficient stock for {product_name}")
+        self.product_name = product_name
+
+@instrument_queries
 class DatabaseManager:
+    # Bumped on every order write made by this process, so cached reports
+    # can tell that their source rows changed
+    _orders_version = 0
+    # The same per buyer (user ID -> version), for caches of one user's orders
+    _user_orders_versions: Dict[str, int] = {}
+
     def __init__(self, db_path: str):
         self.db_path = db_path
 
+    @classmethod
+    def _bump_orders_version(cls, *user_ids: str):
+        cls._orders_version += 1
+        for user_id in user_ids:
+            cls._user_orders_versions[user_id] = cls._user_orders_versions.get(user_id, 0) + 1
+
+    @classmethod
+    def get_user_orders_version(cls, user_id: str) -> int:
+        """A token that changes whenever this process writes one of the user's orders"""
+        return cls._user_orders_versions.get(user_id, 0)
+
+    @staticmethod
+    async def _add_column(db, table: str, column: str, definition: str) -> bool:
+        """Add a column to a table created by an older version; True if it was added"""
+        cursor = await db.execute(f'PRAGMA table_info({table})')
+        if column in {row[1] for row in await cursor.fetchall()}:
+            return False
+        await db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
+
     async def init_db(self):
         """Initialize database tables"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
+            # WAL lets reporting reads run alongside order writes (persists in the file)
+            await db.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+
             # Categories table
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS categories (
@@ -48,6 +92,7 @@ class DatabaseManager:
                     description TEXT,
                     price REAL NOT NULL,
                     stock INTEGER NOT NULL,
+                    stock_reserved INTEGER NOT NULL DEFAULT 0,
                     image_url TEXT,
                     deliverables TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -67,6 +112,7 @@ class DatabaseManager:
                     total_price REAL NOT NULL,
                     payment_method TEXT NOT NULL,
                     status TEXT NOT NULL,
+                    reserved BOOLEAN NOT NULL DEFAULT FALSE,
                     proof_image TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -74,6 +120,85 @@ class DatabaseManager:
                 )
             ''')
 
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON orders (updated_at)
+            ''')
+
+            # Columns added after the first release
+            await self._add_column(db, 'products', 'stock_reserved', 'INTEGER NOT NULL DEFAULT 0')
+            await self._add_column(db, 'orders', 'reserved', 'BOOLEAN NOT NULL DEFAULT FALSE')
+            # Coin amount quoted at checkout (decimal string), its EUR rate and how long it is honoured
+            await self._add_column(db, 'orders', 'quote_amount', 'TEXT')
+            await self._add_column(db, 'orders', 'quote_rate', 'REAL')
+            await self._add_column(db, 'orders', 'quote_expires_at', 'TIMESTAMP')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_reserved ON orders (created_at) WHERE reserved = TRUE
+            ''')
+
+            # Order lines; orders.product_id/quantity hold the first product and the total units
+            cursor = await db.execute('''
+                SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_items'
+            ''')
+            had_order_items = await cursor.fetchone() is not None
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS order_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    order_id TEXT NOT NULL,
+                    product_id INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    unit_price REAL NOT NULL,
+                    line_total REAL NOT NULL,
+                    FOREIGN KEY (order_id) REFERENCES orders (order_id),
+                    FOREIGN KEY (product_id) REFERENCES products (id)
+                )
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)
+            ''')
+            if not had_order_items:
+                # Orders from before carts become single-line orders
+                await db.execute('''
+                    INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total)
+                    SELECT order_id, product_id, quantity, total_price / quantity, total_price
+                    FROM orders
+                ''')
+
+            # Product details as they were at purchase, so orders are read without joining
+            # products and keep the name and price the buyer saw. Orders hold their first
+            # line, like product_id. Added and backfilled in one transaction, so a failure in
+            # between cannot leave the columns added but empty
+            await db.commit()
+            await db.execute('BEGIN')
+            items_added = await self._add_column(db, 'order_items', 'product_name', 'TEXT')
+            await self._add_column(db, 'order_items', 'product_category', 'TEXT')
+            await self._add_column(db, 'order_items', 'deliverables', 'TEXT')
+            orders_added = await self._add_column(db, 'orders', 'product_name', 'TEXT')
+            await self._add_column(db, 'orders', 'product_category', 'TEXT')
+            await self._add_column(db, 'orders', 'unit_price', 'REAL')
+            await self._add_column(db, 'orders', 'deliverables', 'TEXT')
+            await self._add_column(db, 'orders', 'line_count', 'INTEGER NOT NULL DEFAULT 1')
+            if items_added:
+                # Existing orders get the product details current at upgrade time
+                await db.execute('''
+                    UPDATE order_items
+                    SET product_name = p.name, product_category = p.category, deliverables = p.deliverables
+                    FROM products p
+                    WHERE p.id = order_items.product_id
+                ''')
+            if orders_added:
+                await db.execute('''
+                    UPDATE orders
+                    SET (product_name, product_category, unit_price, deliverables) = (
+                            SELECT i.product_name, i.product_category, i.unit_price, i.deliverables
+                            FROM order_items i
+                            WHERE i.order_id = orders.order_id
+                            ORDER BY i.id
+                            LIMIT 1
+                        ),
+                        line_count = (SELECT COUNT(*) FROM order_items i WHERE i.order_id = orders.order_id)
+                ''')
+            await db.commit()
+
             # Sales stats table
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS sales_stats (
@@ -97,6 +222,70 @@ class DatabaseManager:
                 )
             ''')
 
+            # Deliverable units (license keys, account lines); order_id is set once claimed
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS deliverable_units (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    order_id TEXT,
+                    added_by TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    claimed_at TIMESTAMP,
+                    UNIQUE (product_id, content),
+                    FOREIGN KEY (product_id) REFERENCES products (id)
+                )
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_deliverable_units_unclaimed
+                ON deliverable_units (product_id, id) WHERE order_id IS NULL
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_deliverable_units_order_id
+                ON deliverable_units (order_id) WHERE order_id IS NOT NULL
+            ''')
+
+            # Open orders by payment method, for the payment verifier
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_open
+                ON orders (payment_method, created_at) WHERE status = 'pending_proof'
+            ''')
+
+            # Order explorer (/orders): pages are read newest first along one of these,
+            # each ending in (created_at, rowid), so a page never needs a sort. The indexes
+            # do not cover the page columns; a page looks up only its own rows in orders
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at)
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, created_at)
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id, created_at)
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_payment_method ON orders (payment_method, created_at)
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_order_items_product_id ON order_items (product_id, order_id)
+            ''')
+
+            # Transfers seen by the payment verifier, each handled once
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS payment_transfers (
+                    method TEXT NOT NULL,
+                    txid TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    memo TEXT,
+                    received_at TIMESTAMP NOT NULL,
+                    order_id TEXT,
+                    outcome TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (method, txid)
+                )
+            ''')
+            await self._add_column(db, 'payment_transfers', 'coin_amount', 'TEXT')
+
             # Payment methods table
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS payment_methods (
@@ -110,9 +299,15 @@ class DatabaseManager:
 
             await db.commit()
 
+    async def ping(self):
+        """Run a trivial query to check the database is reachable"""
+        async with connect(self.db_path) as db:
+            cursor = await db.execute('SELECT 1')
+            await cursor.fetchone()
+
     async def get_all_categories(self) -> List[Dict]:
         """Get all categories"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
                 SELECT * FROM categories 
@@ -124,7 +319,7 @@ class DatabaseManager:
     async def add_category(self, value: str, label: str, emoji: str) -> bool:
         """Add a new category"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect(self.db_path) as db:
                 await db.execute('''
                     INSERT INTO categories (value, label, emoji)
                     VALUES (?, ?, ?)
@@ -138,7 +333,7 @@ class DatabaseManager:
     async def update_category(self, category_id: int, value: str, label: str, emoji: str) -> bool:
         """Update an existing category"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect(self.db_path) as db:
                 await db.execute('''
                     UPDATE categories 
                     SET value = ?, label = ?, emoji = ?
@@ -153,7 +348,7 @@ class DatabaseManager:
     async def delete_category(self, category_id: int) -> bool:
         """Delete a category"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect(self.db_path) as db:
                 await db.execute('DELETE FROM categories WHERE id = ?', (category_id,))
                 await db.commit()
                 return True
@@ -165,7 +360,7 @@ class DatabaseManager:
                          image_url: str, deliverables: str, stock: int = 0) -> bool:
         """Add a new product or update existing one"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect(self.db_path) as db:
                 await db.execute('''
                     INSERT INTO products (name, category, price, description, image_url, deliverables, stock)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -175,7 +370,9 @@ class DatabaseManager:
                         description=excluded.description,
                         image_url=excluded.image_url,
                         deliverables=excluded.deliverables,
-                        stock=excluded.stock,
+                        -- Stock of products with uploaded units is their unclaimed unit count
+                        stock=CASE WHEN EXISTS (SELECT 1 FROM deliverable_units WHERE product_id = products.id)
+                                   THEN products.stock ELSE excluded.stock END,
                         updated_at=CURRENT_TIMESTAMP
                 ''', (name, category, price, description, image_url, deliverables, stock))
                 await db.commit()
@@ -186,10 +383,10 @@ class DatabaseManager:
 
     async def get_products_by_category(self, category: str) -> List[Dict]:
         """Get all products in a category"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
-                SELECT * FROM products 
+                SELECT *, MAX(stock - stock_reserved, 0) AS available FROM products
                 WHERE category = ? AND is_deleted = FALSE 
                 ORDER BY created_at DESC
             ''', (category,))
@@ -198,10 +395,10 @@ class DatabaseManager:
 
     async def get_all_products(self) -> List[Dict]:
         """Get all products"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
-                SELECT * FROM products 
+                SELECT *, MAX(stock - stock_reserved, 0) AS available FROM products
                 WHERE is_deleted = FALSE 
                 ORDER BY created_at DESC
             ''')
@@ -211,7 +408,7 @@ class DatabaseManager:
     async def remove_product(self, name: str) -> bool:
         """Remove a product (soft delete)"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect(self.db_path) as db:
                 await db.execute('''
                     UPDATE products 
                     SET is_deleted = TRUE, updated_at = CURRENT_TIMESTAMP
@@ -226,78 +423,348 @@ class DatabaseManager:
     async def update_stock(self, name: str, amount: int) -> bool:
         """Update stock for a product"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE products 
-                    SET stock = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE name = ?
-                ''', (amount, name))
-                await db.commit()
-                return True
+            product = await self.get_product_by_name(name)
+            if not product:
+                return False
+            async with db_lock(f"product:{product['id']}"):
+                async with connect(self.db_path) as db:
+                    # Products with uploaded units take their stock from the unit pool
+                    cursor = await db.execute('''
+                        UPDATE products 
+                        SET stock = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND NOT EXISTS (SELECT 1 FROM deliverable_units WHERE product_id = ?)
+                    ''', (amount, product['id'], product['id']))
+                    await db.commit()
+                    if cursor.rowcount == 0:
+                        logging.error(f"Error updating stock: {name} gets its stock from deliverable units")
+                        return False
+                    return True
         except Exception as e:
             logging.error(f"Error updating stock: {str(e)}")
             return False
 
-    async def create_order(self, order_id: str, user_id: str, product_id: int,
-                          quantity: int, total_price: float, payment_method: str) -> bool:
-        """Create a new order"""
+    async def create_order(self, order_id: str, user_id: str, items: List[Tuple[int, int]],
+                          payment_method: str, quote: Optional[Quote] = None) -> Optional[Dict]:
+        """Create an order for (product_id, quantity) lines, reserving stock for every line
+
+        A quote, if given, fixes the coin amount for the order total. Raises
+        InsufficientStock if any line cannot be reserved; nothing is written
+        in that case.
+        """
+        quantities: Dict[int, int] = {}
+        for product_id, quantity in items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        async def checkout(db):
+            lines = []
+            for product_id, quantity in sorted(quantities.items()):
+                cursor = await db.execute('''
+                    UPDATE products
+                    SET stock_reserved = stock_reserved + ?
+                    WHERE id = ? AND is_deleted = FALSE AND stock - stock_reserved >= ?
+                    RETURNING name, price, category, deliverables
+                ''', (quantity, product_id, quantity))
+                rows = await cursor.fetchall()
+                if not rows:
+                    cursor = await db.execute('SELECT name FROM products WHERE id = ?', (product_id,))
+                    row = await cursor.fetchone()
+                    raise InsufficientStock(row[0] if row else f"product {product_id}")
+                name, price, category, deliverables = rows[0]
+                lines.append({'product_id': product_id, 'product_name': name, 'product_category': category,
+                              'deliverables': deliverables, 'quantity': quantity,
+                              'unit_price': price, 'line_total': round(price * quantity, 2)})
+
+            total_price = round(sum(line['line_total'] for line in lines), 2)
+            quote_amount = None
+            if quote:
+                # Open orders never share a coin amount, so the amount alone identifies the order
+                cursor = await db.execute('''
+                    SELECT quote_amount FROM orders
+                    WHERE status = 'pending_proof' AND payment_method = ? AND quote_amount IS NOT NULL
+                ''', (payment_method,))
+                taken = {Decimal(row[0]) for row in await cursor.fetchall()}
+                amount = quote.amount(total_price)
+                while amount in taken:
+                    amount += quote.step
+                quote_amount = format(amount, 'f')
+            first = lines[0]
+            await db.execute('''
+                INSERT INTO orders (order_id, user_id, product_id, quantity,
+                                  total_price, payment_method, status, reserved,
+                                  quote_amount, quote_rate, quote_expires_at,
+                                  product_name, product_category, unit_price, deliverables, line_count)
+                VALUES (?, ?, ?, ?, ?, ?, 'pending_proof', TRUE, ?, ?, datetime(?, 'unixepoch'), ?, ?, ?, ?, ?)
+            ''', (order_id, user_id, first['product_id'], sum(quantities.values()), total_price,
+                  payment_method, quote_amount, quote.rate if quote else None,
+                  quote.expires_at if quote else None, first['product_name'], first['product_category'],
+                  first['unit_price'], first['deliverables'], len(lines)))
+            await db.executemany('''
+                INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total,
+                                       product_name, product_category, deliverables)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(order_id, line['product_id'], line['quantity'], line['unit_price'], line['line_total'],
+                   line['product_name'], line['product_category'], line['deliverables'])
+                  for line in lines])
+            return {'order_id': order_id, 'total_price': total_price, 'items': lines,
+                    'quote_amount': quote_amount, 'quote_expires_at': quote.expires_at if quote else None}
+
+        if not quantities:
+            return None
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    INSERT INTO orders (order_id, user_id, product_id, quantity,
-                                      total_price, payment_method, status)
-                    VALUES (?, ?, ?, ?, ?, ?, 'pending_proof')
-                ''', (order_id, user_id, product_id, quantity, total_price, payment_method))
-                await db.commit()
-                return True
+            # One savepoint: every line is reserved, or none is
+            order = await run_write(self.db_path, 'create_order', checkout)
+            self._bump_orders_version(user_id)
+            return order
+        except InsufficientStock:
+            raise
         except Exception as e:
             logging.error(f"Error creating order: {str(e)}")
-            return False
+            return None
+
+    async def get_order_items(self, order_id: str) -> List[Dict]:
+        """Get the lines of an order with their product details as purchased"""
+        async with connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute('''
+                SELECT * FROM order_items WHERE order_id = ? ORDER BY id
+            ''', (order_id,))
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def add_deliverable_units(self, product_id: int, units: List[str],
+                                    added_by: str) -> Optional[Tuple[int, int]]:
+        """Add units to a product's pool; returns (units added, unclaimed units)
+
+        Units already in the pool are skipped. The product's stock becomes its
+        unclaimed unit count.
+        """
+        try:
+            async with db_lock(f'product:{product_id}'):
+                async with connect(self.db_path) as db:
+                    count_sql = '''
+                        SELECT COUNT(*) FROM deliverable_units WHERE product_id = ? AND order_id IS NULL
+                    '''
+                    cursor = await db.execute(count_sql, (product_id,))
+                    before = (await cursor.fetchone())[0]
+                    await db.executemany('''
+                        INSERT OR IGNORE INTO deliverable_units (product_id, content, added_by)
+                        VALUES (?, ?, ?)
+                    ''', [(product_id, unit, added_by) for unit in units])
+                    cursor = await db.execute(count_sql, (product_id,))
+                    unclaimed = (await cursor.fetchone())[0]
+                    await db.execute('''
+                        UPDATE products SET stock = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (unclaimed, product_id))
+                    await db.commit()
+                    return unclaimed - before, unclaimed
+        except Exception as e:
+            logging.error(f"Error adding deliverable units: {str(e)}")
+            return None
+
+    async def get_unit_counts(self, product_id: int) -> Dict:
+        """Get unclaimed and claimed unit counts for a product"""
+        async with connect(self.db_path) as db:
+            cursor = await db.execute('''
+                SELECT COUNT(*) - COUNT(order_id), COUNT(order_id)
+                FROM deliverable_units WHERE product_id = ?
+            ''', (product_id,))
+            unclaimed, claimed = await cursor.fetchone()
+            return {'unclaimed': unclaimed, 'claimed': claimed}
+
+    async def get_order_units(self, order_id: str) -> List[Dict]:
+        """Get the units claimed by an order"""
+        async with connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute('''
+                SELECT product_id, content FROM deliverable_units
+                WHERE order_id = ?
+                ORDER BY id
+            ''', (order_id,))
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
 
     async def update_order_status(self, order_id: str, status: str) -> bool:
         """Update order status and handle stock/stats updates"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('BEGIN TRANSACTION')
-            try:
-                # Update order status
+        try:
+            # Transitions of one order, and stock changes of one product, run one at a time
+            async with db_lock(f'order:{order_id}'):
+                if status != 'completed':
+                    return await self._apply_order_status(order_id, status)
+                async with connect(self.db_path) as db:
+                    cursor = await db.execute('''
+                        SELECT DISTINCT product_id FROM order_items WHERE order_id = ? ORDER BY product_id
+                    ''', (order_id,))
+                    product_ids = [row[0] for row in await cursor.fetchall()]
+                if not product_ids:
+                    logging.error("Error updating order: Order not found")
+                    return False
+                # Sorted, so two orders sharing products always lock them in the same order
+                async with db_lock(*(f'product:{product_id}' for product_id in product_ids)):
+                    return await self._apply_order_status(order_id, status)
+        except LockTimeout as e:
+            logging.error(f"Error updating order: {str(e)}")
+            return False
+
+    async def _apply_order_status(self, order_id: str, status: str) -> bool:
+        async def transition(db):
+            # A repeated transition (e.g. a second Accept click) is a no-op, a completed
+            # order (possibly paid automatically) stays completed, and only an open order
+            # can be completed: a rejected or cancelled one has given its reservation back
+            if status == 'completed':
                 cursor = await db.execute('''
-                    UPDATE orders SET status = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE order_id = ? RETURNING product_id, quantity, total_price
-                ''', (status, order_id))
-                row = await cursor.fetchone()
-                
-                if not row:
-                    raise Exception("Order not found")
-                
-                product_id, quantity, total_price = row
-                
+                    SELECT reserved FROM orders WHERE order_id = ? AND status = 'pending_proof'
+                ''', (order_id,))
+            else:
+                cursor = await db.execute('''
+                    SELECT reserved FROM orders WHERE order_id = ? AND status != ? AND status != 'completed'
+                ''', (order_id, status))
+            row = await cursor.fetchone()
+            if not row:
+                raise Exception(f"Order not found, already {status} or not open")
+            reserved = bool(row[0])
+
+            # Update order status; the reservation is used up or released either way
+            cursor = await db.execute('''
+                UPDATE orders SET status = ?, reserved = FALSE, updated_at = CURRENT_TIMESTAMP
+                WHERE order_id = ?
+                RETURNING user_id
+            ''', (status, order_id))
+            user_id = (await cursor.fetchone())[0]
+            cursor = await db.execute('''
+                SELECT product_id, quantity, line_total FROM order_items WHERE order_id = ?
+            ''', (order_id,))
+            lines = await cursor.fetchall()
+
+            for product_id, quantity, line_total in lines:
                 if status == 'completed':
-                    # Update product stock
+                    # Update product stock, consuming the units reserved at checkout; an
+                    # order without a reservation may not take units reserved by others
                     cursor = await db.execute('''
                         UPDATE products 
                         SET stock = stock - ?,
+                            stock_reserved = MAX(stock_reserved - ?, 0),
                             updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ? AND stock >= ?
+                        WHERE id = ? AND stock - CASE WHEN ? THEN 0 ELSE stock_reserved END >= ?
                         RETURNING stock
-                    ''', (quantity, product_id, quantity))
-                    
-                    stock_row = await cursor.fetchone()
-                    if not stock_row:
+                    ''', (quantity, quantity if reserved else 0, product_id, reserved, quantity))
+
+                    if not await cursor.fetchall():
                         raise Exception("Insufficient stock")
-                    
+
+                    # Hand out the oldest unclaimed units, if the product has any
+                    cursor = await db.execute('''
+                        UPDATE deliverable_units
+                        SET order_id = ?, claimed_at = CURRENT_TIMESTAMP
+                        WHERE id IN (
+                            SELECT id FROM deliverable_units
+                            WHERE product_id = ? AND order_id IS NULL
+                            ORDER BY id LIMIT ?
+                        )
+                        RETURNING id
+                    ''', (order_id, product_id, quantity))
+                    claimed = len(await cursor.fetchall())
+                    if claimed and claimed < quantity:
+                        raise Exception("Not enough deliverable units")
+
                     # Update sales stats
                     await db.execute('''
                         INSERT INTO sales_stats (date, product_id, quantity_sold, revenue)
                         VALUES (date('now'), ?, ?, ?)
-                    ''', (product_id, quantity, total_price))
-                
-                await db.commit()
-                return True
-                
-            except Exception as e:
-                await db.execute('ROLLBACK')
-                logging.error(f"Error updating order: {str(e)}")
-                return False
+                    ''', (product_id, quantity, line_total))
+                elif reserved:
+                    # Rejected or cancelled: give the reserved units back
+                    await db.execute('''
+                        UPDATE products SET stock_reserved = MAX(stock_reserved - ?, 0)
+                        WHERE id = ?
+                    ''', (quantity, product_id))
+            return user_id
+
+        # Runs in its own savepoint: a failure here leaves the order and stock untouched
+        try:
+            user_id = await run_write(self.db_path, 'update_order_status', transition)
+            self._bump_orders_version(user_id)
+            return True
+        except Exception as e:
+            logging.error(f"Error updating order: {str(e)}")
+            return False
+
+    async def expire_reservations(self, max_age_minutes: float) -> List[Dict]:
+        """Cancel unpaid orders older than max_age_minutes and release their reserved stock"""
+        async def expire(db):
+            cursor = await db.execute('''
+                SELECT order_id, user_id FROM orders
+                WHERE reserved = TRUE AND status = 'pending_proof' AND proof_image IS NULL
+                  AND created_at < datetime('now', ?)
+            ''', (f'-{max_age_minutes} minutes',))
+            expired = [{'order_id': row[0], 'user_id': row[1]} for row in await cursor.fetchall()]
+            for order in expired:
+                cursor = await db.execute('''
+                    SELECT product_id, quantity FROM order_items WHERE order_id = ?
+                ''', (order['order_id'],))
+                await db.executemany('''
+                    UPDATE products SET stock_reserved = MAX(stock_reserved - ?, 0)
+                    WHERE id = ?
+                ''', [(quantity, product_id) for product_id, quantity in await cursor.fetchall()])
+                await db.execute('''
+                    UPDATE orders SET status = 'cancelled', reserved = FALSE, updated_at = CURRENT_TIMESTAMP
+                    WHERE order_id = ?
+                ''', (order['order_id'],))
+            return expired
+
+        try:
+            # Checked and cancelled in one write, so a proof arriving meanwhile keeps its order
+            expired = await run_write(self.db_path, 'expire_reservations', expire)
+            if expired:
+                self._bump_orders_version(*(order['user_id'] for order in expired))
+            return expired
+        except Exception as e:
+            logging.error(f"Error expiring reservations: {str(e)}")
+            return []
+
+    async def get_open_orders(self, methods: List[str]) -> List[Dict]:
+        """Get every order awaiting payment with one of the given payment methods"""
+        async with connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute(f'''
+                SELECT order_id, user_id, total_price, payment_method, created_at,
+                       quote_amount, quote_expires_at
+                FROM orders
+                WHERE status = 'pending_proof' AND payment_method IN ({', '.join('?' * len(methods))})
+            ''', methods)
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def get_known_transfers(self, keys: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """The (method, txid) pairs among keys that were already handled"""
+        known = set()
+        async with connect(self.db_path) as db:
+            # Stay under the bound-parameter limit of older SQLite builds
+            for start in range(0, len(keys), 400):
+                chunk = keys[start:start + 400]
+                cursor = await db.execute(f'''
+                    SELECT method, txid FROM payment_transfers
+                    WHERE (method, txid) IN (VALUES {', '.join('(?, ?)' for _ in chunk)})
+                ''', [value for key in chunk for value in key])
+                known.update(tuple(row) for row in await cursor.fetchall())
+        return known
+
+    async def record_transfers(self, transfers: List[Dict]) -> bool:
+        """Record handled transfers (method, txid, amount, coin_amount, memo, received_at, order_id, outcome)"""
+        async def record(db):
+            await db.executemany('''
+                INSERT OR IGNORE INTO payment_transfers
+                    (method, txid, amount, coin_amount, memo, received_at, order_id, outcome)
+                VALUES (:method, :txid, :amount, :coin_amount, :memo, datetime(:received_at, 'unixepoch'),
+                        :order_id, :outcome)
+            ''', transfers)
+
+        try:
+            await run_write(self.db_path, 'record_transfers', record)
+            return True
+        except Exception as e:
+            logging.error(f"Error recording transfers: {str(e)}")
+            return False
 
     async def get_sales_stats(self, period: str = 'all') -> Tuple[Dict, List[Dict]]:
         """Get sales statistics for the specified period"""
@@ -308,7 +775,7 @@ class DatabaseManager:
             'all': '1=1'
         }.get(period, '1=1')
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with read_only(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             
             # Get summary stats
@@ -337,9 +804,145 @@ class DatabaseManager:
             
             return summary, time_series
 
+    @staticmethod
+    def _order_filters(filters: Dict) -> Tuple[str, List]:
+        """WHERE clause for the order explorer filters
+
+        filters may hold status, user_id, payment_method, product (a product
+        name, matching any line of the order) and since/until (created_at
+        bounds as SQLite timestamps; until is exclusive).
+        """
+        clauses, params = [], []
+        for column in ('status', 'user_id', 'payment_method'):
+            if filters.get(column):
+                clauses.append(f'o.{column} = ?')
+                params.append(filters[column])
+        if filters.get('product'):
+            clauses.append('''o.order_id IN (
+                SELECT i.order_id FROM order_items i
+                WHERE i.product_id IN (SELECT id FROM products WHERE name = ?)
+            )''')
+            params.append(filters['product'])
+        if filters.get('since'):
+            clauses.append('o.created_at >= ?')
+            params.append(filters['since'])
+        if filters.get('until'):
+            clauses.append('o.created_at < ?')
+            params.append(filters['until'])
+        return ' AND '.join(clauses) or '1=1', params
+
+    @staticmethod
+    def _order_page(after: Optional[Tuple[str, int]], before: Optional[Tuple[str, int]]) -> Tuple[str, List, str]:
+        """Keyset condition and sort direction for a page of orders on (created_at, id)"""
+        if after:
+            # Spelled out instead of a row-value comparison so created_at bounds the index range
+            return ' AND o.created_at <= ? AND (o.created_at < ? OR o.id < ?)', [after[0], after[0], after[1]], 'DESC'
+        if before:
+            return ' AND o.created_at >= ? AND (o.created_at > ? OR o.id > ?)', [before[0], before[0], before[1]], 'ASC'
+        return '', [], 'DESC'
+
+    async def search_orders(self, filters: Dict, after: Optional[Tuple[str, int]] = None,
+                            before: Optional[Tuple[str, int]] = None,
+                            limit: int = 10) -> Tuple[List[Dict], bool]:
+        """One page of orders matching filters, newest first, and whether another page follows it
+
+        Pages are keyset-paginated on (created_at, id): `after` is the last
+        row of the current page (next page, older orders), `before` its
+        first row (previous page, newer orders). "Follows" is in the
+        direction paged.
+        """
+        where, params = self._order_filters(filters)
+        page, page_params, order = self._order_page(after, before)
+        where += page
+        params += page_params
+
+        async with read_only(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute(f'''
+                SELECT o.id, o.order_id, o.user_id, o.status, o.payment_method, o.total_price,
+                       o.quantity, o.product_name, o.line_count, o.created_at
+                FROM orders o
+                WHERE {where}
+                ORDER BY o.created_at {order}, o.id {order}
+                LIMIT ?
+            ''', (*params, limit + 1))
+            rows = [dict(row) for row in await cursor.fetchall()]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return (rows[::-1] if before else rows), more
+
+    async def get_user_orders(self, user_id: str, after: Optional[Tuple[str, int]] = None,
+                              before: Optional[Tuple[str, int]] = None,
+                              limit: int = 5) -> Tuple[List[Dict], bool]:
+        """One page of a buyer's orders with their lines, newest first, and whether another page follows it
+
+        Paged like search_orders, along idx_orders_user_id.
+        """
+        page, page_params, order = self._order_page(after, before)
+        async with connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute(f'''
+                SELECT o.id, o.order_id, o.status, o.payment_method, o.total_price, o.quote_amount,
+                       o.proof_image IS NOT NULL AS has_proof, o.created_at
+                FROM orders o
+                WHERE o.user_id = ?{page}
+                ORDER BY o.created_at {order}, o.id {order}
+                LIMIT ?
+            ''', (user_id, *page_params, limit + 1))
+            rows = [dict(row) for row in await cursor.fetchall()]
+            more = len(rows) > limit
+            rows = rows[:limit]
+            if before:
+                rows.reverse()
+
+            lines: Dict[str, List[Dict]] = {row['order_id']: [] for row in rows}
+            if rows:
+                cursor = await db.execute(f'''
+                    SELECT order_id, product_id, product_name, quantity, line_total FROM order_items
+                    WHERE order_id IN ({', '.join('?' * len(rows))})
+                    ORDER BY id
+                ''', list(lines))
+                for line in await cursor.fetchall():
+                    lines[line['order_id']].append(dict(line))
+        for row in rows:
+            row['items'] = lines[row['order_id']]
+        return rows, more
+
+    async def export_orders(self, filters: Dict, batch_size: int = 1000):
+        """Every order matching filters, newest first, yielded in batches of row tuples
+
+        The first batch is the column names. Rows are read from the cursor
+        as they are consumed, so an export never holds the whole result.
+        """
+        where, params = self._order_filters(filters)
+        async with read_only(self.db_path) as db:
+            cursor = await db.execute(f'''
+                SELECT o.order_id, o.created_at, o.updated_at, o.status, o.user_id, o.payment_method,
+                       o.total_price, o.quote_amount, o.quantity, o.line_count, o.product_name,
+                       o.product_category, o.unit_price
+                FROM orders o
+                WHERE {where}
+                ORDER BY o.created_at DESC, o.id DESC
+            ''', params)
+            yield [[column[0] for column in cursor.description]]
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    async def get_orders_version(self) -> Tuple:
+        """Get a cheap token that changes whenever the orders table changes"""
+        async with read_only(self.db_path) as db:
+            cursor = await db.execute('''
+                SELECT MAX(id), MAX(updated_at) FROM orders
+            ''')
+            max_id, max_updated_at = await cursor.fetchone()
+            return (DatabaseManager._orders_version, max_id, max_updated_at)
+
     async def get_pending_order(self, user_id: str) -> Optional[Dict]:
         """Get pending order for a user"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
                 SELECT * FROM orders 
@@ -352,7 +955,7 @@ class DatabaseManager:
     
     async def get_product(self, product_id: int) -> Optional[Dict]:
         """Get a product by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
                 SELECT * FROM products WHERE id = ?
@@ -363,27 +966,29 @@ class DatabaseManager:
     async def update_order_proof(self, order_id: str, proof_url: str) -> bool:
         """Update order with payment proof"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE orders 
-                    SET proof_image = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE order_id = ?
-                ''', (proof_url, order_id))
-                await db.commit()
+            async with db_lock(f'order:{order_id}'):
+                async def attach_proof(db):
+                    cursor = await db.execute('''
+                        UPDATE orders 
+                        SET proof_image = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE order_id = ?
+                        RETURNING user_id
+                    ''', (proof_url, order_id))
+                    return [row[0] for row in await cursor.fetchall()]
+
+                user_ids = await run_write(self.db_path, 'update_order_proof', attach_proof)
+                self._bump_orders_version(*user_ids)
                 return True
         except Exception as e:
             logging.error(f"Error updating order proof: {str(e)}")
             return False
 
     async def get_order_by_id(self, order_id: str) -> Optional[Dict]:
-        """Get order details by order ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Get order details by order ID, with its first product as purchased"""
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
-                SELECT o.*, p.name as product_name, p.category as product_category
-                FROM orders o
-                LEFT JOIN products p ON o.product_id = p.id
-                WHERE o.order_id = ?
+                SELECT * FROM orders WHERE order_id = ?
             ''', (order_id,))
             row = await cursor.fetchone()
             return dict(row) if row else None
@@ -391,7 +996,7 @@ class DatabaseManager:
     async def update_payment_info(self, method_name: str, address: str) -> bool:
         """Add or update payment method information"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with connect(self.db_path) as db:
                 await db.execute('''
                     INSERT INTO payment_methods (method_name, address)
                     VALUES (?, ?)
@@ -407,7 +1012,7 @@ class DatabaseManager:
 
     async def get_payment_info(self, method_name: str) -> Optional[str]:
         """Get payment address for a specific method"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
                 SELECT address FROM payment_methods 
@@ -420,7 +1025,7 @@ class DatabaseManager:
 
     async def get_all_payment_info(self) -> List[Dict]:
         """Get all payment methods"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
                 SELECT * FROM payment_methods 
@@ -429,9 +1034,48 @@ class DatabaseManager:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+    async def add_to_blacklist(self, user_id: str, reason: Optional[str], added_by: str) -> bool:
+        """Add a user to the blacklist or update the reason"""
+        try:
+            async with connect(self.db_path) as db:
+                await db.execute('''
+                    INSERT INTO blacklist (user_id, reason, added_by)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        reason=excluded.reason,
+                        added_by=excluded.added_by
+                ''', (user_id, reason, added_by))
+                await db.commit()
+                return True
+        except Exception as e:
+            logging.error(f"Error adding to blacklist: {str(e)}")
+            return False
+
+    async def remove_from_blacklist(self, user_id: str) -> bool:
+        """Remove a user from the blacklist; False if they were not on it"""
+        try:
+            async with connect(self.db_path) as db:
+                cursor = await db.execute('DELETE FROM blacklist WHERE user_id = ?', (user_id,))
+                await db.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"Error removing from blacklist: {str(e)}")
+            return False
+
+    async def get_blacklist(self) -> List[Dict]:
+        """Get all blacklisted users"""
+        async with connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute('''
+                SELECT * FROM blacklist
+                ORDER BY created_at DESC
+            ''')
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
     async def get_product_by_name(self, name: str) -> Optional[Dict]:
         """Get a product by name"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
                 SELECT * FROM products 
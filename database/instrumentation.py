@@ -0,0 +1,225 @@
+"""
+Timing instrumentation for DatabaseManager
+
+Every public DatabaseManager coroutine is wrapped so its latency, statement
+count, rows returned, errors and SQLITE_BUSY retries are recorded under the
+method name. Statements run through `connect()`, which times each execute,
+retries on "database is locked" and logs slow queries.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Tuple
+
+import aiosqlite
+
+from utils.metrics import Histogram, metrics
+from utils.tracing import record_span
+
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '250'))
+BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', '5'))
+BUSY_RETRIES = int(os.getenv('DB_BUSY_RETRIES', '2'))
+
+_current_method: contextvars.ContextVar[str] = contextvars.ContextVar('db_method', default='unknown')
+
+method_seconds = metrics.histogram(
+    'novacore_db_method_seconds', 'DatabaseManager method latency', ['method']
+)
+query_seconds = metrics.histogram(
+    'novacore_db_query_seconds', 'Single SQL statement latency', ['method']
+)
+rows_total = metrics.counter(
+    'novacore_db_rows_total', 'Rows fetched by DatabaseManager methods', ['method']
+)
+errors_total = metrics.counter(
+    'novacore_db_errors_total', 'SQL statements that raised', ['method']
+)
+busy_retries_total = metrics.counter(
+    'novacore_db_busy_retries_total', 'Statements retried after SQLITE_BUSY', ['method']
+)
+slow_queries_total = metrics.counter(
+    'novacore_db_slow_queries_total', 'Statements slower than DB_SLOW_QUERY_MS', ['method']
+)
+
+class MethodStats:
+    __slots__ = ('calls', 'total', 'max', 'statements', 'rows', 'errors', 'busy_retries')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.errors = 0
+        self.busy_retries = 0
+
+class QueryStats:
+    """Aggregated per-method query statistics for /dbstats"""
+    def __init__(self, slow_log_size: int = 20):
+        self.methods: Dict[str, MethodStats] = {}
+        self.slow_queries: Deque[Tuple[float, str, float, str]] = deque(maxlen=slow_log_size)
+        self.latency = self._new_latency()
+
+    @staticmethod
+    def _new_latency() -> Histogram:
+        # Separate from method_seconds, so a reset does not rewind the exported metric
+        return Histogram('db_method_seconds', 'DatabaseManager method latency since the last reset', ['method'])
+
+    def method(self, name: str) -> MethodStats:
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = MethodStats()
+        return stats
+
+    def p95(self, name: str) -> float:
+        """95th percentile latency since the last reset, never above the slowest call"""
+        stats = self.methods.get(name)
+        if stats is None:
+            return 0.0
+        return min(self.latency.quantile(0.95, method=name) or 0.0, stats.max)
+
+    def top(self, limit: int = 10) -> List[Tuple[str, MethodStats]]:
+        """Methods sorted by total time spent"""
+        return sorted(self.methods.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+
+    def reset(self):
+        self.methods.clear()
+        self.slow_queries.clear()
+        self.latency = self._new_latency()
+
+# Global query stats instance
+query_stats = QueryStats()
+
+def _is_busy(error: Exception) -> bool:
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+def _short_sql(sql: str) -> str:
+    return ' '.join(sql.split())[:200]
+
+class InstrumentedCursor:
+    """Cursor wrapper that counts fetched rows"""
+    def __init__(self, cursor: aiosqlite.Cursor, method: str):
+        self._cursor = cursor
+        self._method = method
+
+    def _count(self, rows: int):
+        query_stats.method(self._method).rows += rows
+        rows_total.inc(rows, method=self._method)
+
+    async def fetchone(self):
+        row = await self._cursor.fetchone()
+        self._count(1 if row is not None else 0)
+        return row
+
+    async def fetchall(self):
+        rows = await self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    async def fetchmany(self, size: int = None):
+        rows = await (self._cursor.fetchmany(size) if size else self._cursor.fetchmany())
+        self._count(len(rows))
+        return rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for row in self._cursor:
+            self._count(1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """aiosqlite connection wrapper that times every statement"""
+    def __init__(self, connection: aiosqlite.Connection):
+        self._connection = connection
+
+    @property
+    def row_factory(self):
+        return self._connection.row_factory
+
+    @row_factory.setter
+    def row_factory(self, factory):
+        self._connection.row_factory = factory
+
+    async def _run(self, operation: str, sql: str, parameters):
+        method = _current_method.get()
+        stats = query_stats.method(method)
+        for attempt in range(BUSY_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                cursor = await getattr(self._connection, operation)(sql, parameters)
+                break
+            except Exception as e:
+                if _is_busy(e) and attempt < BUSY_RETRIES:
+                    stats.busy_retries += 1
+                    busy_retries_total.inc(method=method)
+                    logging.warning(f"Database busy in {method}, retrying ({attempt + 1}/{BUSY_RETRIES})")
+                    await asyncio.sleep(0.05 * (attempt + 1))
+                    continue
+                stats.errors += 1
+                errors_total.inc(method=method)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.statements += 1
+                query_seconds.observe(elapsed, method=method)
+                if elapsed * 1000 >= SLOW_QUERY_MS:
+                    slow_queries_total.inc(method=method)
+                    query_stats.slow_queries.append((time.time(), method, elapsed, _short_sql(sql)))
+                    logging.warning(f"Slow query in {method} ({elapsed * 1000:.0f} ms): {_short_sql(sql)}")
+        return InstrumentedCursor(cursor, method)
+
+    async def execute(self, sql: str, parameters=()):
+        return await self._run('execute', sql, parameters)
+
+    async def executemany(self, sql: str, parameters):
+        return await self._run('executemany', sql, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+@asynccontextmanager
+async def connect(db_path: str, **kwargs):
+    """Open an instrumented aiosqlite connection"""
+    kwargs.setdefault('timeout', BUSY_TIMEOUT)
+    async with aiosqlite.connect(db_path, **kwargs) as db:
+        yield InstrumentedConnection(db)
+
+def _timed(name: str, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _current_method.set(name)
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_method.reset(token)
+            stats = query_stats.method(name)
+            stats.calls += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            method_seconds.observe(elapsed, method=name)
+            query_stats.latency.observe(elapsed, method=name)
+            record_span(f'db.{name}', elapsed)
+    return wrapper
+
+def instrument_queries(cls):
+    """Class decorator that times every public coroutine method"""
+    for name, func in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.iscoroutinefunction(func):
+            setattr(cls, name, _timed(name, func))
+    return cls
@@ -0,0 +1,197 @@
+"""
+Single-writer group commit for order writes
+
+Order writes are queued to one writer task per database instead of each
+opening a connection and committing on its own. The writer takes whatever
+arrives within DB_WRITE_BATCH_MS of the first queued write (up to
+DB_WRITE_MAX_BATCH), runs each write in its own savepoint inside one
+BEGIN IMMEDIATE transaction and commits once. A write that raises is
+rolled back to its savepoint and only its caller sees the error; a failed
+commit fails the whole batch. If the writer cannot open its connection,
+the queued writes fail and the next write starts a new writer. Reads keep using their own connections.
+
+DB_GROUP_COMMIT=false runs every write on its own connection and commit,
+as before (benchmarks/bench_writes.py compares both).
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from database.instrumentation import _current_method, connect
+from utils.metrics import metrics
+
+GROUP_COMMIT = os.getenv('DB_GROUP_COMMIT', 'true').lower() in ('1', 'true', 'yes')
+BATCH_WINDOW = float(os.getenv('DB_WRITE_BATCH_MS', '2')) / 1000
+MAX_BATCH = int(os.getenv('DB_WRITE_MAX_BATCH', '64'))
+
+WriteOp = Callable[[Any], Awaitable[Any]]
+
+batch_size = metrics.histogram(
+    'novacore_db_write_batch_size', 'Writes committed together by the group-commit writer',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+commit_seconds = metrics.histogram(
+    'novacore_db_write_commit_seconds', 'Time to run and commit one write batch'
+)
+queue_wait_seconds = metrics.histogram(
+    'novacore_db_write_queue_wait_seconds', 'Time a write waited in the writer queue'
+)
+
+class WriteActor:
+    """Owns the only writing connection to one database"""
+    def __init__(self, db_path: str, batch_window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH):
+        self.db_path = db_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        # Started in an empty context so it does not inherit the first caller's interaction trace
+        self._task = contextvars.Context().run(self._loop.create_task, self._run())
+        self.batches = 0
+        self.writes = 0
+
+    @property
+    def alive(self) -> bool:
+        return not self._task.done() and self._loop is asyncio.get_running_loop()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, name: str, op: WriteOp) -> Any:
+        """Queue op(connection) and wait for its own result or error"""
+        if self._task.done():
+            raise RuntimeError("Database writer stopped")
+        future = self._loop.create_future()
+        self._queue.put_nowait((name, op, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        try:
+            async with connect(self.db_path, isolation_level=None) as db:
+                while True:
+                    batch = await self._collect()
+                    try:
+                        await self._commit(db, batch)
+                    except Exception as e:
+                        logging.error(f"Error committing write batch: {str(e)}")
+                        self._fail(batch, e)
+                    except asyncio.CancelledError:
+                        self._fail(batch, RuntimeError("Database writer stopped"))
+                        raise
+        except Exception as e:
+            # The connection could not be opened or closed; get_writer replaces a stopped writer
+            logging.error(f"Database writer for {self.db_path} stopped: {str(e)}")
+            self._fail(self._drain(), e)
+
+    def _drain(self) -> List[Tuple]:
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        return pending
+
+    def _fail(self, batch: List[Tuple], error: BaseException):
+        for _, _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _commit(self, db, batch: List[Tuple]):
+        started = time.perf_counter()
+        results: List[Tuple[asyncio.Future, bool, Any]] = []
+        token = _current_method.set(batch[0][0])
+        try:
+            await db.execute('BEGIN IMMEDIATE')
+            try:
+                for name, op, future, queued_at in batch:
+                    queue_wait_seconds.observe(started - queued_at)
+                    # Statements are attributed to the caller's DatabaseManager method
+                    _current_method.set(name)
+                    await db.execute('SAVEPOINT write')
+                    try:
+                        results.append((future, True, await op(db)))
+                        await db.execute('RELEASE write')
+                    except Exception as e:
+                        await db.execute('ROLLBACK TO write')
+                        await db.execute('RELEASE write')
+                        results.append((future, False, e))
+                _current_method.set('write_batch')
+                await db.execute('COMMIT')
+            except BaseException:
+                await db.execute('ROLLBACK')
+                raise
+        finally:
+            _current_method.reset(token)
+
+        self.batches += 1
+        self.writes += len(batch)
+        batch_size.observe(len(batch))
+        commit_seconds.observe(time.perf_counter() - started)
+        for future, ok, value in results:
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def close(self):
+        """Stop the writer and fail writes still waiting in the queue"""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._fail(self._drain(), RuntimeError("Database writer stopped"))
+
+_writers: Dict[str, WriteActor] = {}
+
+def get_writer(db_path: str) -> WriteActor:
+    """The writer for a database, started on first use in the running loop"""
+    writer = _writers.get(db_path)
+    if writer is None or not writer.alive:
+        writer = _writers[db_path] = WriteActor(db_path)
+    return writer
+
+async def run_write(db_path: str, name: str, op: WriteOp) -> Any:
+    """Run op(connection) as one write: through the group-commit writer, or on its own connection"""
+    if GROUP_COMMIT:
+        return await get_writer(db_path).submit(name, op)
+    async with connect(db_path) as db:
+        try:
+            result = await op(db)
+            await db.commit()
+            return result
+        except BaseException:
+            await db.rollback()
+            raise
+
+async def close_writers():
+    """Stop every writer (pending writes are failed)"""
+    for writer in list(_writers.values()):
+        if writer.alive:
+            await writer.close()
+    _writers.clear()
+
+metrics.gauge(
+    'novacore_db_write_queue_depth', 'Writes waiting for the group-commit writer',
+    callback=lambda: sum(writer.depth() for writer in _writers.values())
+)
@@ -1,8 +1,17 @@
 import discord
 from discord import ui
-from typing import Optional, List
+from typing import Optional, List, Tuple
 import logging
 import os
+from utils.blacklist import blacklist
+from utils.cart import MAX_LINES, MAX_QUANTITY, RESERVATION_MINUTES, carts
+from utils.order_ids import order_ids
+from utils.payment_methods import payment_methods
+from utils.payment_providers import is_verified
+from utils.quotes import quotes
+from utils.tracing import RateLimitedModal, RateLimitedView, traced, span
+
+BLACKLISTED_MESSAGE = "❌ You are not allowed to place orders. Please contact staff if you think this is a mistake."
 
 class CategorySelect(ui.Select):
     def __init__(self, categories: List[dict]):
@@ -19,6 +28,7 @@ class CategorySelect(ui.Select):
             options=options
         )
 
+    @traced()
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         
@@ -37,25 +47,26 @@ class CategorySelect(ui.Select):
         )
         
         for product in products:
-            status = "🟢 In Stock" if product['stock'] > 0 else "🔴 Out of Stock"
+            status = "🟢 In Stock" if product['available'] > 0 else "🔴 Out of Stock"
             embed.add_field(
                 name=f"**{product['name']}** - €{product['price']:.2f}",
-                value=f"{product['description'][:100]}...\n**Status:** {status} ({product['stock']} units available)",
+                value=f"{product['description'][:100]}...\n**Status:** {status} ({product['available']} units available)",
                 inline=False
             )
             if product.get('image_url'):
                 embed.set_thumbnail(url=product['image_url'])
         
-        embed.set_footer(text="💡 Click 'Buy' button below to purchase your product")
+        embed.set_footer(text="💡 Click 'Buy' to add a product to your cart")
         
         view = ProductView(products)
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
-class StockView(ui.View):
+class StockView(RateLimitedView):
     def __init__(self):
         super().__init__(timeout=None)
 
     @ui.button(label="Show Stock", style=discord.ButtonStyle.primary, custom_id="show_stock")
+    @traced(rate_limit='show_stock')
     async def show_stock(self, interaction: discord.Interaction, button: ui.Button):
         from database.db_manager import DatabaseManager
         db = DatabaseManager(os.getenv('DATABASE_PATH'))
@@ -68,7 +79,7 @@ class StockView(ui.View):
             )
             return
         
-        view = ui.View()
+        view = RateLimitedView()
         view.add_item(CategorySelect(categories))
         await interaction.response.send_message(
             "Please select a category below to view products:",
@@ -76,7 +87,7 @@ class StockView(ui.View):
             ephemeral=True
         )
 
-class BuyModal(ui.Modal):
+class BuyModal(RateLimitedModal):
     def __init__(self, product: dict):
         super().__init__(title=f"Purchase {product['name']}")
         self.product = product
@@ -90,66 +101,136 @@ class BuyModal(ui.Modal):
         )
         self.add_item(self.quantity)
         
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
+        if blacklist.is_blocked(interaction.user.id):
+            await interaction.response.send_message(BLACKLISTED_MESSAGE, ephemeral=True)
+            return
+
         try:
             quantity = int(self.quantity.value)
-            if quantity < 1 or quantity > 100:
+            if quantity < 1 or quantity > MAX_QUANTITY:
                 raise ValueError("Invalid quantity")
-                
-            if quantity > self.product['stock']:
+
+            cart = carts.get(interaction.user.id)
+            if quantity + cart.quantity(self.product['id']) > self.product['available']:
                 await interaction.response.send_message(
                     "Sorry, not enough stock available.",
                     ephemeral=True
                 )
                 return
-                
-            view = PaymentMethodView(self.product, quantity)
+
+            if not cart.add(self.product, quantity):
+                await interaction.response.send_message(
+                    f"❌ Your cart is full (up to {MAX_LINES} products, {MAX_QUANTITY} units each). "
+                    "Check out or clear it first.",
+                    ephemeral=True
+                )
+                return
+
             await interaction.response.send_message(
-                "Please select your payment method:",
-                view=view,
+                embed=cart_embed(cart),
+                view=CartView(),
                 ephemeral=True
             )
             
         except ValueError:
             await interaction.response.send_message(
-                "Please enter a valid quantity between 1 and 100.",
+                f"Please enter a valid quantity between 1 and {MAX_QUANTITY}.",
                 ephemeral=True
             )
 
-class PaymentMethodView(ui.View):
-    def __init__(self, product: dict, quantity: int):
+def cart_embed(cart) -> discord.Embed:
+    """Summary of a buyer's cart"""
+    embed = discord.Embed(
+        title="🛒 Your Cart",
+        description="\n".join(
+            f"• **{product['name']}** x{quantity} - €{product['price'] * quantity:.2f}"
+            for product, quantity in cart.lines()
+        ) or "Your cart is empty.",
+        color=0x8b5cf6
+    )
+    embed.add_field(name="Total", value=f"€{cart.total:.2f}", inline=True)
+    embed.set_footer(text="Use Show Stock to add more products, or check out below")
+    return embed
+
+class CartView(RateLimitedView):
+    def __init__(self):
         super().__init__(timeout=300)
-        self.product = product
-        self.quantity = quantity
-        self.total = product['price'] * quantity
+
+    @ui.button(label="Checkout", style=discord.ButtonStyle.success, emoji="✅", custom_id="cart_checkout")
+    @traced()
+    async def checkout(self, interaction: discord.Interaction, button: ui.Button):
+        cart = carts.peek(interaction.user.id)
+        if not cart:
+            await interaction.response.send_message(
+                "🛒 Your cart is empty or has expired. Use Show Stock to add products.",
+                ephemeral=True
+            )
+            return
+
+        view = PaymentMethodView(cart.lines())
+        await interaction.response.send_message(
+            "Please select your payment method:",
+            view=view,
+            ephemeral=True
+        )
+
+    @ui.button(label="Clear Cart", style=discord.ButtonStyle.danger, emoji="🗑️", custom_id="cart_clear")
+    @traced()
+    async def clear(self, interaction: discord.Interaction, button: ui.Button):
+        carts.clear(interaction.user.id)
+        await interaction.response.send_message("🗑️ Your cart has been cleared.", ephemeral=True)
+
+class PaymentMethodView(RateLimitedView):
+    def __init__(self, lines: List[Tuple[dict, int]]):
+        super().__init__(timeout=300)
+        self.lines = lines
 
     async def handle_payment_selection(self, interaction: discord.Interaction, payment_method: str):
-        from database.db_manager import DatabaseManager
-        import random
-        import string
-        from datetime import datetime
+        from database.db_manager import DatabaseManager, InsufficientStock
+
+        if blacklist.is_blocked(interaction.user.id):
+            await interaction.response.send_message(BLACKLISTED_MESSAGE, ephemeral=True)
+            return
+        
+        method = payment_methods.get(payment_method)
+        if not method:
+            await interaction.response.send_message(
+                "❌ This payment method is not available right now. Please choose another one.",
+                ephemeral=True
+            )
+            return
         
         db = DatabaseManager(os.getenv('DATABASE_PATH'))
         
-        date = datetime.now().strftime("%Y%m%d")
-        random_chars = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        order_id = f"NC-{date}-{random_chars}"
-        
-        success = await db.create_order(
-            order_id=order_id,
-            user_id=str(interaction.user.id),
-            product_id=self.product['id'],
-            quantity=self.quantity,
-            total_price=self.total,
-            payment_method=payment_method
-        )
+        order_id = order_ids.next()
         
-        if not success:
+        # Every line is priced and reserved in one transaction; the coin rate comes from the cache
+        try:
+            order = await db.create_order(
+                order_id=order_id,
+                user_id=str(interaction.user.id),
+                items=[(product['id'], quantity) for product, quantity in self.lines],
+                payment_method=payment_method,
+                quote=quotes.lock(payment_method)
+            )
+        except InsufficientStock as e:
+            await interaction.response.send_message(
+                f"❌ Not enough stock left for **{e.product_name}**. Please clear your cart and try again.",
+                ephemeral=True
+            )
+            return
+        
+        if not order:
             await interaction.response.send_message(
                 "❌ Failed to create order. Please try again.",
                 ephemeral=True
             )
             return
+        # Only what was ordered; lines added after Checkout stay in the cart
+        carts.ordered(interaction.user.id, self.lines)
+        total = order['total_price']
         
         embed = discord.Embed(
             title="🛍️ Order Created Successfully",
@@ -157,50 +238,77 @@ class PaymentMethodView(ui.View):
             color=0x8b5cf6
         )
         
-        embed.add_field(name="Product", value=self.product['name'], inline=True)
-        embed.add_field(name="Quantity", value=str(self.quantity), inline=True)
-        embed.add_field(name="Total", value=f"€{self.total:.2f}", inline=True)
+        embed.add_field(
+            name="Items",
+            value="\n".join(
+                f"• {line['product_name']} x{line['quantity']} - €{line['line_total']:.2f}"
+                for line in order['items']
+            ),
+            inline=False
+        )
+        embed.add_field(name="Total", value=f"€{total:.2f}", inline=True)
+        
+        if is_verified(payment_method):
+            after_payment = "Your order completes automatically once the payment arrives"
+        else:
+            after_payment = "After payment, send proof of payment so our staff can review your order"
         
         if payment_method == 'paypal':
             embed.add_field(
                 name="💳 PayPal Payment Instructions",
                 value=f"""
-                Please send **€{self.total:.2f}** to:
-                **PayPal:** {os.getenv('PAYPAL_EMAIL')}
+                Please send **€{total:.2f}** to:
+                **PayPal:** {method.address}
                 
                 **Important:**
                 • Send as Friends & Family
                 • Include Order ID (**{order_id}**) in the payment notes
-                • After payment, send proof of payment so our staff can review your order
+                • {after_payment}
                 """,
                 inline=False
             )
         else:
-            address_var = f"{payment_method.upper()}_ADDRESS"
-            address = os.getenv(address_var, "Contact staff for address")
+            address = method.address
+            network_info = f"\n**Network:** {method.network}" if method.network else ""
             
-            network_info = ""
-            if payment_method == 'usdt':
-                network_info = "\n**Network:** Tron (TRC20)"
-            
-            embed.add_field(
-                name=f"💰 {payment_method.upper()} Payment Instructions",
-                value=f"""
-                Please send **€{self.total:.2f}** worth of {payment_method.upper()} to:
-                **Address:** `{address}`{network_info}
-                
-                **Important:**
-                • Include Order ID (**{order_id}**) in transaction notes if possible
-                • After payment, send proof of payment so our staff can review your order
-                """,
-                inline=False
-            )
+            if order['quote_amount']:
+                embed.add_field(
+                    name=f"💰 {payment_method.upper()} Payment Instructions",
+                    value=f"""
+                    Please send exactly **{order['quote_amount']} {payment_method.upper()}** (€{total:.2f}) to:
+                    **Address:** `{address}`{network_info}
+                    
+                    **Important:**
+                    • This amount is locked until <t:{int(order['quote_expires_at'])}:t>
+                    • Include Order ID (**{order_id}**) in transaction notes if possible
+                    • {after_payment}
+                    """,
+                    inline=False
+                )
+            else:
+                embed.add_field(
+                    name=f"💰 {payment_method.upper()} Payment Instructions",
+                    value=f"""
+                    Please send **€{total:.2f}** worth of {payment_method.upper()} to:
+                    **Address:** `{address}`{network_info}
+                    
+                    **Important:**
+                    • Include Order ID (**{order_id}**) in transaction notes if possible
+                    • {after_payment}
+                    """,
+                    inline=False
+                )
         
-        embed.set_footer(text="Send proof of payment so our staff can review your order")
+        embed.set_footer(
+            text=f"Your items are reserved for {RESERVATION_MINUTES:g} minutes. "
+                 + ("Payments that include your Order ID are confirmed automatically" if is_verified(payment_method)
+                    else "Send proof of payment so our staff can review your order")
+        )
         embed.timestamp = discord.utils.utcnow()
         
         try:
-            await interaction.user.send(embed=embed)
+            with span('discord.dm'):
+                await interaction.user.send(embed=embed)
             await interaction.response.send_message(
                 "✅ Order created! Check your DMs for payment instructions.",
                 ephemeral=True
@@ -212,43 +320,46 @@ class PaymentMethodView(ui.View):
             )
 
     @ui.button(label="PayPal", style=discord.ButtonStyle.primary, emoji="💳")
+    @traced(rate_limit='payment')
     async def paypal(self, interaction: discord.Interaction, button: ui.Button):
         await self.handle_payment_selection(interaction, "paypal")
 
     @ui.button(label="Crypto", style=discord.ButtonStyle.primary, emoji="💰")
+    @traced()
     async def crypto(self, interaction: discord.Interaction, button: ui.Button):
-        view = CryptoSelectView(self.product, self.quantity, self.total)
+        if not payment_methods.crypto():
+            await interaction.response.send_message(
+                "❌ No cryptocurrencies are available right now.",
+                ephemeral=True
+            )
+            return
+        view = CryptoSelectView(self.lines)
         await interaction.response.send_message(
             "Select cryptocurrency:",
             view=view,
             ephemeral=True
         )
 
-class CryptoSelectView(ui.View):
-    def __init__(self, product: dict, quantity: int, total: float):
+class CryptoSelectView(RateLimitedView):
+    def __init__(self, lines: List[Tuple[dict, int]]):
         super().__init__(timeout=300)
-        self.product = product
-        self.quantity = quantity
-        self.total = total
+        self.lines = lines
+        # Only coins with a configured address are offered
+        self.crypto_select.options = [
+            discord.SelectOption(value=method.method, label=method.label, emoji=method.emoji)
+            for method in payment_methods.crypto()
+        ]
 
     async def handle_payment_selection(self, interaction: discord.Interaction, payment_method: str):
-        payment_view = PaymentMethodView(self.product, self.quantity)
+        payment_view = PaymentMethodView(self.lines)
         await payment_view.handle_payment_selection(interaction, payment_method)
 
-    @ui.select(
-        placeholder="Select cryptocurrency...",
-        options=[
-            discord.SelectOption(value="btc", label="Bitcoin", emoji="🪙"),
-            discord.SelectOption(value="eth", label="Ethereum", emoji="💎"),
-            discord.SelectOption(value="ltc", label="Litecoin", emoji="🔷"),
-            discord.SelectOption(value="usdt", label="USDT", emoji="💵"),
-            discord.SelectOption(value="sol", label="Solana", emoji="☀️"),
-        ]
-    )
+    @ui.select(placeholder="Select cryptocurrency...")
+    @traced(rate_limit='payment')
     async def crypto_select(self, interaction: discord.Interaction, select: ui.Select):
         await self.handle_payment_selection(interaction, select.values[0])
 
-class ProductView(ui.View):
+class ProductView(RateLimitedView):
     def __init__(self, products: List[dict]):
         super().__init__(timeout=300)
         self.products = {p['name']: p for p in products}
@@ -262,8 +373,9 @@ class ProductView(ui.View):
             button.callback = lambda i, p=product: self.buy_callback(i, p)
             self.add_item(button)
             
+    @traced(auto_defer=False, rate_limit='buy')
     async def buy_callback(self, interaction: discord.Interaction, product: dict):
-        if product['stock'] <= 0:
+        if product['available'] <= 0:
             await interaction.response.send_message(
                 "Sorry, this product is out of stock.",
                 ephemeral=True
@@ -273,7 +385,7 @@ class ProductView(ui.View):
         modal = BuyModal(product)
         await interaction.response.send_modal(modal)
 
-class AddCategoryModal(ui.Modal):
+class AddCategoryModal(RateLimitedModal):
     def __init__(self, db):
         super().__init__(title="Add New Category")
         self.db = db
@@ -303,6 +415,7 @@ class AddCategoryModal(ui.Modal):
         self.add_item(self.label)
         self.add_item(self.emoji)
         
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
         success = await self.db.add_category(
             self.value.value.lower().replace(' ', '_'),
@@ -321,7 +434,7 @@ class AddCategoryModal(ui.Modal):
                 ephemeral=True
             )
 
-class EditCategoryModal(ui.Modal):
+class EditCategoryModal(RateLimitedModal):
     def __init__(self, db, category_id: int, current_value: str, current_label: str, current_emoji: str):
         super().__init__(title="Edit Category")
         self.db = db
@@ -352,6 +465,7 @@ class EditCategoryModal(ui.Modal):
         self.add_item(self.label)
         self.add_item(self.emoji)
         
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
         success = await self.db.update_category(
             self.category_id,
@@ -371,17 +485,19 @@ class EditCategoryModal(ui.Modal):
                 ephemeral=True
             )
 
-class CategoryManagementView(ui.View):
+class CategoryManagementView(RateLimitedView):
     def __init__(self, db):
         super().__init__(timeout=300)
         self.db = db
     
     @ui.button(label="Add Category", style=discord.ButtonStyle.success, emoji="➕")
+    @traced(auto_defer=False)
     async def add_category(self, interaction: discord.Interaction, button: ui.Button):
         modal = AddCategoryModal(self.db)
         await interaction.response.send_modal(modal)
     
     @ui.button(label="Edit Category", style=discord.ButtonStyle.primary, emoji="✏️")
+    @traced()
     async def edit_category(self, interaction: discord.Interaction, button: ui.Button):
         categories = await self.db.get_all_categories()
         if not categories:
@@ -391,7 +507,7 @@ class CategoryManagementView(ui.View):
             )
             return
         
-        view = ui.View()
+        view = RateLimitedView()
         select = ui.Select(
             placeholder="Select a category to edit...",
             options=[
@@ -404,6 +520,7 @@ class CategoryManagementView(ui.View):
             ]
         )
         
+        @traced(auto_defer=False)
         async def select_callback(interaction: discord.Interaction):
             category_id = int(select.values[0])
             category = next(cat for cat in categories if cat['id'] == category_id)
@@ -425,6 +542,7 @@ class CategoryManagementView(ui.View):
         )
     
     @ui.button(label="Delete Category", style=discord.ButtonStyle.danger, emoji="🗑️")
+    @traced()
     async def delete_category(self, interaction: discord.Interaction, button: ui.Button):
         categories = await self.db.get_all_categories()
         if not categories:
@@ -434,7 +552,7 @@ class CategoryManagementView(ui.View):
             )
             return
         
-        view = ui.View()
+        view = RateLimitedView()
         select = ui.Select(
             placeholder="Select a category to delete...",
             options=[
@@ -447,14 +565,16 @@ class CategoryManagementView(ui.View):
             ]
         )
         
+        @traced()
         async def select_callback(interaction: discord.Interaction):
             category_id = int(select.values[0])
             category = next(cat for cat in categories if cat['id'] == category_id)
             
-            confirm_view = ui.View()
+            confirm_view = RateLimitedView()
             confirm_button = ui.Button(label="Confirm Delete", style=discord.ButtonStyle.danger)
             cancel_button = ui.Button(label="Cancel", style=discord.ButtonStyle.secondary)
             
+            @traced()
             async def confirm_callback(interaction: discord.Interaction):
                 success = await self.db.delete_category(category_id)
                 if success:
@@ -468,6 +588,7 @@ class CategoryManagementView(ui.View):
                         ephemeral=True
                     )
             
+            @traced()
             async def cancel_callback(interaction: discord.Interaction):
                 await interaction.response.send_message("❌ Deletion cancelled.", ephemeral=True)
             
@@ -490,17 +611,19 @@ class CategoryManagementView(ui.View):
             ephemeral=True
         )
 
-class ProductManagementView(ui.View):
+class ProductManagementView(RateLimitedView):
     def __init__(self, db):
         super().__init__(timeout=180)
         self.db = db
 
     @ui.button(label="➕ Add Product", style=discord.ButtonStyle.success)
+    @traced(auto_defer=False)
     async def add_product(self, interaction: discord.Interaction, button: ui.Button):
         modal = AddProductModal(self.db)
         await interaction.response.send_modal(modal)
 
     @ui.button(label="✏️ Edit Product", style=discord.ButtonStyle.primary)
+    @traced()
     async def edit_product(self, interaction: discord.Interaction, button: ui.Button):
         products = await self.db.get_all_products()
         if not products:
@@ -510,7 +633,7 @@ class ProductManagementView(ui.View):
             )
             return
         
-        view = ui.View()
+        view = RateLimitedView()
         options = [
             discord.SelectOption(
                 label=p['name'][:100],
@@ -521,8 +644,13 @@ class ProductManagementView(ui.View):
         ]
         select = ui.Select(placeholder="Select a product to edit...", options=options)
         
+        # A modal has to be the first response, so reuse the rows loaded above
+        # instead of querying again before it can be sent
+        products_by_name = {p['name']: p for p in products}
+
+        @traced(auto_defer=False)
         async def select_callback(interaction: discord.Interaction):
-            product = await self.db.get_product_by_name(select.values[0])
+            product = products_by_name.get(select.values[0])
             if product:
                 modal = EditProductModal(self.db, product)
                 await interaction.response.send_modal(modal)
@@ -541,6 +669,7 @@ class ProductManagementView(ui.View):
         )
 
     @ui.button(label="🗑️ Delete Product", style=discord.ButtonStyle.danger)
+    @traced()
     async def delete_product(self, interaction: discord.Interaction, button: ui.Button):
         products = await self.db.get_all_products()
         if not products:
@@ -550,7 +679,7 @@ class ProductManagementView(ui.View):
             )
             return
         
-        view = ui.View()
+        view = RateLimitedView()
         options = [
             discord.SelectOption(
                 label=p['name'][:100],
@@ -561,12 +690,14 @@ class ProductManagementView(ui.View):
         ]
         select = ui.Select(placeholder="Select a product to delete...", options=options)
         
+        @traced()
         async def select_callback(interaction: discord.Interaction):
             product_name = select.values[0]
-            confirm_view = ui.View()
+            confirm_view = RateLimitedView()
             confirm_button = ui.Button(label="Confirm Delete", style=discord.ButtonStyle.danger)
             cancel_button = ui.Button(label="Cancel", style=discord.ButtonStyle.secondary)
             
+            @traced()
             async def confirm_callback(interaction: discord.Interaction):
                 success = await self.db.remove_product(product_name)
                 if success:
@@ -580,6 +711,7 @@ class ProductManagementView(ui.View):
                         ephemeral=True
                     )
             
+            @traced()
             async def cancel_callback(interaction: discord.Interaction):
                 await interaction.response.send_message("❌ Deletion cancelled.", ephemeral=True)
             
@@ -602,7 +734,7 @@ class ProductManagementView(ui.View):
             ephemeral=True
         )
 
-class AddProductModal(ui.Modal, title="Add New Product"):
+class AddProductModal(RateLimitedModal, title="Add New Product"):
     def __init__(self, db):
         super().__init__()
         self.db = db
@@ -643,6 +775,7 @@ class AddProductModal(ui.Modal, title="Add New Product"):
         max_length=50
     )
 
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
         try:
             price_value = float(self.price.value)
@@ -695,7 +828,7 @@ class AddProductModal(ui.Modal, title="Add New Product"):
                 ephemeral=True
             )
 
-class EditProductModal(ui.Modal, title="Edit Product"):
+class EditProductModal(RateLimitedModal, title="Edit Product"):
     def __init__(self, db, product):
         super().__init__()
         self.db = db
@@ -743,6 +876,7 @@ class EditProductModal(ui.Modal, title="Edit Product"):
         max_length=50
     )
 
+    @traced()
     async def on_submit(self, interaction: discord.Interaction):
         try:
             price_value = float(self.price.value)
@@ -0,0 +1,44 @@
+"""
+In-memory copy of the blacklist table
+
+Loaded once at startup and updated by the blacklist commands, so checkout,
+ticket creation and the DM proof listener can reject a blocked user with a
+set lookup before touching the database or creating a channel.
+"""
+
+import logging
+from typing import Iterable
+
+class Blacklist:
+    """Set of blacklisted user IDs mirrored from the database"""
+    def __init__(self):
+        self._user_ids: set = set()
+
+    async def load(self, db) -> bool:
+        """Replace the set with the current blacklist table"""
+        try:
+            entries = await db.get_blacklist()
+            self._user_ids = {int(entry['user_id']) for entry in entries}
+            logging.info(f"Loaded {len(self._user_ids)} blacklisted users")
+            return True
+        except Exception as e:
+            logging.error(f"Error loading blacklist: {str(e)}")
+            return False
+
+    def add(self, user_id: int):
+        self._user_ids.add(int(user_id))
+
+    def remove(self, user_id: int):
+        self._user_ids.discard(int(user_id))
+
+    def update(self, user_ids: Iterable[int]):
+        self._user_ids.update(int(user_id) for user_id in user_ids)
+
+    def is_blocked(self, user_id: int) -> bool:
+        return user_id in self._user_ids
+
+    def __len__(self) -> int:
+        return len(self._user_ids)
+
+# Global blacklist instance
+blacklist = Blacklist()
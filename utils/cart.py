@@ -0,0 +1,112 @@
+"""
+Per-user shopping carts
+
+Buyers collect product lines in a cart and check them out as one order,
+so a basket of several products becomes one DM, one proof and one staff
+review. Carts live in memory until checkout and are dropped after
+CART_TTL_MINUTES without changes; stock is only reserved at checkout
+(DatabaseManager.create_order).
+"""
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+MAX_LINES = int(os.getenv('CART_MAX_LINES', '10'))
+MAX_QUANTITY = 100
+TTL = float(os.getenv('CART_TTL_MINUTES', '30')) * 60
+# Unpaid orders give their reserved stock back after this long
+RESERVATION_MINUTES = float(os.getenv('ORDER_RESERVATION_MINUTES', '120'))
+
+class Cart:
+    """Product lines keyed by product ID"""
+    def __init__(self):
+        # product_id -> [product row, quantity]
+        self._lines: Dict[int, list] = {}
+        self.updated = time.monotonic()
+
+    def quantity(self, product_id: int) -> int:
+        line = self._lines.get(product_id)
+        return line[1] if line else 0
+
+    def add(self, product: dict, quantity: int) -> bool:
+        """Add units of a product; False if that would exceed the line or quantity limit"""
+        if product['id'] not in self._lines and len(self._lines) >= MAX_LINES:
+            return False
+        if self.quantity(product['id']) + quantity > MAX_QUANTITY:
+            return False
+        line = self._lines.setdefault(product['id'], [product, 0])
+        line[0] = product
+        line[1] += quantity
+        self.updated = time.monotonic()
+        return True
+
+    def remove(self, product_id: int):
+        self._lines.pop(product_id, None)
+        self.updated = time.monotonic()
+
+    def take(self, lines: List[Tuple[dict, int]]):
+        """Remove units that were ordered, keeping anything added since checkout"""
+        for product, quantity in lines:
+            left = self.quantity(product['id']) - quantity
+            if left > 0:
+                self._lines[product['id']][1] = left
+            else:
+                self._lines.pop(product['id'], None)
+        self.updated = time.monotonic()
+
+    def lines(self) -> List[Tuple[dict, int]]:
+        """(product, quantity) in the order they were added"""
+        return [(product, quantity) for product, quantity in self._lines.values()]
+
+    @property
+    def total(self) -> float:
+        return sum(product['price'] * quantity for product, quantity in self._lines.values())
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+class CartStore:
+    """Carts keyed by user ID, forgotten after `ttl` seconds without changes"""
+    def __init__(self, ttl: float = TTL):
+        self.ttl = ttl
+        self._carts: Dict[int, Cart] = {}
+        metrics.gauge('novacore_carts', 'Open shopping carts', callback=lambda: len(self._carts))
+
+    def _sweep(self):
+        now = time.monotonic()
+        for user_id, cart in list(self._carts.items()):
+            if now - cart.updated >= self.ttl:
+                del self._carts[user_id]
+
+    def get(self, user_id: int) -> Cart:
+        """The user's cart, started empty if they have none"""
+        self._sweep()
+        cart = self._carts.get(user_id)
+        if cart is None:
+            cart = self._carts[user_id] = Cart()
+        return cart
+
+    def peek(self, user_id: int) -> Optional[Cart]:
+        self._sweep()
+        return self._carts.get(user_id)
+
+    def clear(self, user_id: int):
+        self._carts.pop(user_id, None)
+
+    def ordered(self, user_id: int, lines: List[Tuple[dict, int]]):
+        """Take ordered lines out of the user's cart, dropping it once empty"""
+        cart = self._carts.get(user_id)
+        if cart is None:
+            return
+        cart.take(lines)
+        if not cart:
+            del self._carts[user_id]
+
+    def __len__(self) -> int:
+        return len(self._carts)
+
+# Global cart store instance
+carts = CartStore()
@@ -0,0 +1,214 @@
+"""
+Lightweight chart rendering for sales statistics
+
+Draws line, bar and sparkline charts with Pillow, using NumPy to scale data
+points onto the canvas. Matplotlib is only imported when the matplotlib
+renderer is selected (CHART_RENDERER=matplotlib) or an advanced chart needs it.
+"""
+
+import io
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+BACKGROUND = (0, 0, 0)
+FOREGROUND = (230, 230, 230)
+GRID = (77, 77, 77)
+ACCENT = (139, 92, 246)  # 0x8b5cf6
+
+# Charts are drawn at SUPERSAMPLE x size and downscaled for anti-aliasing
+SUPERSAMPLE = 2
+
+_fonts: Dict[int, ImageFont.ImageFont] = {}
+
+def _font(size: int) -> ImageFont.ImageFont:
+    """Get the default font at the given pixel size (cached)"""
+    if size not in _fonts:
+        _fonts[size] = ImageFont.load_default(size=size)
+    return _fonts[size]
+
+def _nice_ticks(low: float, high: float, max_ticks: int = 6) -> np.ndarray:
+    """Pick round tick values (1, 2, 5 x 10^n steps) covering [low, high]"""
+    if high <= low:
+        pad = abs(low) * 0.1 or 1.0
+        low, high = low - pad, high + pad
+    raw_step = (high - low) / max(max_ticks - 1, 1)
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw_step)
+    start = math.floor(low / step) * step
+    stop = math.ceil(high / step) * step
+    return np.arange(start, stop + step / 2, step)
+
+def scale_points(values: Sequence[float], box: Tuple[int, int, int, int],
+                 y_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """
+    Map values onto pixel coordinates inside box (left, top, right, bottom)
+    Returns an (n, 2) array of x, y positions
+    """
+    left, top, right, bottom = box
+    y = np.asarray(values, dtype=float)
+    y_min, y_max = y_range if y_range else (float(y.min()), float(y.max()))
+    span = (y_max - y_min) or 1.0
+    if len(y) > 1:
+        xs = left + np.arange(len(y)) * ((right - left) / (len(y) - 1))
+    else:
+        xs = np.array([(left + right) / 2])
+    ys = bottom - (y - y_min) / span * (bottom - top)
+    return np.column_stack((xs, ys))
+
+def _to_png(image: Image.Image) -> bytes:
+    """Downscale a supersampled canvas and encode it as PNG"""
+    image = image.reduce(SUPERSAMPLE)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+def _draw_axes(image: Image.Image, draw: ImageDraw.ImageDraw, labels: List[str],
+               values: Sequence[float], title: str, x_label: str, y_label: str,
+               zero_based: bool) -> Tuple[Tuple[int, int, int, int], Tuple[float, float]]:
+    """Draw title, grid, ticks and axis labels; returns plot box and y range"""
+    s = SUPERSAMPLE
+    width, height = image.size
+    title_font, label_font, tick_font = _font(20 * s), _font(15 * s), _font(12 * s)
+
+    low = min(0.0, min(values)) if zero_based else min(values)
+    ticks = _nice_ticks(low, max(values))
+    y_range = (float(ticks[0]), float(ticks[-1]))
+    decimals = 0 if all(float(t).is_integer() for t in ticks) else 2
+    tick_labels = [f"{t:,.{decimals}f}" for t in ticks]
+    tick_width = max(draw.textlength(label, font=tick_font) for label in tick_labels)
+
+    box = (int(50 * s + tick_width), 50 * s, width - 30 * s, height - 80 * s)
+    left, top, right, bottom = box
+
+    draw.text((width / 2, 15 * s), title, font=title_font, fill=FOREGROUND, anchor='mt')
+    draw.text((width / 2, height - 12 * s), x_label, font=label_font, fill=FOREGROUND, anchor='mb')
+    if y_label:
+        label_image = Image.new('RGBA', (int(draw.textlength(y_label, font=label_font)) + 4, 20 * s))
+        ImageDraw.Draw(label_image).text((2, 0), y_label, font=label_font, fill=FOREGROUND)
+        label_image = label_image.rotate(90, expand=True)
+        image.paste(label_image, (8 * s, (top + bottom - label_image.height) // 2), label_image)
+
+    for tick, y in zip(tick_labels, scale_points(ticks, box, y_range)[:, 1]):
+        draw.line([(left, y), (right, y)], fill=GRID, width=s)
+        draw.text((left - 8 * s, y), tick, font=tick_font, fill=FOREGROUND, anchor='rm')
+
+    draw.rectangle(box, outline=FOREGROUND, width=s)
+    return box, y_range
+
+def _draw_x_labels(draw: ImageDraw.ImageDraw, xs: np.ndarray, labels: List[str],
+                   box: Tuple[int, int, int, int]):
+    """Draw x tick labels at xs, skipping labels so they never overlap"""
+    s = SUPERSAMPLE
+    _, top, _, bottom = box
+    tick_font = _font(12 * s)
+    label_width = max(draw.textlength(label, font=tick_font) for label in labels) + 12 * s
+    spacing = (xs[-1] - xs[0]) / (len(xs) - 1) if len(xs) > 1 else label_width
+    every = max(1, math.ceil(label_width / spacing))
+    for index in range(0, len(labels), every):
+        draw.line([(xs[index], top), (xs[index], bottom)], fill=GRID, width=s)
+        draw.text((xs[index], bottom + 8 * s), labels[index], font=tick_font, fill=FOREGROUND, anchor='mt')
+
+def render_line_chart(labels: List[str], values: Sequence[float], title: str,
+                      x_label: str = '', y_label: str = '',
+                      size: Tuple[int, int] = (1000, 600)) -> bytes:
+    """Render a line chart with point markers as PNG bytes"""
+    s = SUPERSAMPLE
+    canvas = (size[0] * s, size[1] * s)
+    image = Image.new('RGB', canvas, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    box, y_range = _draw_axes(image, draw, labels, values, title, x_label, y_label, zero_based=False)
+
+    # Keep the first and last markers off the frame
+    margin = 40 * s
+    points = scale_points(values, (box[0] + margin, box[1], box[2] - margin, box[3]), y_range)
+    _draw_x_labels(draw, points[:, 0], labels, box)
+    if len(points) > 1:
+        draw.line(points.ravel().tolist(), fill=ACCENT, width=3 * s, joint='curve')
+    radius = 5 * s
+    for x, y in points:
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=ACCENT)
+    return _to_png(image)
+
+def render_bar_chart(labels: List[str], values: Sequence[float], title: str,
+                     x_label: str = '', y_label: str = '',
+                     size: Tuple[int, int] = (1000, 600)) -> bytes:
+    """Render a vertical bar chart as PNG bytes"""
+    s = SUPERSAMPLE
+    canvas = (size[0] * s, size[1] * s)
+    image = Image.new('RGB', canvas, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    box, y_range = _draw_axes(image, draw, labels, values, title, x_label, y_label, zero_based=True)
+
+    left, _, right, _ = box
+    slot = (right - left) / len(values)
+    # Bars sit in equal slots, so inset the box by half a slot on each side
+    inset = (left + slot / 2, box[1], right - slot / 2, box[3])
+    points = scale_points(values, inset, y_range)
+    base = scale_points([0.0], inset, y_range)[0, 1]
+    _draw_x_labels(draw, points[:, 0], labels, box)
+    half = slot * 0.35
+    for x, y in points:
+        draw.rectangle((x - half, min(y, base), x + half, max(y, base)), fill=ACCENT)
+    return _to_png(image)
+
+def render_sparkline(values: Sequence[float], size: Tuple[int, int] = (240, 60)) -> bytes:
+    """Render a compact axis-less trend line as PNG bytes"""
+    s = SUPERSAMPLE
+    canvas = (size[0] * s, size[1] * s)
+    image = Image.new('RGB', canvas, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    pad = 4 * s
+    points = scale_points(values, (pad, pad, canvas[0] - pad, canvas[1] - pad))
+    if len(points) > 1:
+        draw.line(points.ravel().tolist(), fill=ACCENT, width=2 * s, joint='curve')
+    x, y = points[-1]
+    draw.ellipse((x - 3 * s, y - 3 * s, x + 3 * s, y + 3 * s), fill=FOREGROUND)
+    return _to_png(image)
+
+def render_matplotlib_line_chart(labels: List[str], values: Sequence[float], title: str,
+                                 x_label: str = '', y_label: str = '') -> bytes:
+    """Render a line chart with matplotlib (imported on first use)
+
+    Runs in worker threads, so it draws on its own Figure and canvas and
+    sets the dark colours on that figure: pyplot and style.use/context
+    change state shared by every thread.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6), facecolor='black')
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor('black')
+
+    ax.plot(labels, values, marker='o', color='#8b5cf6')
+    ax.set_title(title, color='white')
+    ax.set_xlabel(x_label, color='white')
+    ax.set_ylabel(y_label, color='white')
+    ax.grid(True, alpha=0.3, color='white')
+    ax.tick_params(colors='white')
+    for spine in ax.spines.values():
+        spine.set_edgecolor('white')
+
+    # Rotate x-axis labels for better readability
+    ax.tick_params(axis='x', labelrotation=45)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=300)
+    return buffer.getvalue()
+
+def render_revenue_chart(period: str, time_series: List[Dict], renderer: Optional[str] = None) -> bytes:
+    """Render the revenue-over-time chart for get_sales_stats output"""
+    renderer = renderer or os.getenv('CHART_RENDERER', 'native')
+    dates = [t['date'] for t in time_series]
+    revenues = [t['revenue'] for t in time_series]
+    title = f'Revenue Over Time ({period.title()})'
+
+    if renderer == 'matplotlib':
+        return render_matplotlib_line_chart(dates, revenues, title, 'Date', 'Revenue (€)')
+    # The bundled Pillow font has no euro glyph
+    return render_line_chart(dates, revenues, title, 'Date', 'Revenue (EUR)')
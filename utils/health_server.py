@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Tuple
+
+from aiohttp import web
+
+from database.db_manager import DatabaseManager
+from utils.loop_monitor import loop_monitor
+from utils.metrics import metrics
+
+class HealthServer:
+    """HTTP health, readiness and metrics endpoints served on the bot's event loop"""
+    def __init__(self, bot, host: str = '0.0.0.0', port: int = 10000):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.db = DatabaseManager(os.getenv('DATABASE_PATH'))
+        self.max_gateway_latency = float(os.getenv('READY_MAX_GATEWAY_LATENCY', '5'))
+        self.max_loop_lag = float(os.getenv('READY_MAX_LOOP_LAG', '0.5'))
+        self.loop_lag_window = float(os.getenv('READY_LOOP_LAG_WINDOW', '10'))
+        self.db_timeout = float(os.getenv('READY_DB_TIMEOUT', '2'))
+        self._runner = None
+
+        app = web.Application()
+        app.router.add_get('/', self.home)
+        app.router.add_get('/healthz', self.healthz)
+        app.router.add_get('/readyz', self.readyz)
+        app.router.add_get('/metrics', self.metrics_endpoint)
+        self.app = app
+
+        metrics.gauge(
+            'novacore_gateway_latency_seconds', 'Discord gateway heartbeat latency',
+            callback=lambda: self.bot.latency if math.isfinite(self.bot.latency) else None
+        )
+        metrics.gauge(
+            'novacore_gateway_connected', 'Whether the bot is connected to the gateway',
+            callback=lambda: int(self.bot.is_ready() and not self.bot.is_closed())
+        )
+
+    async def start(self):
+        """Start serving on the running event loop"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logging.info(f'Health server listening on {self.host}:{self.port}')
+
+    async def stop(self):
+        """Stop the server and close open connections"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            logging.info('Health server stopped')
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.Response(text="I'm alive")
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        """Liveness: the event loop is running and answering requests"""
+        return web.Response(text='ok')
+
+    async def readyz(self, request: web.Request) -> web.Response:
+        """Readiness: gateway connected, database usable and event loop responsive"""
+        checks = {
+            'gateway': self.check_gateway(),
+            'database': await self.check_database(),
+            'event_loop': self.check_loop_lag(),
+        }
+        ready = all(ok for ok, _ in checks.values())
+        body = {
+            'ready': ready,
+            'checks': {name: {'ok': ok, 'detail': detail} for name, (ok, detail) in checks.items()}
+        }
+        return web.json_response(body, status=200 if ready else 503)
+
+    async def metrics_endpoint(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+    def check_gateway(self) -> Tuple[bool, str]:
+        if self.bot.is_closed() or not self.bot.is_ready():
+            return False, 'not connected'
+        latency = self.bot.latency
+        if not math.isfinite(latency):
+            return False, 'no heartbeat yet'
+        return latency <= self.max_gateway_latency, f'{latency * 1000:.0f} ms'
+
+    async def check_database(self) -> Tuple[bool, str]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.db.ping(), timeout=self.db_timeout)
+        except asyncio.TimeoutError:
+            return False, f'ping timed out after {self.db_timeout:.1f}s'
+        except Exception as e:
+            return False, str(e)
+        return True, f'{(time.perf_counter() - started) * 1000:.0f} ms'
+
+    def check_loop_lag(self) -> Tuple[bool, str]:
+        # Worst lag the loop monitor sampled recently, not a single yield that says little
+        lag = loop_monitor.recent_max(self.loop_lag_window)
+        if lag is None:
+            return True, 'no samples yet'
+        return lag <= self.max_loop_lag, f'max {lag * 1000:.1f} ms over {self.loop_lag_window:.0f}s'
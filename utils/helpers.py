@@ -1,11 +1,27 @@
 import asyncio
 import os
 import logging
+import time
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict
 import aiosqlite
 from datetime import datetime
 import aiofiles
 from pathlib import Path
+from utils.metrics import metrics
+from utils.tracing import record_span
+
+LOCK_TIMEOUT = float(os.getenv('DB_LOCK_TIMEOUT', '10'))
+
+lock_wait_seconds = metrics.histogram(
+    'novacore_lock_wait_seconds', 'Time spent waiting for a keyed lock', ['scope']
+)
+contended_total = metrics.counter(
+    'novacore_lock_contended_total', 'Keyed lock acquisitions that had to wait', ['scope']
+)
+timeouts_total = metrics.counter(
+    'novacore_lock_timeouts_total', 'Keyed lock acquisitions that timed out', ['scope']
+)
 
 class Validators:
     @staticmethod
@@ -71,26 +87,81 @@ class ImageManager:
             logging.error(f"Error saving proof image: {str(e)}")
             return None
 
-class DatabaseLock:
-    """Simple async lock for database operations"""
-    def __init__(self):
-        self._locks = {}
-        
-    async def acquire(self, key: str):
-        """Acquire lock for given key"""
-        while self._locks.get(key):
-            await asyncio.sleep(0.1)
-        self._locks[key] = True
-        
+class LockTimeout(asyncio.TimeoutError):
+    """Raised when a keyed lock could not be acquired in time"""
+
+class KeyedLock:
+    """
+    One asyncio.Lock per key (e.g. "product:12", "order:NC-..."), handed out
+    in FIFO order. A key's lock exists only while someone holds or waits for
+    it, so idle keys do not accumulate. The metric scope is the key prefix
+    before the first colon.
+    """
+    def __init__(self, timeout: float = LOCK_TIMEOUT):
+        self.timeout = timeout
+        # key -> [lock, holders + waiters]
+        self._entries: Dict[str, list] = {}
+        metrics.gauge('novacore_lock_keys', 'Keys with a held or awaited lock', callback=lambda: len(self._entries))
+
+    async def acquire(self, key: str, timeout: Optional[float] = None):
+        """Acquire the lock for key; raises LockTimeout after `timeout` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        scope = key.split(':', 1)[0]
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        if entry[1] == 1:
+            # Nobody else holds or waits for this key
+            await entry[0].acquire()
+            lock_wait_seconds.observe(0.0, scope=scope)
+            return
+
+        contended_total.inc(scope=scope)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(entry[0].acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._unref(key, entry)
+            timeouts_total.inc(scope=scope)
+            raise LockTimeout(f"Timed out after {timeout:.1f}s waiting for lock {key}")
+        except BaseException:
+            self._unref(key, entry)
+            raise
+        waited = time.perf_counter() - started
+        lock_wait_seconds.observe(waited, scope=scope)
+        record_span(f'lock.{scope}', waited)
+
     def release(self, key: str):
-        """Release lock for given key"""
-        self._locks.pop(key, None)
-        
-    async def __aenter__(self):
-        return self
-        
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        pass
+        """Release the lock for key"""
+        entry = self._entries[key]
+        entry[0].release()
+        self._unref(key, entry)
+
+    def _unref(self, key: str, entry: list):
+        entry[1] -= 1
+        if entry[1] == 0 and self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def locked(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0].locked()
+
+    @asynccontextmanager
+    async def __call__(self, *keys: str, timeout: Optional[float] = None):
+        """Hold the locks for keys, acquired in the order given"""
+        acquired = []
+        try:
+            for key in keys:
+                await self.acquire(key, timeout)
+                acquired.append(key)
+            yield
+        finally:
+            for key in reversed(acquired):
+                self.release(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 # Global database lock instance
-db_lock = DatabaseLock()
\ No newline at end of file
+db_lock = KeyedLock()
\ No newline at end of file
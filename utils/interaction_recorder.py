@@ -0,0 +1,246 @@
+"""
+Opt-in interaction trace recorder
+
+With INTERACTION_RECORD=true every interaction (custom_id, component
+values, modal inputs, slash command options), every DM to the bot and the
+handler timings from @traced are appended as compact JSON lines to a
+rotating file under INTERACTION_RECORD_DIR. Rotated files are gzipped.
+
+Traces are anonymized: user IDs become salted hashes, including IDs typed
+into modals or string options; other free text is replaced by a placeholder
+of the same length, and attachment URLs are dropped. Only values the schema
+constrains (select values, choices, numeric options, custom_ids) and short
+amounts such as quantities and prices are kept verbatim. benchmarks/replay_interactions.py re-drives a
+trace against a copy of the database.
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+import discord
+
+# Typed text that is kept verbatim: quantities and prices
+_AMOUNT = re.compile(r'\d{1,6}(?:[.,]\d{1,2})?')
+_SNOWFLAKE = re.compile(r'\d{17,20}')
+_MENTION = re.compile(r'<@!?(\d+)>')
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+class InteractionRecorder:
+    """Writes anonymized interaction events to rotating JSONL files"""
+    def __init__(self, enabled: Optional[bool] = None, directory: Optional[str] = None,
+                 max_bytes: Optional[int] = None, backups: Optional[int] = None):
+        self._enabled = enabled
+        self.directory = directory
+        self._salt: Optional[bytes] = None
+        self._staff_role_ids: set = set()
+        self._owner_role_id = 0
+        self._logger: Optional[logging.Logger] = None
+        self._max_bytes = max_bytes
+        self._backups = backups
+
+    @property
+    def enabled(self) -> bool:
+        """INTERACTION_RECORD, read on first use unless set explicitly"""
+        if self._enabled is None:
+            self._enabled = os.getenv('INTERACTION_RECORD', 'false').lower() in ('1', 'true', 'yes')
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool):
+        self._enabled = enabled
+
+    def _load_config(self):
+        """Read settings on first use rather than at import, so .env is always loaded by then"""
+        if self._salt is not None:
+            return
+        if self.directory is None:
+            self.directory = (os.getenv('INTERACTION_RECORD_DIR')
+                              or os.path.join(os.getenv('LOG_DIR') or 'logs', 'traces'))
+        if self._max_bytes is None:
+            self._max_bytes = int(os.getenv('INTERACTION_RECORD_MAX_BYTES', str(10 * 1024 * 1024)))
+        if self._backups is None:
+            self._backups = int(os.getenv('INTERACTION_RECORD_BACKUPS', '20'))
+        # Pseudonyms are stable while the salt is; without a configured salt they only link
+        # events within one process lifetime
+        salt = os.getenv('INTERACTION_RECORD_SALT')
+        self._salt = salt.encode() if salt else secrets.token_bytes(16)
+        self._staff_role_ids = {int(r) for r in os.getenv('STAFF_ROLE_IDS', '').split(',') if r.strip()}
+        self._owner_role_id = int(os.getenv('OWNER_ROLE_ID') or 0)
+
+    def _get_logger(self) -> logging.Logger:
+        if self._logger is None:
+            self._load_config()
+            os.makedirs(self.directory, exist_ok=True)
+            handler = RotatingFileHandler(
+                os.path.join(self.directory, 'interactions.jsonl'),
+                maxBytes=self._max_bytes, backupCount=self._backups, encoding='utf-8'
+            )
+            handler.namer = lambda name: name + '.gz'
+            handler.rotator = _gzip_rotator
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger('novacore.interactions')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def _write(self, event: Dict[str, Any]):
+        try:
+            self._get_logger().info(json.dumps(event, separators=(',', ':'), ensure_ascii=False))
+        except Exception as e:
+            logging.error(f"Error writing interaction trace: {str(e)}")
+
+    def pseudonym(self, user_id) -> str:
+        self._load_config()
+        digest = hmac.new(self._salt, str(user_id).encode(), hashlib.sha256).hexdigest()
+        return f'u{digest[:12]}'
+
+    def scrub(self, value: Any) -> Any:
+        """Pseudonymize typed user IDs, keep amounts, replace other free text with a same-length placeholder"""
+        if not isinstance(value, str):
+            return value
+        if _SNOWFLAKE.fullmatch(value.strip()):
+            return self.pseudonym(value.strip())
+        if _AMOUNT.fullmatch(value.strip()):
+            return value
+        return 'x' * min(len(value), 4000)
+
+    def _select_values(self, component_type: Optional[int], values: List[str]) -> List[str]:
+        """Select values are the bot's own options, but user and mentionable selects carry user IDs"""
+        if component_type in (5, 7):
+            return [self.pseudonym(v) for v in values]
+        return [self.pseudonym(v) if _SNOWFLAKE.fullmatch(v) else v for v in values]
+
+    def _user_flags(self, user) -> Dict[str, bool]:
+        self._load_config()
+        role_ids = {role.id for role in getattr(user, 'roles', [])}
+        flags = {}
+        if role_ids & self._staff_role_ids:
+            flags['staff'] = True
+        if self._owner_role_id in role_ids:
+            flags['owner'] = True
+        return flags
+
+    def _modal_inputs(self, components: List[Dict]) -> List[Any]:
+        inputs = []
+        for row in components or []:
+            # Action rows (legacy) or labels (current API) wrap the text inputs
+            children = row.get('components') or ([row['component']] if 'component' in row else [])
+            for child in children:
+                if 'value' in child:
+                    inputs.append(self.scrub(child['value']))
+                elif 'values' in child:
+                    inputs.append(self._select_values(child.get('type'), child['values']))
+        return inputs
+
+    def _command_options(self, options: List[Dict], command=None) -> Dict[str, Any]:
+        result = {}
+        for option in options or []:
+            if 'options' in option:
+                # Subcommand / group: flatten under its name
+                result[option['name']] = self._command_options(option['options'], command)
+            elif option.get('type') in (6, 9):
+                # User / mentionable options
+                result[option['name']] = self.pseudonym(option.get('value'))
+            elif option.get('type') == 3 and option.get('value') not in self._choices(command, option['name']):
+                # Free-form string options
+                result[option['name']] = self.scrub(option.get('value'))
+            else:
+                # Numbers, booleans, channels, roles and declared choices
+                result[option['name']] = option.get('value')
+        return result
+
+    def _choices(self, command, name: str) -> List[Any]:
+        parameter = command.get_parameter(name) if hasattr(command, 'get_parameter') else None
+        return [choice.value for choice in parameter.choices] if parameter is not None else []
+
+    def _message_users(self, message) -> List[str]:
+        """Pseudonyms of users mentioned in the message's embeds (e.g. the buyer on a staff review)"""
+        users = []
+        for embed in getattr(message, 'embeds', None) or []:
+            texts = [embed.description or ''] + [field.value or '' for field in embed.fields]
+            for text in texts:
+                users.extend(self.pseudonym(user_id) for user_id in _MENTION.findall(text))
+        return users
+
+    def record_interaction(self, interaction: discord.Interaction):
+        if not self.enabled:
+            return
+        data = interaction.data or {}
+        event: Dict[str, Any] = {
+            'e': 'interaction',
+            't': round(interaction.created_at.timestamp(), 3),
+            'id': interaction.id,
+            'user': self.pseudonym(interaction.user.id),
+            'type': interaction.type.name,
+        }
+        event.update(self._user_flags(interaction.user))
+        if interaction.type is discord.InteractionType.component:
+            event['custom_id'] = data.get('custom_id')
+            event['component_type'] = data.get('component_type')
+            if 'values' in data:
+                event['values'] = self._select_values(data.get('component_type'), data['values'])
+        elif interaction.type is discord.InteractionType.modal_submit:
+            event['custom_id'] = data.get('custom_id')
+            event['inputs'] = self._modal_inputs(data.get('components'))
+        elif interaction.type is discord.InteractionType.application_command:
+            event['command'] = data.get('name')
+            event['options'] = self._command_options(data.get('options'), interaction.command)
+        if interaction.message is not None:
+            event['message'] = self.pseudonym(f'm{interaction.message.id}')
+            message_users = self._message_users(interaction.message)
+            if message_users:
+                event['message_users'] = message_users
+        if interaction.guild_id is None:
+            event['dm'] = True
+        self._write(event)
+
+    def record_dm(self, message: discord.Message):
+        if not self.enabled:
+            return
+        self._write({
+            'e': 'dm',
+            't': round(message.created_at.timestamp(), 3),
+            'user': self.pseudonym(message.author.id),
+            'text': len(message.content or ''),
+            'attachments': [
+                {'content_type': a.content_type, 'ext': os.path.splitext(a.filename or '')[1].lower(), 'size': a.size}
+                for a in message.attachments
+            ],
+        })
+
+    def record_handled(self, interaction_id: int, handler: str, ack_after: Optional[float],
+                       duration: float, auto_deferred: bool, error: bool):
+        if not self.enabled:
+            return
+        event = {
+            'e': 'handled',
+            't': round(time.time(), 3),
+            'id': interaction_id,
+            'handler': handler,
+            'ack_ms': round(ack_after * 1000, 1) if ack_after is not None else None,
+            'duration_ms': round(duration * 1000, 1),
+        }
+        if auto_deferred:
+            event['auto_deferred'] = True
+        if error:
+            event['error'] = True
+        self._write(event)
+
+# Global interaction recorder instance
+interaction_recorder = InteractionRecorder()
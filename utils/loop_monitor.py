@@ -0,0 +1,239 @@
+"""
+Event loop lag monitor and blocking-call detector
+
+A background task sleeps for a fixed interval and records how late it was
+woken up: that overshoot is the time other callbacks held the event loop.
+Lag samples feed a histogram and rolling percentile gauges on /metrics.
+
+With LOOP_DEBUG enabled, asyncio debug mode reports every callback slower
+than LOOP_BLOCK_THRESHOLD_MS, and a watchdog thread samples the loop
+thread's stack while it is blocked to name the coroutine and line that
+held it. Findings are shown by the staff /looplag command.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Deque, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+LOOP_DEBUG = os.getenv('LOOP_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+SAMPLE_INTERVAL = float(os.getenv('LOOP_SAMPLE_INTERVAL', '0.25'))
+BLOCK_THRESHOLD_MS = float(os.getenv('LOOP_BLOCK_THRESHOLD_MS', '100'))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+lag_seconds = metrics.histogram(
+    'novacore_event_loop_lag_seconds', 'Delay between a scheduled wake-up and the loop running it',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+blocks_total = metrics.counter(
+    'novacore_event_loop_blocks_total', 'Times the event loop was blocked longer than LOOP_BLOCK_THRESHOLD_MS'
+)
+
+class BlockEvent:
+    """One period during which the event loop did not run anything else"""
+    __slots__ = ('at', 'duration', 'task', 'location', 'stack', 'source')
+
+    def __init__(self, at: float, duration: float, task: str, location: str, stack: List[str], source: str):
+        self.at = at
+        self.duration = duration
+        self.task = task
+        self.location = location
+        self.stack = stack
+        self.source = source
+
+def _is_project_frame(filename: str) -> bool:
+    return filename.startswith(PROJECT_ROOT) and f'{os.sep}site-packages{os.sep}' not in filename
+
+def _describe_stack(frame) -> Tuple[str, List[str]]:
+    """Innermost project line and a short stack for a sampled frame"""
+    entries = traceback.extract_stack(frame)
+    stack = [f'{os.path.relpath(e.filename, PROJECT_ROOT) if _is_project_frame(e.filename) else os.path.basename(e.filename)}'
+             f':{e.lineno} in {e.name}' for e in entries[-8:]]
+    for entry in reversed(entries):
+        if _is_project_frame(entry.filename):
+            return f'{os.path.relpath(entry.filename, PROJECT_ROOT)}:{entry.lineno} in {entry.name}', stack
+    return stack[-1] if stack else 'unknown', stack
+
+class _SlowCallbackHandler(logging.Handler):
+    """Captures asyncio debug-mode 'Executing <...> took N seconds' warnings"""
+    PATTERN = re.compile(r'Executing (?P<what>.+) took (?P<seconds>[\d.]+) seconds')
+
+    def __init__(self, monitor: 'LoopMonitor'):
+        super().__init__(logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record: logging.LogRecord):
+        match = self.PATTERN.search(record.getMessage())
+        if match:
+            self.monitor.record_slow_callback(match.group('what'), float(match.group('seconds')))
+
+class LoopMonitor:
+    """Samples event loop lag and, in debug mode, what blocked the loop"""
+    def __init__(self, interval: float = SAMPLE_INTERVAL, block_threshold_ms: float = BLOCK_THRESHOLD_MS,
+                 debug: bool = LOOP_DEBUG, window: int = 1200, max_events: int = 50):
+        self.interval = interval
+        self.block_threshold = block_threshold_ms / 1000
+        self.debug = debug
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.events: Deque[BlockEvent] = deque(maxlen=max_events)
+        self.hotspots: Counter = Counter()
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._beat_sent: Optional[float] = None
+        self._beat_at = 0.0
+        self._log_handler: Optional[_SlowCallbackHandler] = None
+        self._lock = threading.Lock()
+
+        metrics.gauge(
+            'novacore_event_loop_lag_recent_seconds', 'Event loop lag percentiles over the recent window',
+            ['quantile'], callback=self._quantile_gauges
+        )
+
+    def start(self):
+        """Start sampling on the running event loop"""
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat_sent = None
+        self._task = self._loop.create_task(self._sample())
+
+        if self.debug:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.block_threshold
+            self._log_handler = _SlowCallbackHandler(self)
+            logging.getLogger('asyncio').addHandler(self._log_handler)
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+        logging.info(f'Loop monitor started (interval {self.interval * 1000:.0f} ms, debug {self.debug})')
+
+    async def stop(self):
+        """Stop sampling and the watchdog thread"""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._log_handler:
+            logging.getLogger('asyncio').removeHandler(self._log_handler)
+            self._log_handler = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            lag_seconds.observe(lag)
+            if lag >= self.block_threshold:
+                blocks_total.inc()
+                # In debug mode the watchdog logs the block with its location
+                if not self.debug:
+                    logging.warning(f'Event loop lag {lag * 1000:.0f} ms (set LOOP_DEBUG=true to find the cause)')
+
+    def _beat(self):
+        self._beat_at = time.perf_counter()
+        self._beat_sent = None
+
+    def _watch(self):
+        """Watchdog thread: ping the loop and sample its stack while the ping is not answered"""
+        poll = max(0.01, self.block_threshold / 4)
+        episode: Optional[BlockEvent] = None
+        blocked_since = 0.0
+        while not self._stopped.wait(poll):
+            sent = self._beat_sent
+            if sent is None:
+                if episode is not None:
+                    episode.duration = self._beat_at - blocked_since
+                    logging.warning(f'Event loop blocked {episode.duration * 1000:.0f} ms '
+                                    f'at {episode.location} ({episode.task})')
+                    episode = None
+                self._beat_sent = time.perf_counter()
+                try:
+                    self._loop.call_soon_threadsafe(self._beat)
+                except RuntimeError:
+                    # Loop closed
+                    return
+                continue
+            if time.perf_counter() - sent < self.block_threshold:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            location, stack = _describe_stack(frame)
+            del frame
+            with self._lock:
+                self.hotspots[location] += 1
+                if episode is None:
+                    blocked_since = sent
+                    episode = BlockEvent(time.time(), 0.0, self._current_task_name(), location, stack, 'watchdog')
+                    self.events.append(episode)
+
+    def _current_task_name(self) -> str:
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return 'callback'
+        coro = task.get_coro()
+        return getattr(coro, '__qualname__', None) or task.get_name()
+
+    def record_slow_callback(self, what: str, seconds: float):
+        """Slow callback reported by asyncio debug mode"""
+        with self._lock:
+            self.events.append(BlockEvent(time.time(), seconds, what[:200], '', [], 'asyncio'))
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def recent_max(self, seconds: float) -> Optional[float]:
+        """Worst lag sampled over about the last `seconds`; None before the first sample"""
+        if not self.samples:
+            return None
+        count = max(1, int(seconds / self.interval))
+        return max(itertools.islice(reversed(self.samples), count))
+
+    def _quantile_gauges(self) -> dict:
+        return {(str(q),): self.quantile(q) for q in (0.5, 0.95, 0.99)}
+
+    def top_hotspots(self, limit: int = 5) -> List[Tuple[str, int]]:
+        with self._lock:
+            return self.hotspots.most_common(limit)
+
+    def recent_events(self, limit: int = 5) -> List[BlockEvent]:
+        with self._lock:
+            return list(self.events)[-limit:]
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.events.clear()
+            self.hotspots.clear()
+            self.max_lag = 0.0
+
+# Global loop monitor instance
+loop_monitor = LoopMonitor()
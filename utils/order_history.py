@@ -0,0 +1,56 @@
+"""
+Short-lived cache of buyers' order history pages (/myorders)
+
+A buyer paging back and forth, or running /myorders again to check on an
+order, is answered from memory. A buyer's pages are dropped after
+ORDER_HISTORY_CACHE_SECONDS, and as soon as this process writes one of
+their orders (DatabaseManager.get_user_orders_version), so a new order or
+a status change shows on the next look.
+"""
+
+import os
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from utils.metrics import metrics
+
+TTL = float(os.getenv('ORDER_HISTORY_CACHE_SECONDS', '60'))
+
+lookups_total = metrics.counter(
+    'novacore_order_history_cache_total', 'Order history page lookups', ['result']
+)
+
+class OrderHistoryCache:
+    """Order history pages keyed by user ID, each set valid for one orders version"""
+    def __init__(self, ttl: float = TTL):
+        self.ttl = ttl
+        # user_id -> (orders version, stored at, page key -> page)
+        self._users: Dict[str, Tuple[int, float, Dict[Hashable, Any]]] = {}
+        metrics.gauge('novacore_order_history_cache_users', 'Buyers with cached order history',
+                      callback=lambda: len(self._users))
+
+    def _sweep(self):
+        now = time.monotonic()
+        for user_id, (_, stored, _) in list(self._users.items()):
+            if now - stored >= self.ttl:
+                del self._users[user_id]
+
+    def get(self, user_id: str, version: int, key: Hashable) -> Optional[Any]:
+        """A cached page, if it was stored for this orders version"""
+        self._sweep()
+        entry = self._users.get(user_id)
+        page = entry[2].get(key) if entry and entry[0] == version else None
+        lookups_total.inc(result='miss' if page is None else 'hit')
+        return page
+
+    def put(self, user_id: str, version: int, key: Hashable, page: Any):
+        entry = self._users.get(user_id)
+        if entry is None or entry[0] != version:
+            entry = self._users[user_id] = (version, time.monotonic(), {})
+        entry[2][key] = page
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+# Global order history cache instance
+order_history = OrderHistoryCache()
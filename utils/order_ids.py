@@ -0,0 +1,97 @@
+"""
+Order IDs
+
+Order IDs look like NC-20250101-0F3KQ8X:
+
+  • the UTC date of the order,
+  • six Crockford base32 characters counting up through the day: the
+    millisecond of the day times 8, plus a counter for orders placed in
+    the same millisecond, and
+  • one check character.
+
+IDs from one process therefore never repeat and always sort after the
+previous one, so new orders are appended at the end of the order_id
+index instead of landing on random pages. The check character catches
+any single mistyped character and most swapped pairs, so a mistyped ID
+can be rejected without looking it up. Crockford's alphabet has no I, L,
+O or U; lowercase input and those look-alikes are read as the
+characters they resemble, in the date as well.
+
+IDs from before this format (NC-YYYYMMDD-XXXXXX, random) carry no check
+character and are still accepted.
+"""
+
+import re
+import threading
+import time
+from typing import Optional
+
+PREFIX = 'NC'
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+SEQUENCE_LENGTH = 6
+# Orders that fit in one millisecond before the sequence borrows from the next
+PER_MILLISECOND = 8
+
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+_VALUES.update({'O': 0, 'I': 1, 'L': 1})
+_DATE_LOOKALIKES = str.maketrans('OIL', '011')
+_ORDER_ID = re.compile(r'NC-(\d{8})-([0-9A-Z]{7})')
+_LEGACY_ORDER_ID = re.compile(r'NC-\d{8}-[A-Z0-9]{6}')
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+def check_char(body: str) -> str:
+    """Check character for the date and sequence of an ID
+
+    Weights are odd, so changing any one character changes the sum mod 32.
+    """
+    total = sum((2 * position + 1) * _VALUES[char] for position, char in enumerate(body))
+    return ALPHABET[total % 32]
+
+def normalize(order_id: str) -> Optional[str]:
+    """The canonical form of an order ID as typed, or None if it cannot be one"""
+    order_id = order_id.strip().upper()
+    parts = order_id.split('-')
+    if len(parts) == 3:
+        parts[1] = parts[1].translate(_DATE_LOOKALIKES)
+        order_id = '-'.join(parts)
+    if _LEGACY_ORDER_ID.fullmatch(order_id):
+        return order_id
+    match = _ORDER_ID.fullmatch(order_id)
+    if not match:
+        return None
+    date, code = match.groups()
+    if any(char not in _VALUES for char in code):
+        return None
+    code = ''.join(ALPHABET[_VALUES[char]] for char in code)
+    if check_char(date + code[:-1]) != code[-1]:
+        return None
+    return f'{PREFIX}-{date}-{code}'
+
+class OrderIdGenerator:
+    """Time-ordered order IDs, unique within the process"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._date = ''
+        self._last = -1
+
+    def next(self, now: Optional[float] = None) -> str:
+        """A new order ID"""
+        now = time.time() if now is None else now
+        date = time.strftime('%Y%m%d', time.gmtime(now))
+        sequence = int(now % 86400 * 1000) * PER_MILLISECOND
+        with self._lock:
+            if date == self._date:
+                # Never go backwards, even if the clock does
+                sequence = max(sequence, self._last + 1)
+            self._date, self._last = date, sequence
+        body = date + _encode(sequence, SEQUENCE_LENGTH)
+        return f'{PREFIX}-{date}-{body[8:]}{check_char(body)}'
+
+# Global order ID generator instance
+order_ids = OrderIdGenerator()
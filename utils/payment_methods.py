@@ -0,0 +1,73 @@
+"""
+In-memory registry of payment methods and their addresses
+
+Addresses set with /payments (the payment_methods table) take precedence
+over the <METHOD>_ADDRESS / PAYPAL_EMAIL environment defaults. Both are
+read once at startup and again after every /payments update, so the
+checkout buttons, the crypto select and the payment instructions read
+this registry instead of the database or the environment on every
+checkout. A method without an address is not offered to buyers.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+# Method -> (label, emoji, environment default, network note)
+METHODS = {
+    'paypal': ('PayPal', '💳', 'PAYPAL_EMAIL', None),
+    'btc': ('Bitcoin', '🪙', 'BTC_ADDRESS', None),
+    'eth': ('Ethereum', '💎', 'ETH_ADDRESS', None),
+    'ltc': ('Litecoin', '🔷', 'LTC_ADDRESS', None),
+    'usdt': ('USDT', '💵', 'USDT_ADDRESS', 'Tron (TRC20)'),
+    'sol': ('Solana', '☀️', 'SOL_ADDRESS', None),
+}
+
+class PaymentMethod:
+    """A payment method buyers can use"""
+    __slots__ = ('method', 'label', 'emoji', 'address', 'network', 'source')
+
+    def __init__(self, method: str, address: str, source: str):
+        self.method = method
+        self.label, self.emoji, _, self.network = METHODS[method]
+        self.address = address
+        self.source = source
+
+class PaymentMethodRegistry:
+    """Configured payment methods, database rows over environment defaults"""
+    def __init__(self):
+        self._methods = self._defaults()
+
+    @staticmethod
+    def _defaults() -> Dict[str, PaymentMethod]:
+        return {method: PaymentMethod(method, os.getenv(env_var), 'env')
+                for method, (_, _, env_var, _) in METHODS.items() if os.getenv(env_var)}
+
+    async def load(self, db) -> bool:
+        """Rebuild the registry from the environment and the payment_methods table"""
+        try:
+            rows = await db.get_all_payment_info()
+        except Exception as e:
+            logging.error(f"Error loading payment methods: {str(e)}")
+            return False
+        methods = self._defaults()
+        for row in rows:
+            if row['method_name'] in METHODS and row['address']:
+                methods[row['method_name']] = PaymentMethod(row['method_name'], row['address'], 'db')
+        self._methods = methods
+        logging.info(f"Loaded {len(methods)} payment methods")
+        return True
+
+    def get(self, method: str) -> Optional[PaymentMethod]:
+        """The method if it has an address"""
+        return self._methods.get(method)
+
+    def crypto(self) -> List[PaymentMethod]:
+        """Configured cryptocurrencies, in display order"""
+        return [self._methods[method] for method in METHODS if method != 'paypal' and method in self._methods]
+
+    def __len__(self) -> int:
+        return len(self._methods)
+
+# Global payment method registry instance
+payment_methods = PaymentMethodRegistry()
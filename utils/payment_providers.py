@@ -0,0 +1,168 @@
+"""
+Payment providers for automatic payment verification
+
+A provider reports the transfers it has seen for one or more payment
+methods (btc, eth, ltc, usdt, sol, paypal). utils.payment_verifier polls
+every configured provider and matches the transfers to open orders.
+
+PAYMENT_VERIFIERS maps payment methods to providers, e.g.
+PAYMENT_VERIFIERS="btc=local,paypal=local". Methods without an entry
+keep the manual proof review. Providers are registered in PROVIDERS by
+name; a provider for a block explorer or the PayPal API implements
+PaymentProvider.fetch_transfers and is added there.
+
+The bundled "local" provider reads a SQLite ledger (PAYMENT_LEDGER_PATH)
+instead of a network API, so the whole flow can be exercised offline:
+
+    python -m utils.payment_providers add btc 24.99 --memo NC-20250101-ABC123
+    python -m utils.payment_providers list
+"""
+
+import argparse
+import asyncio
+import os
+import secrets
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiosqlite
+
+DEFAULT_LEDGER_PATH = './database/payments_ledger.db'
+METHODS = ('btc', 'eth', 'ltc', 'usdt', 'sol', 'paypal')
+
+class Transfer:
+    """An incoming payment seen by a provider
+
+    amount is in the shop currency (EUR), converted by the provider at
+    the time it saw the transfer. coin_amount is the exact amount of coin
+    received, as a decimal string, for crypto transfers.
+    """
+    __slots__ = ('method', 'txid', 'amount', 'memo', 'received_at', 'coin_amount')
+
+    def __init__(self, method: str, txid: str, amount: float, memo: str = '', received_at: Optional[float] = None,
+                 coin_amount: Optional[str] = None):
+        self.method = method
+        self.txid = txid
+        self.amount = amount
+        self.memo = memo or ''
+        self.received_at = time.time() if received_at is None else received_at
+        self.coin_amount = coin_amount
+
+    def __repr__(self):
+        coin = f', {self.coin_amount} {self.method.upper()}' if self.coin_amount else ''
+        return f'Transfer({self.method}, {self.txid}, {self.amount:.2f}{coin}, {self.memo!r})'
+
+class PaymentProvider:
+    """Source of incoming transfers for one or more payment methods"""
+    name = 'base'
+
+    async def fetch_transfers(self, methods: List[str], since: float) -> List[Transfer]:
+        """Transfers for `methods` received after `since` (unix time), in one call"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class LocalLedgerProvider(PaymentProvider):
+    """Reads transfers from a local SQLite ledger; a stand-in for a real payment API"""
+    name = 'local'
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('PAYMENT_LEDGER_PATH', DEFAULT_LEDGER_PATH)
+        self._ready = False
+
+    async def _init(self, db: aiosqlite.Connection):
+        if self._ready:
+            return
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS transfers (
+                method TEXT NOT NULL,
+                txid TEXT NOT NULL,
+                amount REAL NOT NULL,
+                memo TEXT NOT NULL DEFAULT '',
+                received_at REAL NOT NULL,
+                coin_amount TEXT,
+                PRIMARY KEY (method, txid)
+            )
+        ''')
+        cursor = await db.execute('PRAGMA table_info(transfers)')
+        if 'coin_amount' not in {row[1] for row in await cursor.fetchall()}:
+            await db.execute('ALTER TABLE transfers ADD COLUMN coin_amount TEXT')
+        await db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transfers_received_at ON transfers (received_at)
+        ''')
+        await db.commit()
+        self._ready = True
+
+    async def add_transfer(self, transfer: Transfer):
+        """Record a transfer in the ledger, as a customer paying would"""
+        async with aiosqlite.connect(self.path) as db:
+            await self._init(db)
+            await db.execute('''
+                INSERT INTO transfers (method, txid, amount, memo, received_at, coin_amount)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (transfer.method, transfer.txid, transfer.amount, transfer.memo, transfer.received_at,
+                  transfer.coin_amount))
+            await db.commit()
+
+    async def fetch_transfers(self, methods: List[str], since: float) -> List[Transfer]:
+        async with aiosqlite.connect(self.path) as db:
+            await self._init(db)
+            cursor = await db.execute(f'''
+                SELECT method, txid, amount, memo, received_at, coin_amount FROM transfers
+                WHERE received_at > ? AND method IN ({', '.join('?' * len(methods))})
+                ORDER BY received_at
+            ''', (since, *methods))
+            return [Transfer(*row) for row in await cursor.fetchall()]
+
+# Provider name -> factory
+PROVIDERS: Dict[str, Callable[[], PaymentProvider]] = {
+    'local': LocalLedgerProvider,
+}
+
+def parse_verifiers(spec: str) -> Dict[str, str]:
+    """Parse "method=provider,..." into payment method -> provider name"""
+    methods = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        method, _, provider = entry.partition('=')
+        method, provider = method.strip().lower(), provider.strip().lower()
+        if method not in METHODS:
+            raise ValueError(f'Unknown payment method in PAYMENT_VERIFIERS: {method}')
+        if provider not in PROVIDERS:
+            raise ValueError(f'Unknown payment provider in PAYMENT_VERIFIERS: {provider}')
+        methods[method] = provider
+    return methods
+
+def is_verified(method: str) -> bool:
+    """Whether payments with this method are confirmed automatically"""
+    return method in verified_methods
+
+# Methods confirmed automatically, read once at import like the rate limits
+verified_methods = parse_verifiers(os.getenv('PAYMENT_VERIFIERS', ''))
+
+def main():
+    parser = argparse.ArgumentParser(description='Local payment ledger for testing automatic verification')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='Record an incoming transfer')
+    add.add_argument('method', choices=METHODS)
+    add.add_argument('amount', type=float, help='Amount in EUR')
+    add.add_argument('--memo', default='', help='Payment note, e.g. the order ID')
+    add.add_argument('--txid', help='Transaction ID (random if omitted)')
+    add.add_argument('--coin-amount', help='Exact coin amount received, e.g. 0.00041667')
+    listing = commands.add_parser('list', help='Show the ledger')
+    listing.add_argument('--since-minutes', type=float, default=24 * 60)
+    args = parser.parse_args()
+
+    provider = LocalLedgerProvider()
+    if args.command == 'add':
+        transfer = Transfer(args.method, args.txid or secrets.token_hex(16), args.amount, args.memo,
+                            coin_amount=args.coin_amount)
+        asyncio.run(provider.add_transfer(transfer))
+        print(f'Recorded {transfer!r}')
+    else:
+        since = time.time() - args.since_minutes * 60
+        for transfer in asyncio.run(provider.fetch_transfers(list(METHODS), since)):
+            print(f'{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(transfer.received_at))}  {transfer!r}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Automatic payment verification
+
+PaymentVerifier polls the providers configured in PAYMENT_VERIFIERS
+(see utils.payment_providers) and matches the transfers they report to
+open orders. A poll makes one call per provider, covering all its
+payment methods, and one query for every open order, however many
+orders are waiting.
+
+Open orders are those still pending (sending a screenshot does not change
+an order's status, so buyers who also send one stay open). A transfer
+matches an order when:
+  • its memo contains the order ID and it pays at least the order total
+    (less PAYMENT_MATCH_TOLERANCE), or
+  • its memo has no order ID at all and its amount equals the total of
+    exactly one open order with the same payment method.
+
+A memo naming an order that is not open (completed, cancelled, or a
+mistyped ID) is left to staff rather than matched by amount, so it can
+never complete another buyer's order.
+
+For an order with a locked quote (utils.quotes) the exact coin amounts
+are compared instead of EUR values, as long as the quote had not expired
+when the transfer arrived. Either way the transfer must arrive after the
+order was created. Every
+transfer is handled once; its outcome is kept in payment_transfers.
+Transfers that match nothing are left to staff.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.cart import RESERVATION_MINUTES
+from utils.metrics import metrics
+from utils.order_ids import normalize as normalize_order_id
+from utils.payment_providers import PROVIDERS, PaymentProvider, Transfer, verified_methods
+
+POLL_SECONDS = float(os.getenv('PAYMENT_POLL_SECONDS', '30'))
+# Transfers can show up late (unconfirmed blocks); each poll looks back this far
+LOOKBACK_SECONDS = float(os.getenv('PAYMENT_LOOKBACK_SECONDS', '600'))
+MATCH_TOLERANCE = float(os.getenv('PAYMENT_MATCH_TOLERANCE', '0.01'))
+# Transfers stamped this long before an order are still taken as paying it (clock skew)
+CLOCK_SKEW = 120
+
+# Anything shaped like an order ID, current or legacy, valid or not (look-alikes
+# such as O for 0 are folded by normalize_order_id)
+ORDER_ID_PATTERN = re.compile(r'\bNC-[0-9A-Z]{8}-[0-9A-Z]{6,7}\b')
+
+transfers_total = metrics.counter(
+    'novacore_payment_transfers_total', 'Transfers handled by the payment verifier', ['outcome']
+)
+poll_seconds = metrics.histogram('novacore_payment_poll_seconds', 'Duration of one payment verifier poll')
+
+# Result of matching one transfer: (transfer, order or None, outcome)
+Match = Tuple[Transfer, Optional[Dict], str]
+
+def _timestamp(value: str) -> float:
+    """SQLite CURRENT_TIMESTAMP (UTC) as unix time"""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+def _quoted(order: Dict, transfer: Transfer) -> Optional[Decimal]:
+    """The coin amount locked on the order, if it applies to this transfer"""
+    if (order.get('quote_amount') and transfer.coin_amount is not None
+            and transfer.received_at <= _timestamp(order['quote_expires_at'])):
+        return Decimal(order['quote_amount'])
+    return None
+
+def match_transfers(orders: List[Dict], transfers: List[Transfer],
+                    tolerance: float = MATCH_TOLERANCE) -> List[Match]:
+    """Pair transfers with open orders
+
+    Outcomes: 'matched', 'underpaid' (the memo names an order but the
+    amount is short), 'ambiguous' (the amount fits several orders) and
+    'unmatched' (including memos that name an order which is not open).
+    An order is matched at most once.
+    """
+    by_id = {order['order_id'].upper(): order for order in orders}
+    by_amount: Dict[Tuple[str, int], List[Dict]] = {}
+    by_coin: Dict[Tuple[str, Decimal], List[Dict]] = {}
+    for order in orders:
+        by_amount.setdefault((order['payment_method'], round(order['total_price'] * 100)), []).append(order)
+        if order.get('quote_amount'):
+            by_coin.setdefault((order['payment_method'], Decimal(order['quote_amount'])), []).append(order)
+    created = {order['order_id']: _timestamp(order['created_at']) for order in orders}
+    paid = set()
+
+    def payable(order: Dict, transfer: Transfer) -> bool:
+        return (order['order_id'] not in paid and order['payment_method'] == transfer.method
+                and transfer.received_at >= created[order['order_id']] - CLOCK_SKEW)
+
+    results = []
+    for transfer in sorted(transfers, key=lambda t: t.received_at):
+        tokens = ORDER_ID_PATTERN.findall(transfer.memo.upper())
+        named = [by_id.get(normalize_order_id(token) or token) for token in tokens]
+        named = [order for order in named if order and payable(order, transfer)]
+        if named:
+            order = named[0]
+            quoted = _quoted(order, transfer)
+            if (Decimal(transfer.coin_amount) < quoted if quoted is not None
+                    else transfer.amount + tolerance < order['total_price']):
+                results.append((transfer, order, 'underpaid'))
+                continue
+        elif tokens:
+            # The memo names an order, just not one this transfer can pay
+            results.append((transfer, None, 'unmatched'))
+            continue
+        else:
+            candidates = []
+            if transfer.coin_amount is not None:
+                candidates = [order for order in by_coin.get((transfer.method, Decimal(transfer.coin_amount)), [])
+                              if payable(order, transfer) and _quoted(order, transfer) is not None]
+            if not candidates:
+                candidates = [order for order in by_amount.get((transfer.method, round(transfer.amount * 100)), [])
+                              if payable(order, transfer) and _quoted(order, transfer) is None]
+            if len(candidates) != 1:
+                results.append((transfer, None, 'ambiguous' if candidates else 'unmatched'))
+                continue
+            order = candidates[0]
+        paid.add(order['order_id'])
+        results.append((transfer, order, 'matched'))
+    return results
+
+class PaymentVerifier:
+    """Polls payment providers and completes the orders their transfers pay for"""
+    def __init__(self, db, methods: Optional[Dict[str, str]] = None, lookback: float = LOOKBACK_SECONDS):
+        self.db = db
+        self.lookback = lookback
+        methods = verified_methods if methods is None else methods
+        # Provider name -> (provider, payment methods it covers)
+        self.providers: Dict[str, Tuple[PaymentProvider, List[str]]] = {}
+        for method, name in methods.items():
+            if name not in self.providers:
+                self.providers[name] = (PROVIDERS[name](), [])
+            self.providers[name][1].append(method)
+        # Orders older than a reservation are cancelled, so their payments need not be fetched
+        started = time.time() - RESERVATION_MINUTES * 60
+        self._since = {name: started for name in self.providers}
+
+    @property
+    def methods(self) -> List[str]:
+        return [method for _, methods in self.providers.values() for method in methods]
+
+    async def _fetch(self, name: str) -> List[Transfer]:
+        provider, methods = self.providers[name]
+        try:
+            transfers = await provider.fetch_transfers(methods, self._since[name])
+        except Exception as e:
+            logging.error(f"Error fetching transfers from {name}: {str(e)}")
+            return []
+        if transfers:
+            newest = max(transfer.received_at for transfer in transfers)
+            self._since[name] = max(self._since[name], newest - self.lookback)
+        return transfers
+
+    async def poll(self, complete: Callable[[Dict, Transfer], Awaitable[bool]]) -> List[Match]:
+        """Fetch new transfers, complete the orders they pay for and record every outcome
+
+        complete(order, transfer) finishes one order; a transfer whose
+        completion fails is not recorded, so the next poll tries it again.
+        """
+        if not self.providers:
+            return []
+        started = time.perf_counter()
+        fetched = await asyncio.gather(*(self._fetch(name) for name in self.providers))
+        transfers = [transfer for batch in fetched for transfer in batch]
+        if not transfers:
+            poll_seconds.observe(time.perf_counter() - started)
+            return []
+
+        known = await self.db.get_known_transfers([(t.method, t.txid) for t in transfers])
+        transfers = [t for t in transfers if (t.method, t.txid) not in known]
+        orders = await self.db.get_open_orders(self.methods) if transfers else []
+        matches = match_transfers(orders, transfers)
+
+        matched = [(transfer, order) for transfer, order, outcome in matches if outcome == 'matched']
+        completed = await asyncio.gather(*(complete(order, transfer) for transfer, order in matched))
+        failed = {(transfer.method, transfer.txid) for (transfer, _), ok in zip(matched, completed) if not ok}
+
+        results = []
+        for transfer, order, outcome in matches:
+            if (transfer.method, transfer.txid) in failed:
+                outcome = 'failed'
+            transfers_total.inc(outcome=outcome)
+            results.append((transfer, order, outcome))
+        handled = [
+            {'method': transfer.method, 'txid': transfer.txid, 'amount': transfer.amount,
+             'coin_amount': transfer.coin_amount, 'memo': transfer.memo,
+             'received_at': transfer.received_at, 'order_id': order['order_id'] if order else None,
+             'outcome': outcome}
+            for transfer, order, outcome in results if outcome != 'failed'
+        ]
+        if handled:
+            await self.db.record_transfers(handled)
+        poll_seconds.observe(time.perf_counter() - started)
+        return results
+
+    async def close(self):
+        for provider, _ in self.providers.values():
+            await provider.close()
@@ -0,0 +1,205 @@
+"""
+On-demand sampling profiler for the live process
+
+A background thread periodically captures the stacks of the event loop
+thread, the aiosqlite connection threads and the default executor threads
+with sys._current_frames(). Nothing is traced between samples, so the cost
+is one stack walk per thread per tick; if sampling takes more than
+PROFILE_MAX_OVERHEAD of the wall time the interval is widened.
+
+Results are rendered as collapsed stacks ("thread;outer;...;inner count",
+the input format of flamegraph.pl and speedscope) and a top-N table.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '60'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_MAX_OVERHEAD = float(os.getenv('PROFILE_MAX_OVERHEAD', '0.02'))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_DEPTH = 64
+
+# Leaf frames where a thread is waiting rather than working
+_IDLE_LEAVES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('core.py', '_connection_worker_thread'),
+    ('core.py', 'run'),
+}
+
+def _frame_label(code, lineno: int) -> str:
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT) and f'{os.sep}site-packages{os.sep}' not in filename:
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f'{code.co_name} ({filename}:{lineno})'
+
+class ProfileResult:
+    """Collapsed stacks collected by one profiling run"""
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.ticks = 0
+        self.duration = 0.0
+        self.sampling_time = 0.0
+        self.interval = 0.0
+
+    @property
+    def overhead(self) -> float:
+        return self.sampling_time / self.duration if self.duration else 0.0
+
+    def collapsed(self) -> str:
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+    def thread_samples(self) -> Dict[str, Tuple[int, int]]:
+        """(busy, idle) sample counts per thread group"""
+        totals: Dict[str, List[int]] = {}
+        for stack, count in self.stacks.items():
+            thread, _, rest = stack.partition(';')
+            entry = totals.setdefault(thread, [0, 0])
+            entry[1 if self._is_idle(rest) else 0] += count
+        return {thread: (busy, idle) for thread, (busy, idle) in totals.items()}
+
+    @staticmethod
+    def _is_idle(stack: str) -> bool:
+        leaf = stack.rsplit(';', 1)[-1]
+        name, _, location = leaf.partition(' (')
+        return (location.split(':', 1)[0], name) in _IDLE_LEAVES
+
+    def top(self, limit: int = 25) -> str:
+        """Functions by self and total busy samples"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        busy = 0
+        for stack, count in self.stacks.items():
+            thread, _, rest = stack.partition(';')
+            if not rest or self._is_idle(rest):
+                continue
+            busy += count
+            frames = rest.split(';')
+            own[f'[{thread}] {frames[-1]}'] += count
+            for frame in set(frames):
+                total[f'[{thread}] {frame}'] += count
+
+        lines = [
+            f'{self.ticks} ticks over {self.duration:.1f}s, interval {self.interval * 1000:.1f} ms, '
+            f'overhead {self.overhead * 100:.2f}%',
+            '',
+            f"{'thread':<12}{'busy':>8}{'idle':>8}",
+        ]
+        for thread, (thread_busy, idle) in sorted(self.thread_samples().items()):
+            lines.append(f'{thread:<12}{thread_busy:>8}{idle:>8}')
+
+        lines += ['', f"{'self':>7}{'self%':>7}{'total':>7}{'total%':>7}  function"]
+        for name, count in own.most_common(limit):
+            lines.append(
+                f'{count:>7}{count / busy * 100 if busy else 0:>6.1f}%'
+                f'{total[name]:>7}{total[name] / busy * 100 if busy else 0:>6.1f}%  {name}'
+            )
+        if not own:
+            lines.append('(no busy samples)')
+
+        lines += ['', f"{'total':>7}{'total%':>7}  function (inclusive)"]
+        for name, count in total.most_common(limit):
+            lines.append(f'{count:>7}{count / busy * 100 if busy else 0:>6.1f}%  {name}')
+        return '\n'.join(lines) + '\n'
+
+class SamplingProfiler:
+    """Samples event loop, aiosqlite and executor thread stacks"""
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_overhead: float = PROFILE_MAX_OVERHEAD,
+                 max_seconds: int = PROFILE_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_overhead = max_overhead
+        self.max_seconds = max_seconds
+        self._running = threading.Lock()
+
+    def is_running(self) -> bool:
+        return self._running.locked()
+
+    def _thread_group(self, ident: int, loop_thread_id: int, names: Dict[int, str], frame) -> Optional[str]:
+        if ident == loop_thread_id:
+            return 'event-loop'
+        name = names.get(ident, '')
+        if name.startswith('asyncio_') or name.startswith('ThreadPoolExecutor'):
+            return 'executor'
+        # aiosqlite runs each connection in its own thread; recognise it by its worker frame
+        while frame is not None:
+            if f'{os.sep}aiosqlite{os.sep}' in frame.f_code.co_filename:
+                return 'aiosqlite'
+            frame = frame.f_back
+        return None
+
+    def _sample(self, result: ProfileResult, loop_thread_id: int, own_id: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_id:
+                continue
+            group = self._thread_group(ident, loop_thread_id, names, frame)
+            if group is None:
+                continue
+            frames = []
+            while frame is not None and len(frames) < MAX_DEPTH:
+                frames.append(_frame_label(frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            frames.append(group)
+            result.stacks[';'.join(reversed(frames))] += 1
+
+    def run(self, seconds: float, loop_thread_id: int) -> ProfileResult:
+        """Sample for `seconds` (capped) in the calling thread"""
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError('A profile is already running')
+        try:
+            result = ProfileResult()
+            own_id = threading.get_ident()
+            interval = self.interval
+            started = time.perf_counter()
+            deadline = started + min(seconds, self.max_seconds)
+            while True:
+                tick = time.perf_counter()
+                if tick >= deadline:
+                    break
+                # CPU time of this thread, so waiting for the GIL is not counted as overhead
+                cpu_started = time.thread_time()
+                self._sample(result, loop_thread_id, own_id)
+                cost = time.thread_time() - cpu_started
+                result.ticks += 1
+                result.sampling_time += cost
+                # Widen the interval when sampling would exceed the overhead budget
+                if cost > interval * self.max_overhead:
+                    interval = min(cost / self.max_overhead, 1.0)
+                time.sleep(max(0.0, min(tick + interval - time.perf_counter(), deadline - time.perf_counter())))
+            result.duration = time.perf_counter() - started
+            result.interval = result.duration / result.ticks if result.ticks else interval
+            return result
+        finally:
+            self._running.release()
+
+    async def profile(self, seconds: float) -> ProfileResult:
+        """Profile the running event loop's process from a worker thread"""
+        loop = asyncio.get_running_loop()
+        loop_thread_id = threading.get_ident()
+        result: asyncio.Future = loop.create_future()
+
+        def target():
+            try:
+                value = self.run(seconds, loop_thread_id)
+            except Exception as e:
+                loop.call_soon_threadsafe(result.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(result.set_result, value)
+
+        # A dedicated thread so the profiler does not occupy an executor slot it would also sample
+        threading.Thread(target=target, name='sampling-profiler', daemon=True).start()
+        return await result
+
+# Global profiler instance
+profiler = SamplingProfiler()
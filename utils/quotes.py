@@ -0,0 +1,172 @@
+"""
+Fiat-to-crypto quotes for payment instructions
+
+Checkout quotes the exact coin amount for an order total, so buyers send
+"0.00041234 BTC" instead of "€25.00 worth of BTC" and payments can be
+matched to orders by amount. Rates come from a pluggable RateSource
+(QUOTE_RATE_SOURCE, read the first time the engine is used):
+
+  • coingecko: the CoinGecko simple price API
+  • fixture: fixed rates from QUOTE_FIXTURE_PATH (JSON, coin -> EUR) or
+    FIXTURE_RATES, for offline runs
+
+Rates for every coin are fetched in one batch and cached for
+QUOTE_TTL_SECONDS; OrderManagement refreshes them on a loop, so a
+checkout only reads the cache and never waits on a fetch. When the cache
+is older than QUOTE_MAX_AGE_SECONDS (the source is down) no quote is
+given and buyers get the "€X worth" instructions as before.
+
+A quote is locked onto its order (DatabaseManager.create_order) and
+honoured for QUOTE_LOCK_MINUTES. No two open orders with the same coin
+share an amount (a clashing amount is raised by the coin's smallest
+unit), so a payment that lacks the order ID still fits exactly one order.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from decimal import ROUND_UP, Decimal
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from utils.metrics import metrics
+
+TTL = float(os.getenv('QUOTE_TTL_SECONDS', '60'))
+MAX_AGE = float(os.getenv('QUOTE_MAX_AGE_SECONDS', '300'))
+LOCK_MINUTES = float(os.getenv('QUOTE_LOCK_MINUTES', '30'))
+
+# Coin -> decimal places quoted; amounts are rounded up so a quote never underpays
+DECIMALS = {'btc': 8, 'eth': 6, 'ltc': 8, 'usdt': 2, 'sol': 6}
+COINS = list(DECIMALS)
+
+# EUR per coin, used by the fixture source when no fixture file is given
+FIXTURE_RATES = {'btc': 60000.0, 'eth': 3000.0, 'ltc': 80.0, 'usdt': 0.92, 'sol': 150.0}
+
+refreshes_total = metrics.counter('novacore_quote_refreshes_total', 'Quote rate refreshes', ['result'])
+rate_age_seconds = metrics.gauge(
+    'novacore_quote_rate_age_seconds', 'Age of the cached quote rates',
+    callback=lambda: time.time() - quotes.fetched_at if quotes.fetched_at else math.inf
+)
+
+class RateSource:
+    """Source of EUR exchange rates for coins"""
+    name = 'base'
+
+    async def fetch_rates(self, coins: List[str]) -> Dict[str, float]:
+        """EUR per coin for every coin it knows, in one call"""
+        raise NotImplementedError
+
+class FixtureRateSource(RateSource):
+    """Fixed rates from a JSON file, or FIXTURE_RATES"""
+    name = 'fixture'
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('QUOTE_FIXTURE_PATH')
+
+    async def fetch_rates(self, coins: List[str]) -> Dict[str, float]:
+        rates = FIXTURE_RATES
+        if self.path:
+            with open(self.path) as f:
+                rates = json.load(f)
+        return {coin: float(rates[coin]) for coin in coins if coin in rates}
+
+class CoinGeckoRateSource(RateSource):
+    """Spot rates from the CoinGecko simple price API"""
+    name = 'coingecko'
+    URL = 'https://api.coingecko.com/api/v3/simple/price'
+    IDS = {'btc': 'bitcoin', 'eth': 'ethereum', 'ltc': 'litecoin', 'usdt': 'tether', 'sol': 'solana'}
+
+    async def fetch_rates(self, coins: List[str]) -> Dict[str, float]:
+        params = {'ids': ','.join(self.IDS[coin] for coin in coins), 'vs_currencies': 'eur'}
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(self.URL, params=params) as response:
+                response.raise_for_status()
+                prices = await response.json()
+        return {coin: float(prices[self.IDS[coin]]['eur']) for coin in coins
+                if 'eur' in prices.get(self.IDS[coin], {})}
+
+# Source name -> factory
+RATE_SOURCES: Dict[str, Callable[[], RateSource]] = {
+    'fixture': FixtureRateSource,
+    'coingecko': CoinGeckoRateSource,
+}
+
+class Quote:
+    """A coin rate locked for one checkout"""
+    __slots__ = ('coin', 'rate', 'expires_at')
+
+    def __init__(self, coin: str, rate: float, expires_at: float):
+        self.coin = coin
+        self.rate = rate
+        self.expires_at = expires_at
+
+    @property
+    def step(self) -> Decimal:
+        """Smallest amount quoted for the coin"""
+        return Decimal(1).scaleb(-DECIMALS[self.coin])
+
+    def amount(self, total: float) -> Decimal:
+        """Coins to send for a EUR total, rounded up to the coin's quoted precision"""
+        return (Decimal(str(total)) / Decimal(str(self.rate))).quantize(self.step, rounding=ROUND_UP)
+
+class QuoteEngine:
+    """Cached coin rates, refreshed in one batch"""
+    def __init__(self, source: Optional[RateSource] = None, ttl: float = TTL, max_age: float = MAX_AGE,
+                 lock_minutes: float = LOCK_MINUTES):
+        self._source = source
+        self._source_read = source is not None
+        self.ttl = ttl
+        self.max_age = max_age
+        self.lock_minutes = lock_minutes
+        self.rates: Dict[str, float] = {}
+        self.fetched_at = 0.0
+
+    @property
+    def source(self) -> Optional[RateSource]:
+        """The rate source, built from QUOTE_RATE_SOURCE on first use"""
+        if not self._source_read:
+            self._source_read = True
+            name = os.getenv('QUOTE_RATE_SOURCE', '').lower()
+            if name in RATE_SOURCES:
+                self._source = RATE_SOURCES[name]()
+            elif name:
+                logging.error(f"Unknown QUOTE_RATE_SOURCE: {name}")
+        return self._source
+
+    @source.setter
+    def source(self, source: Optional[RateSource]):
+        self._source = source
+        self._source_read = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.source is not None
+
+    async def refresh(self) -> bool:
+        """Fetch every coin's rate in one call; the old rates stay if it fails"""
+        if not self.source:
+            return False
+        try:
+            rates = await self.source.fetch_rates(COINS)
+        except Exception as e:
+            refreshes_total.inc(result='error')
+            logging.error(f"Error fetching quote rates from {self.source.name}: {str(e)}")
+            return False
+        self.rates.update({coin: rate for coin, rate in rates.items() if rate > 0})
+        self.fetched_at = time.time()
+        refreshes_total.inc(result='ok')
+        return True
+
+    def lock(self, coin: str) -> Optional[Quote]:
+        """Lock the cached rate for a checkout; None if there is no fresh rate"""
+        rate = self.rates.get(coin)
+        if rate is None or time.time() - self.fetched_at > self.max_age:
+            return None
+        return Quote(coin, rate, time.time() + self.lock_minutes * 60)
+
+# Global quote engine instance
+quotes = QuoteEngine()
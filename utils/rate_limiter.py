@@ -0,0 +1,128 @@
+"""
+Per-user token-bucket rate limiter for interactions
+
+Every interaction is checked when it is dispatched, before its handler
+runs (utils/tracing.py: RateLimitedCommandTree, RateLimitedView,
+RateLimitedModal), keyed by (user, action). The action is the handler's
+@traced rate_limit group or its qualified name. Each action has a burst of `count` tokens refilled at
+`count` per `seconds`; limits come from DEFAULT_LIMITS overridden by
+RATE_LIMITS (read on first use), e.g. RATE_LIMITS="buy=3/10,ticket=2/60,default=20/10".
+An action set to "off" is not limited.
+
+A bucket that has been idle long enough to refill completely holds no
+state worth keeping, so those buckets are swept periodically.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+# action -> (count, seconds); 'default' applies to actions without an entry
+DEFAULT_LIMITS: Dict[str, Optional[Tuple[int, float]]] = {
+    'default': (20, 10),
+    'show_stock': (5, 10),
+    'buy': (10, 30),
+    'payment': (5, 30),
+    'ticket': (2, 60),
+    'addproduct': (1, 30),
+    'removestock': (1, 30),
+    'setstock': (1, 30),
+    'addunits': (1, 10),
+    'export_orders': (1, 30),
+    'myorders': (5, 30),
+    'vouch': (1, 60),
+    # Payment proof DMs (OrderManagement.on_message), which are not interactions
+    'proof': (3, 60),
+}
+SWEEP_INTERVAL = 60.0
+
+throttled_total = metrics.counter(
+    'novacore_rate_limited_total', 'Interactions rejected by the rate limiter', ['action']
+)
+
+def parse_limits(spec: str) -> Dict[str, Optional[Tuple[int, float]]]:
+    """Parse "action=count/seconds,..." ("off" disables an action)"""
+    limits = {}
+    for entry in spec.split(','):
+        if '=' not in entry:
+            continue
+        action, value = (part.strip() for part in entry.split('=', 1))
+        if value.lower() == 'off':
+            limits[action] = None
+            continue
+        count, _, seconds = value.partition('/')
+        limits[action] = (int(count), float(seconds or 1))
+    return limits
+
+class RateLimiter:
+    """Token buckets keyed by (user ID, action)"""
+    def __init__(self, limits: Optional[Dict[str, Optional[Tuple[int, float]]]] = None,
+                 sweep_interval: float = SWEEP_INTERVAL):
+        self._limits = limits
+        self.sweep_interval = sweep_interval
+        # (user_id, action) -> [tokens, last refill time]
+        self._buckets: Dict[Tuple[int, str], List[float]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        metrics.gauge(
+            'novacore_rate_limit_buckets', 'Active rate limiter buckets', callback=lambda: len(self._buckets)
+        )
+
+    @property
+    def limits(self) -> Dict[str, Optional[Tuple[int, float]]]:
+        """Limits by action; DEFAULT_LIMITS overridden by RATE_LIMITS, read on first use"""
+        if self._limits is None:
+            self._limits = {**DEFAULT_LIMITS, **parse_limits(os.getenv('RATE_LIMITS', ''))}
+        return self._limits
+
+    def limit_for(self, action: str) -> Optional[Tuple[int, float]]:
+        return self.limits.get(action, self.limits.get('default'))
+
+    def hit(self, user_id: int, action: str) -> float:
+        """Take a token; 0 if allowed, otherwise seconds until the next token"""
+        limit = self.limit_for(action)
+        if not limit:
+            return 0.0
+        count, seconds = limit
+        rate = count / seconds
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            bucket = self._buckets.get((user_id, action))
+            if bucket is None:
+                bucket = self._buckets[(user_id, action)] = [float(count), now]
+            else:
+                bucket[0] = min(count, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+        throttled_total.inc(action=action)
+        return (1 - bucket[0]) / rate
+
+    def _sweep(self, now: float):
+        """Drop buckets that have refilled completely"""
+        for key, (tokens, updated) in list(self._buckets.items()):
+            limit = self.limit_for(key[1])
+            if not limit or tokens + (now - updated) * limit[0] / limit[1] >= limit[0]:
+                del self._buckets[key]
+        self._last_sweep = now
+
+    def reset(self, user_id: Optional[int] = None):
+        """Forget every bucket, or only one user's"""
+        with self._lock:
+            if user_id is None:
+                self._buckets.clear()
+            else:
+                for key in [key for key in self._buckets if key[0] == user_id]:
+                    del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
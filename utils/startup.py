@@ -0,0 +1,78 @@
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+class StartupTimer:
+    """Record how long each startup phase takes"""
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self.reported = False
+
+    def record(self, name: str, seconds: float):
+        """Record a phase that was timed elsewhere"""
+        self.phases.append((name, seconds))
+        logging.info(f"Startup phase '{name}' took {seconds * 1000:.0f} ms")
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the wrapped block as a startup phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def log_summary(self):
+        """Log all phases once, when startup is complete"""
+        if self.reported:
+            return
+        self.reported = True
+        total = sum(seconds for _, seconds in self.phases)
+        breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        logging.info(f"Startup completed in {total * 1000:.0f} ms ({breakdown})")
+
+# Global startup timer instance
+startup_timer = StartupTimer()
+
+_IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def profile_imports(modules: List[str], output_path: str, top: int = 40) -> str:
+    """
+    Import modules in a fresh interpreter with -X importtime and write a
+    breakdown sorted by cumulative time. Returns the report text.
+    """
+    code = '; '.join(f'import {module}' for module in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+
+    top_level = sum(cumulative for cumulative, _, depth, _ in entries if depth == 0)
+    lines = [
+        f"Import-time breakdown for: {', '.join(modules)}",
+        f"Total (top-level cumulative): {top_level / 1000:.1f} ms",
+        "",
+        f"{'cumulative ms':>14} {'self ms':>9}  module",
+    ]
+    for cumulative, self_us, depth, name in sorted(entries, reverse=True)[:top]:
+        lines.append(f"{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+    if result.returncode != 0:
+        lines += ["", "Import failed:", result.stderr.strip().splitlines()[-1]]
+
+    report = "\n".join(lines) + "\n"
+    with open(output_path, 'w') as f:
+        f.write(report)
+    return report
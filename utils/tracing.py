@@ -0,0 +1,287 @@
+"""
+Interaction deadline tracing
+
+Discord fails an interaction that is not acknowledged within 3 seconds of
+being created. `@traced()` wraps component callbacks, modal submits and app
+commands to measure time-to-ack and time-to-completion, collect spans for
+DB and API calls, count deadline misses per handler and auto-defer handlers
+that are about to miss the deadline.
+
+Interactions are rate limited per user (utils/rate_limiter.py) when they
+are dispatched, before any handler runs: RateLimitedCommandTree checks app
+commands, and every view and modal derives from RateLimitedView or
+RateLimitedModal. `@traced(rate_limit=...)` only picks the bucket.
+
+Handlers keep calling `interaction.response.send_message` / `edit_message`
+as usual: once an interaction was auto-deferred, those calls are routed to
+the followup webhook / original response instead.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import discord
+from discord import app_commands
+
+from utils.metrics import metrics
+from utils.interaction_recorder import interaction_recorder
+from utils.rate_limiter import rate_limiter
+
+ACK_DEADLINE = 3.0
+AUTO_DEFER_AFTER = float(os.getenv('INTERACTION_AUTO_DEFER_AFTER', '2.0'))
+SLOW_INTERACTION_MS = float(os.getenv('INTERACTION_SLOW_MS', '1500'))
+
+ack_seconds = metrics.histogram(
+    'novacore_interaction_ack_seconds', 'Time from interaction creation to acknowledgement', ['handler']
+)
+duration_seconds = metrics.histogram(
+    'novacore_interaction_duration_seconds', 'Time from interaction creation to handler completion', ['handler']
+)
+span_seconds = metrics.histogram(
+    'novacore_interaction_span_seconds', 'Time spent in DB and API calls inside handlers', ['handler', 'span']
+)
+deadline_misses_total = metrics.counter(
+    'novacore_interaction_deadline_misses_total', 'Interactions acknowledged after the 3s deadline', ['handler']
+)
+auto_defers_total = metrics.counter(
+    'novacore_interaction_auto_defers_total', 'Interactions deferred by the tracer', ['handler']
+)
+handler_errors_total = metrics.counter(
+    'novacore_interaction_errors_total', 'Handlers that raised', ['handler']
+)
+
+_current_trace: contextvars.ContextVar[Optional['InteractionTrace']] = contextvars.ContextVar(
+    'interaction_trace', default=None
+)
+
+class InteractionTrace:
+    """Timing for one handled interaction, relative to its creation on Discord's side"""
+    def __init__(self, handler: str, interaction: discord.Interaction):
+        self.handler = handler
+        # Time already spent between Discord creating the interaction and us
+        # starting the handler (clamped, clocks are not perfectly in sync)
+        self.received_after = max(0.0, time.time() - interaction.created_at.timestamp())
+        self._started = time.perf_counter()
+        self.ack_after: Optional[float] = None
+        self.auto_deferred = False
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def elapsed(self) -> float:
+        """Seconds since the interaction was created"""
+        return self.received_after + time.perf_counter() - self._started
+
+    def mark_ack(self):
+        if self.ack_after is None:
+            self.ack_after = self.elapsed()
+            ack_seconds.observe(self.ack_after, handler=self.handler)
+            if self.ack_after > ACK_DEADLINE:
+                deadline_misses_total.inc(handler=self.handler)
+
+    def add_span(self, name: str, started_at: float, duration: float):
+        self.spans.append((name, started_at, duration))
+        span_seconds.observe(duration, handler=self.handler, span=name)
+
+    def summary(self) -> str:
+        spans = ", ".join(f"{name}@{start * 1000:.0f}ms+{duration * 1000:.0f}ms"
+                          for name, start, duration in self.spans)
+        ack = f"{self.ack_after * 1000:.0f}ms" if self.ack_after is not None else "never"
+        return f"received +{self.received_after * 1000:.0f}ms, ack {ack}, spans [{spans}]"
+
+@contextmanager
+def span(name: str):
+    """Record the wrapped block as a span of the current interaction trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started_at = trace.elapsed()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, started_at, time.perf_counter() - started)
+
+def record_span(name: str, duration: float):
+    """Record an already measured span that just finished"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, trace.elapsed() - duration, duration)
+
+class TracedResponse:
+    """InteractionResponse wrapper that records the ack and honours auto-defers"""
+    def __init__(self, interaction: discord.Interaction, trace: InteractionTrace, ephemeral: bool):
+        self._interaction = interaction
+        self._response = interaction.response
+        self._trace = trace
+        self._ephemeral = ephemeral
+        self._lock = asyncio.Lock()
+
+    async def _initial(self, name: str, call, after_defer=None):
+        """Send the initial response, or call after_defer if the interaction was auto-deferred"""
+        # Checked under the lock, so a watchdog defer in flight is seen before responding
+        async with self._lock:
+            if self._trace.auto_deferred:
+                return await after_defer() if after_defer else None
+            with span(f'discord.{name}'):
+                try:
+                    return await call()
+                except discord.NotFound as e:
+                    # 10062 Unknown interaction: the 3s window already closed
+                    if e.code == 10062:
+                        deadline_misses_total.inc(handler=self._trace.handler)
+                    raise
+                finally:
+                    if self._response.is_done():
+                        self._trace.mark_ack()
+
+    async def auto_defer(self) -> bool:
+        """Defer the interaction if the handler has not acknowledged it yet"""
+        async with self._lock:
+            if self._response.is_done():
+                return False
+            if self._interaction.type is discord.InteractionType.application_command:
+                await self._response.defer(thinking=True, ephemeral=self._ephemeral)
+            else:
+                await self._response.defer()
+            self._trace.auto_deferred = True
+            self._trace.mark_ack()
+            auto_defers_total.inc(handler=self._trace.handler)
+            return True
+
+    async def defer(self, **kwargs):
+        return await self._initial('defer', lambda: self._response.defer(**kwargs))
+
+    async def send_message(self, *args, **kwargs):
+        async def followup():
+            with span('discord.followup'):
+                return await self._interaction.followup.send(*args, **kwargs)
+        return await self._initial('send_message', lambda: self._response.send_message(*args, **kwargs),
+                                   followup)
+
+    async def edit_message(self, **kwargs):
+        async def edit_original():
+            with span('discord.edit_original'):
+                return await self._interaction.edit_original_response(**kwargs)
+        return await self._initial('edit_message', lambda: self._response.edit_message(**kwargs),
+                                   edit_original)
+
+    async def send_modal(self, modal):
+        return await self._initial('send_modal', lambda: self._response.send_modal(modal))
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+class TracedInteraction:
+    """Interaction proxy handed to traced handlers"""
+    def __init__(self, interaction: discord.Interaction, trace: InteractionTrace, ephemeral: bool):
+        self._interaction = interaction
+        self.trace = trace
+        self.response = TracedResponse(interaction, trace, ephemeral)
+
+    def __getattr__(self, name):
+        return getattr(self._interaction, name)
+
+async def _watch_deadline(interaction: TracedInteraction):
+    await asyncio.sleep(max(0.0, AUTO_DEFER_AFTER - interaction.trace.elapsed()))
+    try:
+        await interaction.response.auto_defer()
+    except discord.HTTPException as e:
+        logging.warning(f"Auto-defer failed for {interaction.trace.handler}: {e}")
+
+def traced(handler: Optional[str] = None, auto_defer: bool = True, ephemeral: bool = True,
+           rate_limit: Optional[str] = None):
+    """
+    Trace an interaction handler
+    auto_defer must be False for handlers that answer with a modal
+    ephemeral is used when an app command has to be deferred with a thinking state
+    rate_limit names the rate limiter action (handlers sharing one share a bucket);
+    defaults to the handler name
+    """
+    def decorator(func):
+        name = handler or func.__qualname__
+        action = rate_limit or name
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            index = next((i for i, arg in enumerate(args)
+                          if isinstance(arg, (discord.Interaction, TracedInteraction))), None)
+            # Not an interaction entry point, or already traced further up the call chain
+            if index is None or isinstance(args[index], TracedInteraction):
+                return await func(*args, **kwargs)
+
+            trace = InteractionTrace(name, args[index])
+            interaction = TracedInteraction(args[index], trace, ephemeral)
+            args = args[:index] + (interaction,) + args[index + 1:]
+            token = _current_trace.set(trace)
+            watchdog = asyncio.create_task(_watch_deadline(interaction)) if auto_defer else None
+            failed = False
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                failed = True
+                handler_errors_total.inc(handler=name)
+                raise
+            finally:
+                if watchdog:
+                    watchdog.cancel()
+                _current_trace.reset(token)
+                elapsed = trace.elapsed()
+                duration_seconds.observe(elapsed, handler=name)
+                interaction_recorder.record_handled(
+                    interaction.id, name, trace.ack_after, elapsed, trace.auto_deferred, failed
+                )
+                if trace.ack_after is None and elapsed > ACK_DEADLINE:
+                    deadline_misses_total.inc(handler=name)
+                if elapsed * 1000 >= SLOW_INTERACTION_MS or trace.auto_deferred:
+                    logging.warning(f"Slow interaction {name}: done {elapsed * 1000:.0f}ms, {trace.summary()}")
+        wrapper.__rate_limit__ = action
+        return wrapper
+    return decorator
+
+def rate_limit_action(callback) -> str:
+    """The rate limiter action for a handler: its @traced bucket, else its own name"""
+    # Decorated view items hold the function in an _ItemCallback
+    callback = getattr(callback, 'callback', callback)
+    return getattr(callback, '__rate_limit__', None) or getattr(callback, '__qualname__', 'default')
+
+async def check_rate_limit(interaction: discord.Interaction, action: str) -> bool:
+    """Take a token for the user; if they have none left, tell them when to retry"""
+    retry_after = rate_limiter.hit(interaction.user.id, action)
+    if not retry_after:
+        return True
+    await interaction.response.send_message(
+        f"⏳ You're doing that too often. Try again in {math.ceil(retry_after)}s.", ephemeral=True
+    )
+    return False
+
+class RateLimitedView(discord.ui.View):
+    """View whose components are rate limited before their callbacks run"""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        custom_id = (interaction.data or {}).get('custom_id')
+        item = next((child for child in self.children if getattr(child, 'custom_id', None) == custom_id), None)
+        return await check_rate_limit(interaction, rate_limit_action(item.callback) if item else 'default')
+
+class RateLimitedModal(discord.ui.Modal):
+    """Modal whose submits are rate limited before on_submit runs"""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_rate_limit(interaction, rate_limit_action(self.on_submit))
+
+async def check_command_rate_limit(interaction: discord.Interaction) -> bool:
+    """Rate limit an app command under its handler's action"""
+    # Autocomplete requests cannot be answered with a message and are not limited
+    if interaction.type is not discord.InteractionType.application_command:
+        return True
+    command = interaction.command
+    return await check_rate_limit(interaction, rate_limit_action(command.callback) if command else 'default')
+
+class RateLimitedCommandTree(app_commands.CommandTree):
+    """Command tree that rate limits app commands before they run"""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_command_rate_limit(interaction)